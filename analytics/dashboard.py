@@ -1,18 +1,39 @@
+import os
+import time
+
+from plotly.offline import get_plotlyjs
+
 from .performance import generate_performance_report
 from .plots import (
     plot_equity_curve,
+    plot_equity_pages,
     plot_drawdown,
     plot_pnl_distribution,
     plot_duration_distribution
 )
 
 
-def generate_dashboard(trades, equity_curve, output_path="dashboard.html"):
+def _fig_div(fig):
+    # plotly.js is embedded once in <head>, figures only carry their data
+    return fig.to_html(full_html=False, include_plotlyjs=False)
+
+
+def generate_dashboard(trades, equity_curve, output_path="dashboard.html",
+                       max_points=5000, downsample="lttb", page_by=None):
+    """
+    Write a static, self-contained HTML dashboard (works offline).
+    max_points: points per equity/drawdown trace (None = plot everything)
+    downsample: "lttb" or "minmax" for the equity curve
+    page_by:    optional period alias ("W", "M", "Q") to page the equity curve
+    """
     report = generate_performance_report(trades, equity_curve)
 
     # Generate plots
-    fig_equity = plot_equity_curve(report)
-    fig_drawdown = plot_drawdown(report)
+    if page_by:
+        fig_equity = plot_equity_pages(report, page_by, max_points, downsample)
+    else:
+        fig_equity = plot_equity_curve(report, max_points, downsample)
+    fig_drawdown = plot_drawdown(report, max_points)
     fig_pnl = plot_pnl_distribution(report)
     fig_duration = plot_duration_distribution(report)
 
@@ -20,7 +41,9 @@ def generate_dashboard(trades, equity_curve, output_path="dashboard.html"):
     html = f"""
     <html>
     <head>
+        <meta charset="utf-8">
         <title>Trading Performance Dashboard</title>
+        <script type="text/javascript">{get_plotlyjs()}</script>
     </head>
     <body>
         <h1>Trading Performance Dashboard</h1>
@@ -33,16 +56,16 @@ def generate_dashboard(trades, equity_curve, output_path="dashboard.html"):
         <p>Profit Factor: {report.profit_factor:.2f}</p>
 
         <h2>Equity Curve</h2>
-        {fig_equity.to_html()}
+        {_fig_div(fig_equity)}
 
         <h2>Drawdown</h2>
-        {fig_drawdown.to_html()}
+        {_fig_div(fig_drawdown)}
 
         <h2>PnL Distribution</h2>
-        {fig_pnl.to_html()}
+        {_fig_div(fig_pnl)}
 
         <h2>Duration Distribution</h2>
-        {fig_duration.to_html()}
+        {_fig_div(fig_duration)}
     </body>
     </html>
     """
@@ -51,3 +74,35 @@ def generate_dashboard(trades, equity_curve, output_path="dashboard.html"):
         f.write(html)
 
     return output_path
+
+
+def measure_dashboard(n_points=1_000_000, output_path="dashboard_bench.html", **kwargs):
+    """
+    Build a dashboard from a synthetic n_points equity curve and report
+    generation time and file size.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    close_time = pd.date_range("2020-01-01", periods=n_points, freq="min")
+    profit = rng.normal(0.05, 5.0, n_points)
+    trades = pd.DataFrame({
+        "close_time": close_time,
+        "profit": profit,
+        "duration": rng.exponential(30.0, n_points),
+    })
+    equity = pd.Series(10_000 + np.cumsum(profit), index=close_time)
+
+    t0 = time.perf_counter()
+    generate_dashboard(trades, equity, output_path=output_path, **kwargs)
+    elapsed = time.perf_counter() - t0
+
+    size_mb = os.path.getsize(output_path) / 1e6
+    print(f"{n_points} points -> {output_path}: {size_mb:.2f} MB in {elapsed:.2f}s")
+    return elapsed, size_mb
+
+
+if __name__ == "__main__":
+    measure_dashboard()
+    measure_dashboard(page_by="M")
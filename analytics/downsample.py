@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+
+def _as_float_x(index):
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8.astype(np.float64)
+    return np.asarray(index, dtype=np.float64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets.
+    Returns the positions of the n_out points that best preserve the visual shape.
+    First and last points are always kept.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out - 2 buckets between the fixed first and last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[-1] = n - 1
+    a = 0
+
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+
+        # average of the next bucket (or the last point)
+        if b + 2 < len(edges):
+            nlo, nhi = edges[b + 1], edges[b + 2]
+            avg_x = x[nlo:nhi].mean()
+            avg_y = y[nlo:nhi].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        ax, ay = x[a], y[a]
+        area = np.abs(
+            (ax - avg_x) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y - ay)
+        )
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min/max buckets: keep the lowest and highest point of every bucket.
+    Fully vectorized, preserves every spike (drawdowns included).
+    """
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    n_buckets = n_out // 2
+    size = int(np.ceil(n / n_buckets))
+
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size)
+
+    # all-NaN buckets (tail padding or gaps) are dropped below
+    valid = ~np.all(np.isnan(buckets), axis=1)
+    filled_min = np.where(np.isnan(buckets), np.inf, buckets)
+    filled_max = np.where(np.isnan(buckets), -np.inf, buckets)
+
+    offsets = np.arange(n_buckets) * size
+    i_min = offsets + np.argmin(filled_min, axis=1)
+    i_max = offsets + np.argmax(filled_max, axis=1)
+
+    idx = np.concatenate([i_min[valid], i_max[valid], [0, n - 1]])
+    return np.unique(idx)
+
+
+def downsample_series(series: pd.Series, max_points=5000, method="lttb") -> pd.Series:
+    """
+    Reduce a (time) series to at most ~max_points while keeping its shape.
+    method: "lttb" or "minmax". Short series are returned unchanged.
+    """
+    if max_points is None or len(series) <= max_points:
+        return series
+
+    values = series.to_numpy(dtype=np.float64)
+
+    if method == "lttb":
+        idx = lttb_indices(_as_float_x(series.index), values, max_points)
+    elif method == "minmax":
+        idx = minmax_indices(values, max_points)
+    else:
+        raise ValueError(f"Unknown downsample method: {method}")
+
+    return series.iloc[idx]
@@ -1,12 +1,17 @@
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
 
+from .downsample import downsample_series
+
+
+def plot_equity_curve(report, max_points=5000, method="lttb"):
+    equity = downsample_series(report.equity_curve, max_points, method)
 
-def plot_equity_curve(report):
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=report.equity_curve.index,
-        y=report.equity_curve.values,
+        x=equity.index,
+        y=equity.values,
         mode="lines",
         name="Equity"
     ))
@@ -14,8 +19,54 @@ def plot_equity_curve(report):
     return fig
 
 
-def plot_drawdown(report):
-    dd = report.drawdown_series
+def plot_equity_pages(report, freq="M", max_points=5000, method="lttb"):
+    """
+    Equity curve paged by period (pandas offset alias, e.g. "W", "M", "Q").
+    Every page is its own trace, downsampled separately, so zooming into a
+    single period keeps its detail. A dropdown switches between pages.
+    """
+    equity = report.equity_curve
+    periods = equity.index.to_period(freq) if isinstance(equity.index, pd.DatetimeIndex) else None
+    if periods is None:
+        return plot_equity_curve(report, max_points, method)
+
+    fig = go.Figure()
+    labels = ["All"]
+
+    full = downsample_series(equity, max_points, method)
+    fig.add_trace(go.Scatter(x=full.index, y=full.values, mode="lines", name="All"))
+
+    for period, page in equity.groupby(periods, sort=True):
+        page = downsample_series(page, max_points, method)
+        fig.add_trace(go.Scatter(
+            x=page.index,
+            y=page.values,
+            mode="lines",
+            name=str(period),
+            visible=False
+        ))
+        labels.append(str(period))
+
+    buttons = []
+    for i, label in enumerate(labels):
+        visible = [j == i for j in range(len(labels))]
+        buttons.append(dict(
+            label=label,
+            method="update",
+            args=[{"visible": visible}, {"xaxis.autorange": True, "yaxis.autorange": True}]
+        ))
+
+    fig.update_layout(
+        title="Equity Curve",
+        updatemenus=[dict(buttons=buttons, direction="down", x=1.0, xanchor="right", y=1.15)],
+        showlegend=False
+    )
+    return fig
+
+
+def plot_drawdown(report, max_points=5000, method="minmax"):
+    # min/max keeps the deepest point of every bucket
+    dd = downsample_series(report.drawdown_series, max_points, method)
 
     fig = go.Figure()
     fig.add_trace(go.Scatter(
@@ -37,39 +88,42 @@ def plot_drawdown(report):
     return fig
 
 
-def plot_pnl_distribution(report):
-    trades = report.trades
+def _histogram(values, nbins, title, xlabel):
+    # Bin in numpy and plot the bars, so the HTML size does not grow with the number of trades
+    values = pd.Series(values).dropna().to_numpy(dtype=np.float64)
+    counts, edges = np.histogram(values, bins=nbins) if len(values) else (np.array([]), np.array([0.0]))
 
-    fig = px.histogram(
-        trades,
-        x="profit",
-        nbins=50,
-        title="PnL Distribution",
-        labels={"profit": "Profit per Trade"},
-        template="plotly_white"
-    )
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        name=xlabel
+    ))
 
     fig.update_layout(
+        title=title,
+        xaxis_title=xlabel,
+        yaxis_title="count",
+        template="plotly_white",
         bargap=0.05
     )
 
     return fig
 
 
-def plot_duration_distribution(report):
-    trades = report.trades
-
-    fig = px.histogram(
-        trades,
-        x="duration",
+def plot_pnl_distribution(report):
+    return _histogram(
+        report.trades["profit"],
         nbins=50,
-        title="Trade Duration Distribution (minutes)",
-        labels={"duration": "Duration (minutes)"},
-        template="plotly_white"
+        title="PnL Distribution",
+        xlabel="Profit per Trade"
     )
 
-    fig.update_layout(
-        bargap=0.05
-    )
 
-    return fig
+def plot_duration_distribution(report):
+    return _histogram(
+        report.trades["duration"],
+        nbins=50,
+        title="Trade Duration Distribution (minutes)",
+        xlabel="Duration (minutes)"
+    )
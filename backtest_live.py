@@ -1,5 +1,3 @@
-import matplotlib
-matplotlib.use("TkAgg")
 import joblib
 from pathlib import Path
 from collections import Counter
@@ -16,6 +14,9 @@ from evaluation.backtest_plotter import (
     plot_confusion_matrix,
     plot_rolling_f1
 )
+from utils.plotting import configure_backend, render_figures
+
+configure_backend()
 
 MODEL_PATH = Path("models/saved/active_model.pkl")
 
@@ -47,9 +48,12 @@ def backtest_live(symbol, timeframe, days, start_date, end_date):
     print(f"Live backtest F1 score: {score:.4f}")
 
     print("Plotting results...")
-    plot_equity_curve(df, preds, future_n=2, title="Live Backtest Equity Curve")
-    plot_rolling_f1(df, preds, window=200, title="Live Backtest Rolling F1")
-    plot_confusion_matrix(df, preds, title="Live Backtest Confusion Matrix")
+    plot_df = df[["close", "target"]]
+    render_figures([
+        (plot_equity_curve, (plot_df, preds), {"future_n": 2, "title": "Live Backtest Equity Curve"}),
+        (plot_rolling_f1, (plot_df, preds), {"window": 200, "title": "Live Backtest Rolling F1"}),
+        (plot_confusion_matrix, (plot_df, preds), {"title": "Live Backtest Confusion Matrix"}),
+    ])
 
     return score
 
@@ -2,14 +2,16 @@ import json
 import joblib
 from pathlib import Path
 import numpy as np
-import pandas as pd
 
 from data_loader.mt5_loader import load_data
 from diagnostics.regime_features import compute_trend_strength
 from features.feature_engineering import build_features
+from backtesting.trade_log import EquityLog, TradeLog
+from execution.position_manager import PositionBook
 from utils.params_io import load_best_params
+from utils.logger import span, timed
 from utils.target_encoding import decode_target
-from utils.config import SYMBOL, TIMEFRAME, INITIAL_BALANCE, POSITION_SIZE, START_DATE, END_DATE
+from utils.config import SYMBOL, TIMEFRAME, INITIAL_BALANCE, POSITION_SIZE, START_DATE, END_DATE, COMPACT_FEATURES, HTF_TIMEFRAMES, REGIME_FEATURE
 
 MODEL_PATH = Path(__file__).resolve().parent.parent / "models" / "saved" / "active_model.pkl"
 # PARAMS_PATH = Path("utils/best_params.json")
@@ -28,10 +30,10 @@ def prepare_data(symbol, timeframe, start_date, end_date):
     best_params = load_best_params()
 
     print("Building features...")
-    df = build_features(df_raw.copy(), best_params)
+    df = build_features(df_raw, best_params, compact=COMPACT_FEATURES, htf=HTF_TIMEFRAMES,
+                        regime=REGIME_FEATURE)
 
-    # Drop rows with NaNs from indicators
-    df = df.dropna().copy()
+    # build_features already dropped the indicator warm-up NaNs; no second full copy here
     # df["hour"] = df.index.hour
     # df["weekday"] = df.index.day_name()
     # df["atr_norm"] = df["atr"] / df["close"]
@@ -44,147 +46,197 @@ def load_model():
     print("Loading model...")
     return joblib.load(MODEL_PATH)
 
-def generate_signals(model, df):
+@timed("generate_signals")
+def generate_signals(model, df, return_proba=False):
     X = df.drop(columns=["target"]) if "target" in df.columns else df.copy()
-    preds = model.predict(X)
-    preds = decode_target(preds)  # -> -1, 0, 1
-    proba = model.predict_proba(X)
+    with span("inference", rows=len(X)):
+        preds = model.predict(X)
+        preds = decode_target(preds)  # -> -1, 0, 1
+        proba = model.predict_proba(X)
     conf = proba.max(axis=1)
+    if return_proba:
+        return preds, conf, proba
     return preds, conf
 
 
-def backtest_hedging(df, signals, conf, sl_mult=1.5, tp_mult=2.5,
-                     initial_balance=INITIAL_BALANCE,
-                     position_size=POSITION_SIZE, conf_threshold=0.55, atr_norm_threshold=0.5, contr_size=1, lev=20, marg_limit=0.5):
-    balance = initial_balance
-    equity_curve = []
-    open_trades = []  # list of dicts
-    trade_log = []
-    used_margin = 0
-
-    prices = df["close"].values
-    highs = df["high"].values
-    lows = df["low"].values
-    atr = df["atr"].values
-    index = df.index
-
-    atr_norm = (df["atr"] / df["close"]).values
-
-
-    for i in range(1, len(df)):
-        price = prices[i]
-        bar_high = highs[i]
-        bar_low = lows[i]
-        bar_time = index[i]
-
-        # 1) Update open trades (check SL/TP)
-        still_open = []
-        for trade in open_trades:
-            if trade["direction"] == 1:  # long
-                tp = trade["entry_price"] + tp_mult * trade["atr"]
-                sl = trade["entry_price"] - sl_mult * trade["atr"]
-
-                hit_tp = bar_high >= tp
-                hit_sl = bar_low <= sl
-
-                if hit_tp or hit_sl:
-                    exit_price = tp if hit_tp else sl
-                    pnl_points = (exit_price - trade["entry_price"])
-                    pnl = pnl_points * trade["size"]
-                    balance += pnl
-
-                    used_margin -= trade['margin']
-
-                    trade["exit_time"] = bar_time
-                    trade["exit_price"] = exit_price
-                    trade["pnl"] = pnl
-                    trade["pnl_points"] = pnl_points
-                    trade["holding_bars"] = i - trade["entry_index"]
-                    trade_log.append(trade)
-                else:
-                    still_open.append(trade)
-
-            elif trade["direction"] == -1:  # short
-                tp = trade["entry_price"] - tp_mult * trade["atr"]
-                sl = trade["entry_price"] + sl_mult * trade["atr"]
-
-                hit_tp = bar_low <= tp
-                hit_sl = bar_high >= sl
-
-                if hit_tp or hit_sl:
-                    exit_price = tp if hit_tp else sl
-                    pnl_points = (trade["entry_price"] - exit_price)
-                    pnl = pnl_points * trade["size"]
-                    balance += pnl
-
-                    used_margin -= trade['margin']
-
-                    trade["exit_time"] = bar_time
-                    trade["exit_price"] = exit_price
-                    trade["pnl"] = pnl
-                    trade["pnl_points"] = pnl_points
-                    trade["holding_bars"] = i - trade["entry_index"]
-                    trade_log.append(trade)
-                else:
-                    still_open.append(trade)
-
-        open_trades = still_open
-
-        # 2) Open new trade if signal != 0
-        sig = signals[i]
-        c = conf[i]
-        vol = atr_norm[i]
-
-        # Skip low-volatility trades
-        if vol < atr_norm_threshold:
-            continue
+class HedgingSimulator:
+    """
+    The backtest_hedging simulation with its state (balance, margin, open trades, logs)
+    on the object, so bars can be fed in consecutive chunks:
+
+    sim = HedgingSimulator(sl_mult=1.5, ...)
+    sim.run(df_chunk, signals, conf, offset=bars_seen)   # offset: position of df_chunk[0]
+    sim.close_open(last_price, n_bars)                    # after the last chunk
+    """
+
+    def __init__(self, sl_mult=1.5, tp_mult=2.5, initial_balance=INITIAL_BALANCE, position_size=POSITION_SIZE,
+                 conf_threshold=0.55, atr_norm_threshold=0.5, contr_size=1, lev=20, marg_limit=0.5, limits=None,
+                 intrabar=None):
+        self.sl_mult = sl_mult
+        self.tp_mult = tp_mult
+        self.position_size = position_size
+        self.conf_threshold = conf_threshold
+        self.atr_norm_threshold = atr_norm_threshold
+        self.contr_size = contr_size
+        self.lev = lev
+        self.marg_limit = marg_limit
+        self.book = PositionBook(limits) if limits is not None and limits.active else None
+        self.intrabar = intrabar
+
+        self.balance = initial_balance
+        self.used_margin = 0
+        # open trades: (entry_index, entry_price, direction, size, atr, confidence, atr_norm, margin, tp, sl)
+        self.open_trades = []
+        self.trade_log = None      # TradeLog, typed on the first chunk
+        self.equity_log = EquityLog()
+
+    def run(self, df, signals, conf, offset=0):
+        """Simulate the bars of df; trade and equity positions are offset + row (bar 0 only seeds)."""
+        sl_mult, tp_mult = self.sl_mult, self.tp_mult
+        position_size, contr_size, lev = self.position_size, self.contr_size, self.lev
+        conf_threshold, atr_norm_threshold, marg_limit = self.conf_threshold, self.atr_norm_threshold, self.marg_limit
+        book = self.book
+        intrabar = self.intrabar
+        balance = self.balance
+        used_margin = self.used_margin
+        open_trades = self.open_trades
+
+        prices = df["close"].values
+        highs = df["high"].values
+        lows = df["low"].values
+        atr = df["atr"].values
+        signals = np.asarray(signals)
+        conf = np.asarray(conf)
+
+        atr_norm = (df["atr"] / df["close"]).values
+        # bar open times (UTC ns), only looked up for bars that hit both SL and TP
+        bar_times = (df.index if df.index.tz is None else df.index.tz_convert("UTC")).asi8 \
+            if intrabar is not None else None
+
+        if self.trade_log is None:
+            self.trade_log = TradeLog(prices.dtype, atr.dtype, signals.dtype, conf.dtype, atr_norm.dtype,
+                                      position_size, np.result_type(prices.dtype, position_size, contr_size, lev))
+        trade_log = self.trade_log
+        equity_log = self.equity_log
+
+        for j in range(1 if offset == 0 else 0, len(df)):
+            i = offset + j
+            price = prices[j]
+            bar_high = highs[j]
+            bar_low = lows[j]
+
+            # 1) Update open trades (check SL/TP)
+            if open_trades:
+                still_open = []
+                for trade in open_trades:
+                    entry_index, entry_price, direction, size, trade_atr, c, vol, margin, tp, sl = trade
+                    if direction == 1:  # long
+                        hit_tp = bar_high >= tp
+                        hit_sl = bar_low <= sl
+                    else:  # short
+                        hit_tp = bar_low <= tp
+                        hit_sl = bar_high >= sl
+
+                    if hit_tp and hit_sl and intrabar is not None:
+                        hit_tp = intrabar.tp_first(bar_times[j], direction, tp, sl)
+
+                    if hit_tp or hit_sl:
+                        exit_price = tp if hit_tp else sl
+                        pnl_points = (exit_price - entry_price) if direction == 1 else (entry_price - exit_price)
+                        pnl = pnl_points * size
+                        balance += pnl
+
+                        used_margin -= margin
+                        if book is not None:
+                            book.close(entry_index)
+
+                        trade_log.append((entry_index, entry_price, direction, size, trade_atr, c, vol, margin,
+                                          i, exit_price, pnl, pnl_points, i - entry_index))
+                    else:
+                        still_open.append(trade)
+                open_trades = still_open
+
+            # 2) Open new trade if signal != 0
+            sig = signals[j]
+            c = conf[j]
+            vol = atr_norm[j]
+
+            # Skip low-volatility trades
+            if vol < atr_norm_threshold:
+                continue
 
-        if c < conf_threshold:
-            continue
-        if sig != 0 and not np.isnan(atr[i]) and atr[i] > 0:
-            trade_margin = (price * position_size * contr_size) / lev
-            max_allowed_margin = balance * marg_limit
-            if used_margin + trade_margin > max_allowed_margin:
+            if c < conf_threshold:
                 continue
-            trade = {
-                "entry_time": bar_time,
-                "entry_index": i,
-                "entry_price": price,
-                "direction": sig,  # 1 long, -1 short
-                "size": position_size,
-                "atr": atr[i],
-                'confidence': c,
-                'atr_norm': vol,
-                'margin': trade_margin,
-            }
-            open_trades.append(trade)
-            used_margin += trade_margin
-
-        # 3) Track equity
-        equity_curve.append({"time": bar_time, "equity": balance})
+            if sig != 0 and not np.isnan(atr[j]) and atr[j] > 0:
+                trade_margin = (price * position_size * contr_size) / lev
+                max_allowed_margin = balance * marg_limit
+                if used_margin + trade_margin > max_allowed_margin:
+                    continue
+                if book is not None:
+                    notional = price * position_size * contr_size
+                    if book.limit_reason(sig, notional, balance) is not None:
+                        continue
+                    book.open(i, sig, notional)
+                # SL/TP levels are fixed at entry
+                if sig == 1:
+                    tp = price + tp_mult * atr[j]
+                    sl = price - sl_mult * atr[j]
+                else:
+                    tp = price - tp_mult * atr[j]
+                    sl = price + sl_mult * atr[j]
+                open_trades.append((i, price, sig, position_size, atr[j], c, vol, trade_margin, tp, sl))
+                used_margin += trade_margin
+
+            # 3) Track equity
+            equity_log.append((i, balance))
+
+        self.balance = balance
+        self.used_margin = used_margin
+        self.open_trades = open_trades
+        return self
+
+    def close_open(self, last_price, n_bars):
+        """Close the remaining trades at the last price (bar n_bars - 1)."""
+        balance = self.balance
+        for entry_index, entry_price, direction, size, trade_atr, c, vol, margin, _, _ in self.open_trades:
+            if direction == 1:
+                pnl_points = last_price - entry_price
+            else:
+                pnl_points = entry_price - last_price
+            pnl = pnl_points * size
+            balance += pnl
+
+            self.trade_log.append((entry_index, entry_price, direction, size, trade_atr, c, vol, margin,
+                                   n_bars - 1, last_price, pnl, pnl_points, n_bars - entry_index))
+        self.balance = balance
+        self.open_trades = []
+        return self
+
+
+@timed("backtest_hedging")
+def backtest_hedging(df, signals, conf, sl_mult=1.5, tp_mult=2.5,
+                     initial_balance=INITIAL_BALANCE,
+                     position_size=POSITION_SIZE, conf_threshold=0.55, atr_norm_threshold=0.5, contr_size=1, lev=20, marg_limit=0.5,
+                     limits=None, return_arrays=False, intrabar=None):
+    """
+    limits: optional execution.position_manager.PositionLimits (max positions per
+    direction, exposure cap vs balance), checked with the same PositionBook as live trading.
+    return_arrays: return the equity and trade logs as NumPy structured arrays (bar
+    positions instead of times, see backtesting/trade_log.py) instead of DataFrames.
+    intrabar: optional backtesting.intrabar.IntrabarResolver; bars that hit both SL and TP
+    are resolved from lower-timeframe data instead of always taking TP.
+    For histories that do not fit in memory see backtesting/chunked_backtest.py.
+    """
+    sim = HedgingSimulator(sl_mult, tp_mult, initial_balance, position_size, conf_threshold,
+                           atr_norm_threshold, contr_size, lev, marg_limit, limits, intrabar)
+    sim.run(df, signals, conf)
 
     # Close remaining trades at last price (optional)
-    last_price = prices[-1]
-    last_time = index[-1]
-    for trade in open_trades:
-        if trade["direction"] == 1:
-            pnl_points = last_price - trade["entry_price"]
-        else:
-            pnl_points = trade["entry_price"] - last_price
-        pnl = pnl_points * trade["size"]
-        balance += pnl
-
-        trade["exit_time"] = last_time
-        trade["exit_price"] = last_price
-        trade["pnl"] = pnl
-        trade["pnl_points"] = pnl_points
-        trade["holding_bars"] = len(df) - trade["entry_index"]
-        trade_log.append(trade)
-
-    equity_df = pd.DataFrame(equity_curve).set_index("time")
-    trades_df = pd.DataFrame(trade_log)
-
-    return balance, equity_df, trades_df
+    sim.close_open(df["close"].values[-1], len(df))
+
+    if return_arrays:
+        return sim.balance, sim.equity_log.arrays().copy(), sim.trade_log.arrays().copy()
+    return sim.balance, sim.equity_log.frame(df.index), sim.trade_log.frame(df.index)
 
 def print_backtest_summary(final_balance, trades_df, initial_balance, tf):
     timeframe_map = {
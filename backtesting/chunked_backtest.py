@@ -0,0 +1,242 @@
+# backtesting/chunked_backtest.py
+# Out-of-core backtest for long (multi-year M1) histories: bars are read, featurized,
+# scored and simulated one chunk at a time. Each chunk is featurized with a warm-up of
+# earlier bars that is then discarded, the HedgingSimulator carries balance, margin and
+# open trades across chunk boundaries, and trades / equity are written to disk per chunk.
+# Peak memory follows the chunk size, not the history length.
+#
+# Exactness: bar selection, the simulation columns (close/high/low/atr) and EWM-based
+# features (EMAs, ATR, RSI, MACD) are bit-identical to build_features over the whole
+# history (the warm-up is 2 x lookback, past the point where the recursions coincide).
+# Rolling-window statistics (std, Bollinger, stochastic %D) can differ in the last bit,
+# since pandas' sliding sums depend on where the series starts; the models see float32
+# inputs, so signals and confidences match in practice. Check with compare_in_memory().
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backtesting.backtest_engine import HedgingSimulator, backtest_hedging, generate_signals
+from backtesting.trade_log import equity_frame, trades_frame
+from features.feature_engineering import build_features
+from features.feature_graph import FEATURE_ORDER, lookback
+from features.regime.regime_detector import RegimeDetector
+from utils.config import BACKTEST_CHUNK_BARS, COMPACT_FEATURES, HTF_TIMEFRAMES, REGIME_FEATURE
+from utils.logger import incr, span, timed
+
+WARMUP_FACTOR = 2
+
+
+# ---------------------------------------------------------
+# Bar sources
+# ---------------------------------------------------------
+class FrameBars:
+    """Bars from a DataFrame (already in memory, or memory-mapped)."""
+
+    def __init__(self, df):
+        self.df = df
+
+    def __len__(self):
+        return len(self.df)
+
+    def rows(self, lo, hi):
+        return self.df.iloc[lo:hi]
+
+
+class StoredBars:
+    """Bars from a data_loader.bar_store.BarStore; each chunk reads only its rows."""
+
+    def __init__(self, store, symbol, timeframe, start=None, end=None):
+        self.store = store
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.lo, self.hi = store.slice_bounds(symbol, timeframe, start, end)
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    def rows(self, lo, hi):
+        return self.store.rows(self.symbol, self.timeframe, self.lo + lo, self.lo + hi)
+
+
+class _ChunkRegime:
+    """An online RegimeDetector shared by all chunks: warm-up bars it has already seen are not fed again."""
+
+    online = True
+
+    def __init__(self, detector):
+        self.detector = detector
+
+    def stream(self, df):
+        # rows seen in an earlier chunk are warm-up here and get discarded anyway
+        return self.detector.stream(df).reindex(df.index, fill_value=0)
+
+
+def warmup_bars(params=None, htf=(), timeframe=None, regime=False):
+    features = list(FEATURE_ORDER)
+    if regime:
+        from features.regime.regime_detector import REGIME_INPUTS
+
+        features += [n for n in REGIME_INPUTS if n not in features]
+    bars = lookback(features, params)
+    if htf:
+        from features.multi_timeframe import TIMEFRAME_MINUTES, htf_lookback
+
+        if timeframe is None:
+            raise ValueError("timeframe (of the bars) is required with htf.")
+        bars = max(bars, htf_lookback(htf, params, base_tf=TIMEFRAME_MINUTES[timeframe]))
+    return WARMUP_FACTOR * bars
+
+
+# ---------------------------------------------------------
+# Results on disk
+# ---------------------------------------------------------
+class ChunkWriter:
+    """<out_dir>/part_NNNNN.npz per chunk (trades, equity, their times in UTC ns) + meta.json."""
+
+    def __init__(self, out_dir):
+        self.dir = Path(out_dir)
+        if self.dir.exists():
+            shutil.rmtree(self.dir)
+        self.dir.mkdir(parents=True)
+        self.parts = 0
+        self.entry_ns = {}      # entry bar -> time, for trades still open at a chunk boundary
+
+    def write(self, sim, times, offset):
+        """Drain the simulator logs; times: UTC ns of the chunk's bars, offset: position of the first."""
+        trades = sim.trade_log.drain()
+        equity = sim.equity_log.drain()
+
+        entry = trades["entry_index"]
+        entry_ns = np.empty(len(trades), dtype=np.int64)
+        here = entry >= offset
+        entry_ns[here] = times[entry[here] - offset]
+        entry_ns[~here] = [self.entry_ns.pop(int(e)) for e in entry[~here]]
+        for trade in sim.open_trades:
+            if trade[0] >= offset:
+                self.entry_ns[trade[0]] = times[trade[0] - offset]
+
+        np.savez(self.dir / f"part_{self.parts:05d}.npz", trades=trades, entry_time=entry_ns,
+                 exit_time=times[trades["exit_index"] - offset], equity=equity["equity"],
+                 equity_time=times[equity["bar"] - offset])
+        self.parts += 1
+
+    def finish(self, balance, tz, n_bars):
+        (self.dir / "meta.json").write_text(json.dumps(
+            {"balance": float(balance), "tz": tz, "n_bars": int(n_bars), "parts": self.parts}))
+
+
+def _times(ns, tz):
+    index = pd.DatetimeIndex(ns.view("datetime64[ns]"))
+    return index.tz_localize("UTC").tz_convert(tz) if tz is not None else index
+
+
+def load_results(out_dir):
+    """(final balance, equity_df, trades_df) as backtest_hedging returns them."""
+    out_dir = Path(out_dir)
+    meta = json.loads((out_dir / "meta.json").read_text())
+    parts = [np.load(out_dir / f"part_{k:05d}.npz") for k in range(meta["parts"])]
+    cat = lambda key: np.concatenate([p[key] for p in parts])  # noqa: E731
+    trades = cat("trades")
+    equity = equity_frame(cat("equity"), _times(cat("equity_time"), meta["tz"]))
+    trades_df = trades_frame(trades, _times(cat("entry_time"), meta["tz"]), _times(cat("exit_time"), meta["tz"]))
+    return meta["balance"], equity, trades_df
+
+
+# ---------------------------------------------------------
+# Driver
+# ---------------------------------------------------------
+@timed("backtest_chunked")
+def backtest_chunked(bars, model, params, out_dir, chunk_bars=BACKTEST_CHUNK_BARS, future_n=20,
+                     compact=COMPACT_FEATURES, htf=HTF_TIMEFRAMES, htf_source=None, regime=REGIME_FEATURE,
+                     timeframe=None, **sim_kwargs):
+    """
+    backtest_hedging(build_features(all bars), generate_signals(...)) one chunk at a time.
+    bars: FrameBars / StoredBars; params, future_n, compact, htf, regime as build_features;
+    sim_kwargs: backtest_hedging settings (sl_mult, conf_threshold, limits, ...).
+    Trades and equity go to out_dir (read them back with load_results); returns the
+    final balance.
+    """
+    warmup = warmup_bars(params, htf, timeframe, regime)
+    if regime is True or getattr(regime, "online", False):
+        regime = _ChunkRegime(RegimeDetector(online=True) if regime is True else regime)
+    sim = HedgingSimulator(**sim_kwargs)
+    writer = ChunkWriter(out_dir)
+
+    n = len(bars)
+    offset = 0          # feature rows simulated so far (positions in the in-memory frame)
+    last = None         # (times, offset, last close) of the last non-empty chunk
+    tz = None
+    for pos in range(0, n, chunk_bars):
+        hi = min(pos + chunk_bars, n)
+        raw = bars.rows(max(pos - warmup, 0), hi)
+        start_time = raw.index[min(pos, warmup)]
+        with span("chunk.features", rows=len(raw)):
+            df = build_features(raw, params, future_n=future_n, compact=compact, htf=htf,
+                                htf_source=htf_source, regime=regime)
+        df = df[df.index >= start_time]
+        del raw
+        incr("backtest.chunks")
+        if df.empty:
+            continue
+
+        signals, conf = generate_signals(model, df)
+        sim.run(df, signals, conf, offset=offset)
+        times = df.index.asi8 if df.index.tz is None else df.index.tz_convert("UTC").asi8
+        tz = str(df.index.tz) if df.index.tz is not None else None
+        writer.write(sim, times, offset)
+        last = times, offset, df["close"].values[-1]
+        offset += len(df)
+        del df
+
+    if last is None:
+        raise ValueError("No feature rows: not enough bars for the indicator warm-up.")
+    times, last_offset, last_price = last
+    # Close remaining trades at last price, as backtest_hedging does
+    sim.close_open(last_price, offset)
+    writer.write(sim, times, last_offset)
+    writer.finish(sim.balance, tz, offset)
+    return sim.balance
+
+
+def compare_in_memory(df_raw, model, params, out_dir, future_n=20, compact=COMPACT_FEATURES,
+                      htf=HTF_TIMEFRAMES, regime=REGIME_FEATURE, timeframe=None, chunk_bars=BACKTEST_CHUNK_BARS,
+                      **sim_kwargs):
+    """
+    Both modes on bars that still fit in memory (regime: True, each run gets a fresh
+    detector); returns {"balance", "equity", "trades"}: exact equality of each result.
+    """
+    df = build_features(df_raw, params, future_n=future_n, compact=compact, htf=htf, regime=regime)
+    signals, conf = generate_signals(model, df)
+    balance, equity, trades = backtest_hedging(df, signals, conf, **sim_kwargs)
+    del df
+
+    backtest_chunked(FrameBars(df_raw), model, params, out_dir, chunk_bars=chunk_bars, future_n=future_n,
+                     compact=compact, htf=htf, regime=regime, timeframe=timeframe, **sim_kwargs)
+    chunked_balance, chunked_equity, chunked_trades = load_results(out_dir)
+    return {"balance": bool(balance == chunked_balance), "equity": equity.equals(chunked_equity),
+            "trades": trades.equals(chunked_trades)}
+
+
+if __name__ == "__main__":
+    from backtesting.backtest_engine import load_model, print_backtest_summary
+    from backtesting.intrabar import IntrabarResolver
+    from data_loader.bar_store import BarStore
+    from execution.position_manager import PositionLimits
+    from utils.config import (SYMBOL, TIMEFRAME, START_DATE, END_DATE, BAR_STORE_DIR, INITIAL_BALANCE,
+                              SL_ATR_MULT, TP_ATR_MULT, CONF_THRESHOLD, ATR_THRESHOLD, CONTRACT_SIZE, LEVERAGE,
+                              MARGIN_LIMIT, INTRABAR_TIMEFRAME)
+    from utils.params_io import load_best_params
+
+    store = BarStore(BAR_STORE_DIR)
+    out = Path("reports") / "chunked_backtest"
+    intrabar = IntrabarResolver.from_store(store, SYMBOL, TIMEFRAME, INTRABAR_TIMEFRAME) if INTRABAR_TIMEFRAME else None
+    balance = backtest_chunked(StoredBars(store, SYMBOL, TIMEFRAME, START_DATE, END_DATE), load_model(),
+                               load_best_params(), out, timeframe=TIMEFRAME, htf_source=store.loader(SYMBOL),
+                               sl_mult=SL_ATR_MULT, tp_mult=TP_ATR_MULT, conf_threshold=CONF_THRESHOLD,
+                               atr_norm_threshold=ATR_THRESHOLD, contr_size=CONTRACT_SIZE, lev=LEVERAGE,
+                               marg_limit=MARGIN_LIMIT, limits=PositionLimits.from_config(), intrabar=intrabar)
+    _, _, trades_df = load_results(out)
+    print_backtest_summary(balance, trades_df, INITIAL_BALANCE, TIMEFRAME)
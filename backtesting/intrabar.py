@@ -0,0 +1,93 @@
+# backtesting/intrabar.py
+# Intrabar SL/TP resolution: when one bar's range covers both the TP and the SL of an open
+# trade, the bar alone cannot say which was hit first. IntrabarResolver looks up the
+# lower-timeframe bars (M1, or any finer series in the bar store) inside that bar and walks
+# them in order. The lower-timeframe columns stay memory-mapped and each lookup is two
+# binary searches on the time column, so only the ambiguous bars are ever read.
+import numpy as np
+
+from features.multi_timeframe import TIMEFRAME_MINUTES
+from utils.config import INTRABAR_TIE
+from utils.logger import incr
+
+TIE_RULES = ("sl", "tp", "open")
+_NS_PER_MINUTE = 60 * 1_000_000_000
+
+
+class IntrabarResolver:
+    """
+    intrabar = IntrabarResolver.from_store(BarStore(BAR_STORE_DIR), SYMBOL, "M15", "M1")
+    backtest_hedging(df, signals, conf, ..., intrabar=intrabar)
+    intrabar.stats      # {"resolved": ..., "tie": ..., "missing": ...}
+
+    tie: rule when one lower-timeframe bar still covers both levels (or the bar has no
+    lower-timeframe data): "sl" (pessimistic), "tp" (the plain backtest's rule) or "open"
+    (the level nearer to that bar's open).
+    """
+
+    def __init__(self, times, opens, highs, lows, bar_minutes, tie=INTRABAR_TIE):
+        if tie not in TIE_RULES:
+            raise ValueError(f"tie must be one of {TIE_RULES}, got {tie!r}")
+        self.times = times          # UTC ns, ascending
+        self.opens = opens
+        self.highs = highs
+        self.lows = lows
+        self.bar_ns = int(bar_minutes * _NS_PER_MINUTE)
+        self.tie = tie
+        self.stats = {"resolved": 0, "tie": 0, "missing": 0}
+
+    @classmethod
+    def from_store(cls, store, symbol, bar_timeframe, timeframe="M1", tie=INTRABAR_TIE):
+        """Lower-timeframe bars of a data_loader.bar_store.BarStore (memory-mapped, not loaded)."""
+        if TIMEFRAME_MINUTES[timeframe] >= TIMEFRAME_MINUTES[bar_timeframe]:
+            raise ValueError(f"Intrabar timeframe {timeframe} must be finer than {bar_timeframe}.")
+        if not store.has(symbol, timeframe):
+            raise FileNotFoundError(f"No stored bars for {symbol} {timeframe} in {store.root}")
+        path = store.path(symbol, timeframe)
+        cols = {c: np.load(path / f"{c}.npy", mmap_mode="r") for c in ("time", "open", "high", "low")}
+        return cls(cols["time"], cols["open"], cols["high"], cols["low"], TIMEFRAME_MINUTES[bar_timeframe], tie)
+
+    @classmethod
+    def from_frame(cls, df, bar_timeframe, tie=INTRABAR_TIE):
+        """Lower-timeframe bars already in memory (open/high/low columns, time index)."""
+        index = df.index if df.index.tz is None else df.index.tz_convert("UTC")
+        return cls(index.asi8, df["open"].to_numpy(), df["high"].to_numpy(), df["low"].to_numpy(),
+                   TIMEFRAME_MINUTES[bar_timeframe], tie)
+
+    def tp_first(self, bar_time, direction, tp, sl):
+        """True if TP was hit before SL inside the bar opened at bar_time (UTC ns)."""
+        lo = int(np.searchsorted(self.times, bar_time, side="left"))
+        hi = int(np.searchsorted(self.times, bar_time + self.bar_ns, side="left"))
+        if lo == hi:
+            self.stats["missing"] += 1
+            incr("intrabar.missing")
+            return self.tie != "sl"     # "open" has no open to compare with: keep the plain rule
+
+        highs = np.asarray(self.highs[lo:hi])
+        lows = np.asarray(self.lows[lo:hi])
+        if direction == 1:
+            tp_hit = highs >= tp
+            sl_hit = lows <= sl
+        else:
+            tp_hit = lows <= tp
+            sl_hit = highs >= sl
+        first_tp = int(tp_hit.argmax()) if tp_hit.any() else hi - lo
+        first_sl = int(sl_hit.argmax()) if sl_hit.any() else hi - lo
+        if first_tp != first_sl:
+            self.stats["resolved"] += 1
+            incr("intrabar.resolved")
+            return first_tp < first_sl
+
+        # both levels inside one lower-timeframe bar (or neither: data disagrees with the bar)
+        self.stats["tie"] += 1
+        incr("intrabar.tie")
+        k = lo + min(first_tp, hi - lo - 1)
+        bar_open = float(self.opens[k])
+        # a gap through a level at the open decides it
+        if (bar_open - tp) * direction >= 0:
+            return True
+        if (sl - bar_open) * direction >= 0:
+            return False
+        if self.tie == "open":
+            return abs(tp - bar_open) <= abs(bar_open - sl)
+        return self.tie == "tp"
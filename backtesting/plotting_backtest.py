@@ -1,21 +1,26 @@
-import matplotlib
-matplotlib.use("TkAgg")
 import matplotlib.pyplot as plt
 
+from utils.plotting import configure_backend, show_or_save
+
+configure_backend()
+
+
 def plot_equity_and_trades(df, equity_df, trades_df, title="Backtest"):
     fig, (ax_price, ax_eq) = plt.subplots(2, 1, figsize=(14, 8), sharex=True)
 
     # Price
     ax_price.plot(df.index, df["close"], label="Close", color="black", linewidth=1)
 
-    # Mark trades
-    for _, tr in trades_df.iterrows():
-        color = "green" if tr["direction"] == 1 else "red"
-        ax_price.scatter(tr["entry_time"], tr["entry_price"],
-                         marker="^" if tr["direction"] == 1 else "v",
-                         color=color, s=30)
-        ax_price.scatter(tr["exit_time"], tr["exit_price"],
-                         marker="x", color=color, s=30)
+    # Mark trades: one scatter call per direction and side
+    if len(trades_df) > 0:
+        for direction, color, marker in ((1, "green", "^"), (-1, "red", "v")):
+            side = trades_df[trades_df["direction"] == direction]
+            if side.empty:
+                continue
+            ax_price.scatter(side["entry_time"], side["entry_price"],
+                             marker=marker, color=color, s=30)
+            ax_price.scatter(side["exit_time"], side["exit_price"],
+                             marker="x", color=color, s=30)
 
     ax_price.set_title(f"{title} - Price & Trades")
     ax_price.legend()
@@ -26,4 +31,4 @@ def plot_equity_and_trades(df, equity_df, trades_df, title="Backtest"):
     ax_eq.legend()
 
     plt.tight_layout()
-    plt.show()
+    return show_or_save(fig, title)
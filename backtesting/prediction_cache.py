@@ -0,0 +1,99 @@
+# backtesting/prediction_cache.py
+# On-disk cache of model outputs for backtests. Thresholds, SL/TP multipliers and margin
+# settings only change the simulation, so the class predictions and probabilities of a
+# (model artifact, feature params, data) triple are stored once as raw .npy arrays and a
+# rerun after a config edit goes straight to backtest_hedging.
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backtesting.backtest_engine import MODEL_PATH, generate_signals
+from features.feature_engineering import build_features
+from utils.config import COMPACT_FEATURES, HTF_TIMEFRAMES, REGIME_FEATURE, PREDICTION_CACHE_DIR
+from utils.fingerprint import canonical_hash, data_fingerprint, file_fingerprint
+from utils.logger import incr, span
+
+SIM_COLUMNS = ("close", "high", "low", "atr")  # what backtest_hedging (and the plots) read
+
+
+class PredictionCache:
+    """
+    cache = PredictionCache("data/predictions")
+    key = cache.key(model_path, feature_params, df_raw)
+    hit = cache.get(key)                  # (sim frame, signals, conf, proba) or None
+    cache.put(key, df_feat, signals, proba)
+    """
+
+    def __init__(self, root=PREDICTION_CACHE_DIR):
+        self.root = Path(root)
+
+    @staticmethod
+    def key(model_path, feature_params, df_raw):
+        features = {"params": feature_params, "compact": COMPACT_FEATURES, "htf": HTF_TIMEFRAMES,
+                    "regime": REGIME_FEATURE}
+        return canonical_hash(file_fingerprint(model_path), features, data_fingerprint(df_raw))
+
+    def path(self, key):
+        return self.root / key
+
+    def get(self, key):
+        path = self.path(key)
+        if not (path / "meta.json").exists():
+            incr("prediction_cache.miss")
+            return None
+        meta = json.loads((path / "meta.json").read_text())
+        index = pd.DatetimeIndex(np.load(path / "index.npy").view("datetime64[ns]"), name=meta["index_name"])
+        if meta["tz"] is not None:
+            index = index.tz_localize("UTC").tz_convert(meta["tz"])
+        df = pd.DataFrame({c: np.load(path / f"{c}.npy") for c in meta["columns"]}, index=index)
+        signals = np.load(path / "signals.npy")
+        proba = np.load(path / "proba.npy")
+        incr("prediction_cache.hit")
+        return df, signals, proba.max(axis=1), proba
+
+    def put(self, key, df, signals, proba):
+        """Stores the SIM_COLUMNS of df, signals (-1/0/1) and the class probabilities."""
+        path = self.path(key)
+        tmp = path.with_name(f".{key}.{os.getpid()}.tmp")
+        tmp.mkdir(parents=True, exist_ok=True)
+        columns = [c for c in SIM_COLUMNS if c in df.columns]
+        for c in columns:
+            np.save(tmp / f"{c}.npy", df[c].to_numpy())
+        np.save(tmp / "signals.npy", np.asarray(signals))
+        np.save(tmp / "proba.npy", np.asarray(proba))
+        index = df.index
+        np.save(tmp / "index.npy", np.asarray(index.asi8, dtype=np.int64))
+        tz = str(index.tz) if getattr(index, "tz", None) is not None else None
+        # meta.json last: a directory without it is never read
+        (tmp / "meta.json").write_text(json.dumps({"columns": columns, "tz": tz, "index_name": index.name}))
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        return path
+
+
+def cached_predictions(df_raw, feature_params, model_loader, model_path=MODEL_PATH, cache=None):
+    """
+    (df, signals, conf) for backtest_hedging, df holding the SIM_COLUMNS. With a cache, a
+    hit skips build_features, the model load and inference; cache=None always computes.
+    """
+    key = cache.key(model_path, feature_params, df_raw) if cache is not None else None
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            print("Using cached predictions.")
+            df, signals, conf, _ = hit
+            return df, signals, conf
+
+    print("Building features...")
+    df = build_features(df_raw, feature_params, compact=COMPACT_FEATURES, htf=HTF_TIMEFRAMES,
+                        regime=REGIME_FEATURE)
+    model = model_loader()
+    signals, conf, proba = generate_signals(model, df, return_proba=True)
+    if key is not None:
+        with span("prediction_cache.put", rows=len(df)):
+            cache.put(key, df, signals, proba)
+    return df[[c for c in SIM_COLUMNS if c in df.columns]], signals, conf
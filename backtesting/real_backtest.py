@@ -1,17 +1,32 @@
-from backtesting.backtest_engine import prepare_data, load_model, generate_signals, backtest_hedging, \
-    print_backtest_summary
+from backtesting.backtest_engine import load_model, backtest_hedging, print_backtest_summary
 from backtesting.plotting_backtest import plot_equity_and_trades
+from backtesting.intrabar import IntrabarResolver
+from backtesting.prediction_cache import PredictionCache, cached_predictions
+from data_loader.bar_store import BarStore
+from data_loader.mt5_loader import load_data
+from execution.position_manager import PositionLimits
 from utils.config import (SYMBOL, TIMEFRAME, START_DATE, END_DATE, INITIAL_BALANCE, POSITION_SIZE,
                           SL_ATR_MULT, TP_ATR_MULT, CONF_THRESHOLD, ATR_THRESHOLD,
-                          MARGIN_LIMIT, LEVERAGE, CONTRACT_SIZE)
+                          MARGIN_LIMIT, LEVERAGE, CONTRACT_SIZE, PREDICTION_CACHE_DIR,
+                          BAR_STORE_DIR, INTRABAR_TIMEFRAME)
+from utils.params_io import load_best_params
 from filters.diagnostics_filter import apply_diagnostics_filter, recompute_equity_from_trades, apply_diagnostics_mask
+from utils.plotting import render_figures
 
 
 def backtest_live_real(symbol, timeframe, start_date, end_date, sl_mult, tp_mult, conf_threshold, atr_threshold, contr_size, lev, m_limit):
-    df, _ = prepare_data(symbol, timeframe, start_date, end_date)
-    model = load_model()
+    print("Loading MT5 data...")
+    df_raw = load_data(symbol=symbol, timeframe=timeframe, start_date=start_date, end_date=end_date)
+    best_params = load_best_params()
 
-    signals, conf = generate_signals(model, df)
+    # features + inference only when the model, the feature params or the data changed
+    cache = PredictionCache(PREDICTION_CACHE_DIR) if PREDICTION_CACHE_DIR else None
+    df, signals, conf = cached_predictions(df_raw, best_params, load_model, cache=cache)
+
+    # bars hitting both SL and TP: which came first, from the stored lower-timeframe bars
+    intrabar = None
+    if INTRABAR_TIMEFRAME:
+        intrabar = IntrabarResolver.from_store(BarStore(BAR_STORE_DIR), symbol, timeframe, INTRABAR_TIMEFRAME)
 
     final_balance, equity_df, trades_df = backtest_hedging(
         df, signals, conf,
@@ -23,8 +38,12 @@ def backtest_live_real(symbol, timeframe, start_date, end_date, sl_mult, tp_mult
         atr_norm_threshold=atr_threshold,
         contr_size=contr_size,
         lev=lev,
-        marg_limit=m_limit
+        marg_limit=m_limit,
+        limits=PositionLimits.from_config(),
+        intrabar=intrabar
     )
+    if intrabar is not None:
+        print("Intrabar SL/TP resolution:", intrabar.stats)
 
     print("Trades before diagnostics filter:", len(trades_df))
     filtered_trades = apply_diagnostics_filter(trades_df)
@@ -34,9 +53,13 @@ def backtest_live_real(symbol, timeframe, start_date, end_date, sl_mult, tp_mult
 
     print_backtest_summary(final_balance, trades_df, INITIAL_BALANCE, TIMEFRAME)
     print_backtest_summary(filtered_balance, filtered_trades, INITIAL_BALANCE, TIMEFRAME)
-    plot_equity_and_trades(df, filtered_equity, filtered_trades, title=f"{symbol} {timeframe} (Filtered)")
-    plot_equity_and_trades(df, equity_df, trades_df,
-                           title=f"{symbol} {timeframe}")
+    price_df = df[["close"]]
+    render_figures([
+        (plot_equity_and_trades, (price_df, filtered_equity, filtered_trades),
+         {"title": f"{symbol} {timeframe} (Filtered)"}),
+        (plot_equity_and_trades, (price_df, equity_df, trades_df),
+         {"title": f"{symbol} {timeframe}"}),
+    ])
 
 if __name__ == "__main__":
     backtest_live_real(SYMBOL, TIMEFRAME, START_DATE, END_DATE, SL_ATR_MULT, TP_ATR_MULT,
@@ -0,0 +1,99 @@
+# backtesting/trade_log.py
+# Columnar logs for backtest_hedging: closed trades and equity points go into growable
+# NumPy structured arrays (one row write per trade, no dict per trade), and the
+# DataFrames are built once at the end. Bar times are stored as bar positions and only
+# turned into timestamps in frame().
+import numpy as np
+import pandas as pd
+
+TRADE_COLUMNS = (
+    "entry_time", "entry_index", "entry_price", "direction", "size", "atr", "confidence",
+    "atr_norm", "margin", "exit_time", "exit_price", "pnl", "pnl_points", "holding_bars",
+)
+
+
+class ColumnLog:
+    """Append-only structured array that doubles its capacity when full."""
+
+    def __init__(self, dtype, capacity=1024):
+        self.dtype = np.dtype(dtype)
+        self._data = np.empty(capacity, dtype=self.dtype)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def append(self, row):
+        """row: tuple in field order."""
+        if self._n == len(self._data):
+            grown = np.empty(2 * len(self._data), dtype=self.dtype)
+            grown[:self._n] = self._data
+            self._data = grown
+        self._data[self._n] = row
+        self._n += 1
+
+    def arrays(self):
+        """The rows written so far (a view)."""
+        return self._data[:self._n]
+
+    def drain(self):
+        """Copy of the rows written so far; the log starts over (capacity is kept)."""
+        rows = self._data[:self._n].copy()
+        self._n = 0
+        return rows
+
+
+class TradeLog(ColumnLog):
+    """
+    Closed trades, in the order they were closed. Field dtypes follow the inputs (prices,
+    ATR, signals, confidences), so frame() has the dtypes the list-of-dicts log had.
+    """
+
+    def __init__(self, price_dtype, atr_dtype, direction_dtype, conf_dtype, atr_norm_dtype, size, margin_dtype,
+                 capacity=1024):
+        exit_dtype = np.result_type(price_dtype, atr_dtype)
+        super().__init__([
+            ("entry_index", np.int64),
+            ("entry_price", price_dtype),
+            ("direction", direction_dtype),
+            ("size", np.result_type(size)),
+            ("atr", atr_dtype),
+            ("confidence", conf_dtype),
+            ("atr_norm", atr_norm_dtype),
+            ("margin", margin_dtype),
+            ("exit_index", np.int64),
+            ("exit_price", exit_dtype),
+            ("pnl", np.result_type(exit_dtype, size)),
+            ("pnl_points", exit_dtype),
+            ("holding_bars", np.int64),
+        ], capacity)
+
+    def frame(self, index):
+        """DataFrame with TRADE_COLUMNS, entry/exit times from the bar index."""
+        rows = self.arrays()
+        return trades_frame(rows, index[rows["entry_index"]], index[rows["exit_index"]])
+
+
+class EquityLog(ColumnLog):
+    """(bar position, equity) points."""
+
+    def __init__(self, capacity=1024):
+        super().__init__([("bar", np.int64), ("equity", np.float64)], capacity)
+
+    def frame(self, index):
+        rows = self.arrays()
+        return equity_frame(rows["equity"], index[rows["bar"]])
+
+
+def trades_frame(rows, entry_time, exit_time):
+    """TradeLog rows + their entry/exit times -> the backtest_hedging trades DataFrame."""
+    if not len(rows):
+        return pd.DataFrame()
+    columns = {name: rows[name] for name in rows.dtype.names if name != "exit_index"}
+    columns["entry_time"] = entry_time
+    columns["exit_time"] = exit_time
+    return pd.DataFrame({c: columns[c] for c in TRADE_COLUMNS})
+
+
+def equity_frame(equity, times):
+    return pd.DataFrame({"equity": equity}, index=pd.DatetimeIndex(times).rename("time"))
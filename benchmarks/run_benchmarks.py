@@ -0,0 +1,519 @@
+# benchmarks/run_benchmarks.py
+# Times every hot path on synthetic data. Runs without MetaTrader5.
+#
+#   python -m benchmarks.run_benchmarks                       # run and print
+#   python -m benchmarks.run_benchmarks --save                # store as baseline
+#   python -m benchmarks.run_benchmarks --compare             # fail on regressions vs baseline
+#   python -m benchmarks.run_benchmarks --cases build_features,backtest_hedging --sizes 10000,100000
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_ohlc, synthetic_signals, synthetic_deals
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+DEFAULT_SIZES = [5_000, 50_000, 200_000]
+
+# Small models keep trainer benchmarks about the training code path, not about tuning
+BENCH_XGB = {"n_estimators": 50, "max_depth": 4, "n_jobs": 1}
+BENCH_RF = {"n_estimators": 50, "max_depth": 6, "n_jobs": 1}
+BENCH_LGBM = {"n_estimators": 50, "num_leaves": 15, "n_jobs": 1, "verbose": -1}
+
+CASES = {}
+
+
+def case(name, max_size=None, repeat=3):
+    """Register a benchmark: fn(size) -> callable that runs the timed work once."""
+
+    def decorator(fn):
+        CASES[name] = {"setup": fn, "max_size": max_size, "repeat": repeat}
+        return fn
+
+    return decorator
+
+
+# ---------------------------------------------------------
+# Shared fixtures (cached per size so setup cost is paid once)
+# ---------------------------------------------------------
+_cache = {}
+
+
+def bars(size, timeframe="M5"):
+    key = ("bars", size, timeframe)
+    if key not in _cache:
+        _cache[key] = synthetic_ohlc(size, timeframe=timeframe, seed=42)
+    return _cache[key]
+
+
+def features(size):
+    key = ("features", size)
+    if key not in _cache:
+        from features.feature_engineering import build_features
+
+        _cache[key] = build_features(bars(size), params={}, future_n=20)
+    return _cache[key]
+
+
+def fitted_xgb(size):
+    key = ("xgb", size)
+    if key not in _cache:
+        from models.xgb_model import train_xgb
+
+        _cache[key] = train_xgb(features(size), BENCH_XGB)
+    return _cache[key]
+
+
+# ---------------------------------------------------------
+# Features
+# ---------------------------------------------------------
+@case("build_features")
+def bench_build_features(size):
+    from features.feature_engineering import build_features
+
+    df = bars(size)
+    return lambda: build_features(df, params={}, future_n=20)
+
+
+def _indicator_cases():
+    from features import indicators as ind
+
+    specs = {
+        "ema": lambda df: ind.ema(df["close"], 20),
+        "rsi": lambda df: ind.rsi(df["close"], 14),
+        "true_range": lambda df: ind.true_range(df["high"], df["low"], df["close"]),
+        "atr": lambda df: ind.atr(df["high"], df["low"], df["close"], 14),
+        "volatility_std": lambda df: ind.volatility_std(df["close"].pct_change(), 20),
+        "momentum": lambda df: ind.momentum(df["close"], 10),
+        "stochastic_oscillator": lambda df: ind.stochastic_oscillator(df["high"], df["low"], df["close"], 14, 3),
+        "macd": lambda df: ind.macd(df["close"], 12, 26, 9),
+        "bollinger_bands": lambda df: ind.bollinger_bands(df["close"], 20),
+        "candle_components": lambda df: ind.candle_components(df["open"], df["high"], df["low"], df["close"]),
+    }
+
+    for name, fn in specs.items():
+        def setup(size, fn=fn):
+            df = bars(size)
+            return lambda: fn(df)
+
+        case(f"indicator.{name}")(setup)
+
+
+_indicator_cases()
+
+
+@case("bb_squeeze_quantile")
+def bench_bb_squeeze(size):
+    # pandas reference for bb_squeeze_ranks
+    s = features(size)["bb_width_norm"]
+    return lambda: s < s.rolling(100).quantile(0.2)
+
+
+@case("bb_squeeze_ranks")
+def bench_bb_squeeze_ranks(size):
+    from features.rolling_quantile import below_rolling_quantile
+
+    values = features(size)["bb_width_norm"].to_numpy()
+    return lambda: below_rolling_quantile(values, 100, 0.2)
+
+
+@case("rolling_quantile_incremental", max_size=100_000)
+def bench_rolling_quantile_incremental(size):
+    from features.rolling_quantile import RollingQuantile
+
+    values = features(size)["bb_width_norm"].to_numpy()
+    return lambda: RollingQuantile(100, 0.2).update_many(values)
+
+
+@case("add_tp_sl_target")
+def bench_tp_sl_target(size):
+    from features.feature_engineering import add_tp_sl_target
+
+    df = features(size).drop(columns=["target"])
+    return lambda: add_tp_sl_target(df, sl_mult=2.0, tp_mult=2.0, future_n=20)
+
+
+# ---------------------------------------------------------
+# Models
+# ---------------------------------------------------------
+@case("train_xgb", max_size=50_000, repeat=1)
+def bench_train_xgb(size):
+    from models.xgb_model import train_xgb
+
+    df = features(size)
+    return lambda: train_xgb(df, BENCH_XGB)
+
+
+@case("train_rf", max_size=50_000, repeat=1)
+def bench_train_rf(size):
+    from models.rf_model import train_rf
+
+    df = features(size)
+    return lambda: train_rf(df, BENCH_RF)
+
+
+@case("train_lgbm", max_size=50_000, repeat=1)
+def bench_train_lgbm(size):
+    from models.lgbm_model import train_lgbm
+
+    df = features(size)
+    return lambda: train_lgbm(df, BENCH_LGBM)
+
+
+@case("generate_signals", max_size=50_000)
+def bench_generate_signals(size):
+    from backtesting.backtest_engine import generate_signals
+
+    df = features(size)
+    model = fitted_xgb(size)
+    return lambda: generate_signals(model, df)
+
+
+# ---------------------------------------------------------
+# Simulation / evaluation
+# ---------------------------------------------------------
+@case("backtest_hedging")
+def bench_backtest_hedging(size):
+    from backtesting.backtest_engine import backtest_hedging
+
+    df = features(size)
+    signals, conf = synthetic_signals(len(df), seed=1)
+    return lambda: backtest_hedging(
+        df, signals, conf, sl_mult=1.5, tp_mult=2.2, initial_balance=2000,
+        position_size=0.5, conf_threshold=0.5, atr_norm_threshold=0.0,
+        contr_size=1, lev=20, marg_limit=0.5,
+    )
+
+
+@case("walk_forward_backtest", max_size=20_000, repeat=1)
+def bench_walk_forward(size):
+    from evaluation.backtest import walk_forward_backtest
+    from models.xgb_model import train_xgb
+
+    df = features(size)
+    step = max(200, len(df) // 40)
+    return lambda: walk_forward_backtest(
+        model_fn=partial(train_xgb, params=BENCH_XGB),
+        df=df, train_ratio=0.7, step=step, conf_threshold=0.0,
+        atr_norm_threshold=0.0, unseen_ratio=0.1,
+    )
+
+
+# ---------------------------------------------------------
+# Account history / analytics
+# ---------------------------------------------------------
+@case("normalize_deals_to_trades", max_size=20_000, repeat=1)
+def bench_normalize_deals(size):
+    from data_loader.account_hystory import normalize_deals_to_trades
+
+    # size = number of positions
+    raw = synthetic_deals(size, seed=3)
+    return lambda: normalize_deals_to_trades(raw)
+
+
+def _trades(size):
+    key = ("trades", size)
+    if key not in _cache:
+        from data_loader.account_hystory import normalize_deals_to_trades
+
+        _cache[key] = normalize_deals_to_trades(synthetic_deals(size, seed=3))
+    return _cache[key]
+
+
+@case("build_equity_curve", max_size=20_000)
+def bench_equity_curve(size):
+    from analytics.utils import build_equity_curve
+
+    trades = _trades(size)
+    return lambda: build_equity_curve(trades, 10_000)
+
+
+@case("performance_report", max_size=20_000)
+def bench_performance_report(size):
+    from analytics.performance import generate_performance_report
+    from analytics.utils import build_equity_curve
+
+    trades = _trades(size)
+    equity = build_equity_curve(trades, 10_000)
+    return lambda: generate_performance_report(trades, equity)
+
+
+@case("generate_dashboard", max_size=20_000, repeat=1)
+def bench_dashboard(size):
+    from analytics.dashboard import generate_dashboard
+    from analytics.utils import build_equity_curve
+
+    trades = _trades(size)
+    equity = build_equity_curve(trades, 10_000)
+    out = os.path.join(tempfile.gettempdir(), "bench_dashboard.html")
+    return lambda: generate_dashboard(trades, equity, output_path=out)
+
+
+# ---------------------------------------------------------
+# Memory
+# ---------------------------------------------------------
+def peak_memory_mb(fn):
+    """Peak traced allocation (numpy buffers included) while fn runs, in MB."""
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1e6, result
+
+
+def feature_memory(n_bars=750_000, timeframe="M1"):
+    """
+    Peak memory of build_features in default vs compact mode.
+    750k M1 bars ~ 2 years of a 24/5 instrument.
+    """
+    from features.feature_engineering import build_features
+
+    raw = synthetic_ohlc(n_bars, timeframe=timeframe, seed=42)
+    print(f"Raw bars: {n_bars} {timeframe}, {raw.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+
+    results = {}
+    for compact in (False, True):
+        t0 = time.perf_counter()
+        peak, df = peak_memory_mb(lambda: build_features(raw, params={}, future_n=20, compact=compact))
+        elapsed = time.perf_counter() - t0
+        frame_mb = df.memory_usage(deep=True).sum() / 1e6
+        label = "compact" if compact else "default"
+        results[label] = {"peak_mb": peak, "frame_mb": frame_mb, "seconds": elapsed}
+        print(f"build_features {label:8} peak={peak:8.1f} MB  result={frame_mb:7.1f} MB  {elapsed:6.2f}s")
+        del df
+
+    return results
+
+
+def signal_to_order_latency(rtt_ms=5.0, n_orders=20):
+    """
+    Signal -> order latency of trade._act against a simulated broker with `rtt_ms` per
+    MT5 call: direct calls (account, tick, margin, order) vs the BrokerStateCache path
+    (fresh tick + order only).
+    """
+    import trade
+    from execution.broker_cache import BrokerStateCache
+    from execution.sim_broker import SimBroker
+
+    results = {}
+    for label in ("direct", "cached"):
+        sim = SimBroker(symbols=(trade.SYMBOL,), balance=1e9, latency=rtt_ms / 1000.0)
+        trade.mt5 = sim
+        broker = BrokerStateCache(sim, [trade.SYMBOL], account_ttl=60, tick_ttl=60).refresh() \
+            if label == "cached" else None
+
+        calls0 = sim.calls
+        times = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(n_orders):
+                t0 = time.perf_counter()
+                trade._act(i, 1, 1.0, 4000.0, 5.0, broker=broker)
+                times.append(time.perf_counter() - t0)
+        ms = 1000 * float(np.median(times))
+        calls = (sim.calls - calls0) / n_orders
+        results[label] = {"median_ms": ms, "calls_per_order": calls}
+        print(f"signal->order {label:7} median={ms:7.2f} ms  MT5 calls/order={calls:.1f}  (rtt {rtt_ms} ms)")
+    return results
+
+
+# ---------------------------------------------------------
+# Runner
+# ---------------------------------------------------------
+def fold_memory(n_bars=150_000, step=200):
+    """
+    Training data handed to the model per walk-forward fold: the old df.iloc[:start] +
+    drop(columns=["target"]) copies vs views into one FoldData matrix.
+    150k M5 bars ~ 2 years; step=200 as in the optimization objective.
+    """
+    from evaluation.splitter import FoldData, walk_forward_splits
+
+    df = features(n_bars)
+    n = len(df)
+    folds = walk_forward_splits(n, int(n * 0.7), step, end=int(n * 0.9), horizon=20)
+    print(f"{n} rows x {df.shape[1]} columns, {len(folds)} folds")
+
+    t0 = time.perf_counter()
+    copied = 0
+    for fold in folds:
+        a, b = fold.train[0]
+        train_df = df.iloc[a:b]
+        X = train_df.drop(columns=["target"])
+        copied += train_df.memory_usage().sum() + X.memory_usage().sum()
+        del train_df, X
+    old_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    peak, data = peak_memory_mb(lambda: FoldData.from_frame(df))
+    copies = 0
+    for fold in folds:
+        X, y = data.rows(fold.train)
+        copies += not (np.shares_memory(X, data.X) and np.shares_memory(y, data.y))
+    new_seconds = time.perf_counter() - t0
+
+    print(f"iloc + drop : {copied / 1e9:8.2f} GB copied over the study  {old_seconds:6.2f}s")
+    print(f"FoldData    : {data.nbytes() / 1e9:8.2f} GB once (peak {peak:.0f} MB), "
+          f"{copies} fold copies  {new_seconds:6.2f}s")
+    return {"copied_gb": copied / 1e9, "fold_data_gb": data.nbytes() / 1e9,
+            "old_seconds": old_seconds, "new_seconds": new_seconds}
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(case_names=None, sizes=None, repeat=None):
+    sizes = sizes or DEFAULT_SIZES
+    names = case_names or list(CASES)
+    results = {}
+
+    for name in names:
+        spec = CASES[name]
+        results[name] = {}
+        for size in sizes:
+            if spec["max_size"] is not None and size > spec["max_size"]:
+                continue
+            fn = spec["setup"](size)
+            seconds = _time(fn, repeat or spec["repeat"])
+            results[name][str(size)] = seconds
+            print(f"{name:36} n={size:<9} {seconds * 1000:10.1f} ms")
+            sys.stdout.flush()
+
+    return results
+
+
+def _meta():
+    import sklearn
+    import xgboost
+
+    return {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "xgboost": xgboost.__version__,
+    }
+
+
+def save_baseline(results, name="baseline"):
+    BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+    path = BASELINE_DIR / f"{name}.json"
+
+    # merge so partial runs (--cases) update only their entries
+    data = {"meta": _meta(), "results": {}}
+    if path.exists():
+        with open(path, "r") as f:
+            data["results"] = json.load(f).get("results", {})
+    for name_, per_size in results.items():
+        data["results"].setdefault(name_, {}).update(per_size)
+
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4)
+    print(f"Saved baseline to {path}")
+    return path
+
+
+def compare(results, name="baseline", tolerance=1.3):
+    """Returns the list of (case, size, baseline_s, current_s) that got slower than tolerance x baseline."""
+    path = BASELINE_DIR / f"{name}.json"
+    if not path.exists():
+        print(f"No baseline at {path}; run with --save first.")
+        return []
+
+    with open(path, "r") as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    print("\n=== Comparison vs baseline ===")
+    for case_name, per_size in results.items():
+        for size, seconds in per_size.items():
+            base = baseline.get(case_name, {}).get(size)
+            if base is None:
+                continue
+            ratio = seconds / base if base > 0 else float("inf")
+            flag = "REGRESSION" if ratio > tolerance else ""
+            print(f"{case_name:36} n={size:<9} {ratio:6.2f}x {flag}")
+            if flag:
+                regressions.append((case_name, size, base, seconds))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline hot paths on synthetic data.")
+    parser.add_argument("--cases", default=None, help="comma-separated case names (default: all)")
+    parser.add_argument("--sizes", default=None, help="comma-separated bar counts")
+    parser.add_argument("--repeat", type=int, default=None)
+    parser.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare with the baseline, exit 1 on regressions")
+    parser.add_argument("--baseline", default="baseline", help="baseline name under benchmarks/baselines/")
+    parser.add_argument("--tolerance", type=float, default=1.3)
+    parser.add_argument("--list", action="store_true", help="list cases and exit")
+    parser.add_argument("--memory", type=int, default=None, metavar="N_BARS",
+                        help="only measure build_features peak memory on N_BARS of M1 data")
+    parser.add_argument("--live-latency", type=float, default=None, metavar="RTT_MS",
+                        help="only measure signal->order latency against a simulated broker")
+    parser.add_argument("--fold-memory", type=int, default=None, metavar="N_BARS",
+                        help="only measure per-fold training-data copies of a walk-forward study")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in CASES:
+            print(name)
+        return 0
+
+    if args.memory:
+        feature_memory(args.memory)
+        return 0
+    if args.live_latency is not None:
+        signal_to_order_latency(args.live_latency)
+        return 0
+    if args.fold_memory:
+        fold_memory(args.fold_memory)
+        return 0
+
+    names = args.cases.split(",") if args.cases else None
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else None
+
+    unknown = [n for n in names or [] if n not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {unknown}")
+
+    results = run(names, sizes, args.repeat)
+
+    if args.save:
+        save_baseline(results, args.baseline)
+    if args.compare:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s).")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# benchmarks/synthetic.py
+# Reproducible synthetic market data shaped like the MT5 frames the pipeline consumes.
+import numpy as np
+import pandas as pd
+
+from features.multi_timeframe import TIMEFRAME_MINUTES
+from utils.config import LOCAL_TZ
+
+
+def _weekday_index(n_bars, minutes, start):
+    # Over-generate, then keep Monday-Friday bars only (no weekend data, like an index CFD)
+    candidates = int(n_bars * 7 / 5) + 7 * 1440 // minutes + 10
+    idx = pd.date_range(start, periods=candidates, freq=f"{minutes}min", tz="UTC")
+    idx = idx[idx.dayofweek < 5][:n_bars]
+    return idx
+
+
+def _intraday_vol_profile(hours):
+    # U-shape with a spike around the US cash open (~14:30 UTC) and a quiet Asian session
+    us_open = np.exp(-((hours - 14.5) / 1.5) ** 2)
+    eu_open = 0.5 * np.exp(-((hours - 8.0) / 1.0) ** 2)
+    return 0.5 + 1.2 * us_open + eu_open
+
+
+def synthetic_ohlc(
+    n_bars,
+    timeframe="M5",
+    seed=0,
+    start="2020-01-06",
+    start_price=4000.0,
+    annual_vol=0.18,
+    annual_drift=0.05,
+    jump_rate=0.002,
+    jump_scale=0.004,
+    substeps=4,
+):
+    """
+    GBM + Poisson jumps + intraday volatility seasonality, sampled into OHLC bars.
+    Each bar is simulated with `substeps` intrabar steps so high/low are consistent with open/close.
+    jump_rate: expected jumps per bar, jump_scale: std of the log jump size.
+    Returns a DataFrame with the MT5 columns (open, high, low, close, tick_volume, spread,
+    real_volume) indexed by LOCAL_TZ timestamps.
+    """
+    minutes = TIMEFRAME_MINUTES[timeframe]
+    rng = np.random.default_rng(seed)
+    idx = _weekday_index(n_bars, minutes, start)
+    n = len(idx)
+
+    hours = (idx.hour + idx.minute / 60.0).to_numpy(dtype=np.float64)
+    season = _intraday_vol_profile(hours) if minutes < 1440 else np.ones(n)
+
+    # per-substep volatility (trading year ~ 252 days of 24h for a CFD)
+    dt = minutes / (252 * 24 * 60) / substeps
+    sigma = annual_vol * np.sqrt(dt) * season[:, None]
+    mu = (annual_drift - 0.5 * annual_vol ** 2) * dt
+
+    steps = mu + sigma * rng.standard_normal((n, substeps))
+
+    n_jumps = rng.poisson(jump_rate, n)
+    jumps = np.where(n_jumps > 0, rng.normal(0.0, jump_scale, n) * np.sqrt(n_jumps), 0.0)
+    steps[:, 0] += jumps
+
+    log_path = np.log(start_price) + np.cumsum(steps.ravel()).reshape(n, substeps)
+    path = np.exp(log_path)
+
+    close = path[:, -1]
+    open_ = np.empty(n)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+    high = np.maximum(path.max(axis=1), open_)
+    low = np.minimum(path.min(axis=1), open_)
+
+    abs_ret = np.abs(np.log(close / open_))
+    tick_volume = rng.poisson(20 * season * minutes ** 0.5 + 5e4 * abs_ret).astype(np.uint64) + 1
+    spread = rng.integers(2, 8, n).astype(np.int32)
+
+    df = pd.DataFrame({
+        "open": open_.round(2),
+        "high": high.round(2),
+        "low": low.round(2),
+        "close": close.round(2),
+        "tick_volume": tick_volume,
+        "spread": spread,
+        "real_volume": np.zeros(n, dtype=np.uint64),
+    }, index=idx.tz_convert(LOCAL_TZ))
+    df.index.name = "time"
+    return df
+
+
+def synthetic_signals(n, seed=0, trade_rate=0.3):
+    """Random -1/0/1 signals with confidences, for simulation-only benchmarks."""
+    rng = np.random.default_rng(seed)
+    signals = rng.choice([-1, 0, 1], size=n, p=[trade_rate / 2, 1 - trade_rate, trade_rate / 2])
+    conf = rng.uniform(0.34, 0.9, n)
+    return signals, conf
+
+
+def synthetic_deals(n_trades, seed=0, symbol="[SP500]", start="2024-01-01"):
+    """
+    Raw MT5 deal history (history_deals_get frame): one entry (entry=0) and one exit (entry=1)
+    deal per position, as load_raw_account_history returns it.
+    """
+    rng = np.random.default_rng(seed)
+    open_time = pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.uniform(0, n_trades * 600, n_trades)), unit="s")
+    duration = pd.to_timedelta(rng.exponential(1800, n_trades), unit="s")
+    close_time = open_time + duration
+
+    position_id = np.arange(1, n_trades + 1, dtype=np.int64) + 1_000_000
+    side = rng.integers(0, 2, n_trades)
+    volume = np.full(n_trades, 0.5)
+    price_open = 4000 + rng.normal(0, 50, n_trades)
+    price_close = price_open + rng.normal(0, 5, n_trades)
+    profit = np.where(side == 0, price_close - price_open, price_open - price_close) * volume
+
+    def deals(times, entry, price, prof, types):
+        return pd.DataFrame({
+            "ticket": position_id * 10 + entry,
+            "order": position_id * 10 + entry,
+            "time": times,
+            "time_msc": times,
+            "type": types,
+            "entry": entry,
+            "magic": 123456,
+            "position_id": position_id,
+            "reason": 3,
+            "volume": volume,
+            "price": price,
+            "commission": 0.0,
+            "swap": 0.0,
+            "profit": prof,
+            "fee": 0.0,
+            "symbol": symbol,
+            "comment": "ML_live",
+            "external_id": "",
+        })
+
+    opens = deals(open_time, 0, price_open, 0.0, side)
+    closes = deals(close_time, 1, price_close, profit, 1 - side)
+    df = pd.concat([opens, closes], ignore_index=True)
+    return df.sort_values("time", kind="stable").reset_index(drop=True)
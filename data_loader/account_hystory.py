@@ -1,12 +1,17 @@
 # mt5_data/account_history.py
 
 from datetime import datetime
-import MetaTrader5 as mt5
+try:
+    import MetaTrader5 as mt5
+except ImportError:  # Windows-only package; normalize_deals_to_trades works without it
+    mt5 = None
 import pandas as pd
 
 
 def init_mt5():
     """Initialize connection to MetaTrader 5 terminal."""
+    if mt5 is None:
+        raise RuntimeError("MetaTrader5 package is not installed.")
     if not mt5.initialize():
         raise RuntimeError(f"MT5 initialize() failed, error code: {mt5.last_error()}")
 
@@ -72,7 +77,7 @@ def normalize_deals_to_trades(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def get_starting_balance(start, end):
-    if not mt5.initialize():
+    if mt5 is None or not mt5.initialize():
         raise RuntimeError("MT5 init failed")
 
     # Get all balance operations in the period
@@ -0,0 +1,138 @@
+# data_loader/bar_store.py
+# On-disk bar store: one .npy file per column under <root>/<symbol>/<timeframe>/, so a
+# multi-year M1 history opens memory-mapped and a date range is sliced with searchsorted
+# on the time column instead of being parsed or downloaded again.
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.config import LOCAL_TZ
+
+BAR_COLUMNS = ("open", "high", "low", "close", "tick_volume", "spread", "real_volume")
+
+
+def _safe(name):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+def _to_utc_ns(ts):
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return ts.tz_convert("UTC").value
+
+
+class BarStore:
+    """
+    store = BarStore("data/bars")
+    store.save(df, "[SP500]", "M1")                  # appends rows newer than what is stored
+    df = store.load("[SP500]", "M1", start, end)     # memory-mapped slice, LOCAL_TZ index
+    """
+
+    def __init__(self, root="data/bars"):
+        self.root = Path(root)
+
+    def path(self, symbol, timeframe):
+        return self.root / _safe(symbol) / timeframe
+
+    def has(self, symbol, timeframe):
+        return (self.path(symbol, timeframe) / "time.npy").exists()
+
+    def columns(self, symbol, timeframe):
+        meta = self.path(symbol, timeframe) / "meta.json"
+        return json.loads(meta.read_text())["columns"]
+
+    def _times(self, symbol, timeframe):
+        return np.load(self.path(symbol, timeframe) / "time.npy", mmap_mode="r")
+
+    def span(self, symbol, timeframe):
+        """(first, last) bar time stored, or None."""
+        if not self.has(symbol, timeframe):
+            return None
+        t = self._times(symbol, timeframe)
+        if len(t) == 0:
+            return None
+        return (pd.Timestamp(int(t[0]), tz="UTC").tz_convert(LOCAL_TZ),
+                pd.Timestamp(int(t[-1]), tz="UTC").tz_convert(LOCAL_TZ))
+
+    # ---------------------------------------------------------
+    # Write
+    # ---------------------------------------------------------
+    def save(self, df, symbol, timeframe):
+        """Append the bars of df newer than the stored ones. Returns the number of rows added."""
+        path = self.path(symbol, timeframe)
+        path.mkdir(parents=True, exist_ok=True)
+
+        times = df.index.tz_convert("UTC").asi8 if df.index.tz is not None \
+            else df.index.tz_localize("UTC").asi8
+        columns = [c for c in df.columns if np.issubdtype(df[c].dtype, np.number)]
+
+        if self.has(symbol, timeframe):
+            old_times = np.load(path / "time.npy")
+            keep = times > old_times[-1] if len(old_times) else np.ones(len(times), dtype=bool)
+            if not keep.any():
+                return 0
+            columns = self.columns(symbol, timeframe)
+            arrays = {c: np.concatenate([np.load(path / f"{c}.npy"), df[c].to_numpy()[keep]])
+                      for c in columns}
+            arrays["time"] = np.concatenate([old_times, times[keep]])
+            added = int(keep.sum())
+        else:
+            arrays = {c: df[c].to_numpy() for c in columns}
+            arrays["time"] = np.asarray(times, dtype=np.int64)
+            added = len(df)
+
+        # write to temp names first so readers never see a half-written column set
+        for name, values in arrays.items():
+            tmp = path / f"{name}.tmp.npy"
+            np.save(tmp, np.ascontiguousarray(values))
+            os.replace(tmp, path / f"{name}.npy")
+        (path / "meta.json").write_text(json.dumps({"columns": columns}))
+        return added
+
+    # ---------------------------------------------------------
+    # Read
+    # ---------------------------------------------------------
+    def slice_bounds(self, symbol, timeframe, start=None, end=None):
+        """Row range [lo, hi) of bars with start <= time <= end."""
+        t = self._times(symbol, timeframe)
+        lo = 0 if start is None else int(np.searchsorted(t, _to_utc_ns(start), side="left"))
+        hi = len(t) if end is None else int(np.searchsorted(t, _to_utc_ns(end), side="right"))
+        return lo, hi
+
+    def load(self, symbol, timeframe, start=None, end=None, columns=None, mmap=True):
+        """
+        Bars with start <= time <= end (naive datetimes are UTC) as a DataFrame indexed
+        like load_data. With mmap=True only the selected rows are read from disk.
+        """
+        if not self.has(symbol, timeframe):
+            raise FileNotFoundError(f"No stored bars for {symbol} {timeframe} in {self.root}")
+        lo, hi = self.slice_bounds(symbol, timeframe, start, end)
+        return self.rows(symbol, timeframe, lo, hi, columns, mmap)
+
+    def rows(self, symbol, timeframe, lo, hi, columns=None, mmap=True):
+        """Bars at row positions [lo, hi) (see slice_bounds), e.g. one chunk of a long history."""
+        path = self.path(symbol, timeframe)
+        mode = "r" if mmap else None
+        columns = list(columns) if columns is not None else self.columns(symbol, timeframe)
+
+        t = np.load(path / "time.npy", mmap_mode=mode)[lo:hi]
+        data = {c: np.array(np.load(path / f"{c}.npy", mmap_mode=mode)[lo:hi]) for c in columns}
+
+        index = pd.DatetimeIndex(np.array(t, dtype="datetime64[ns]")).tz_localize("UTC").tz_convert(LOCAL_TZ)
+        index.name = "time"
+        return pd.DataFrame(data, index=index)
+
+    def loader(self, symbol):
+        """source(timeframe, start, end) for build_features(htf_source=...): stored bars or None."""
+
+        def source(timeframe, start, end):
+            if not self.has(symbol, timeframe):
+                return None
+            return self.load(symbol, timeframe, start, end)
+
+        return source
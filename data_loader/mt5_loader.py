@@ -1,15 +1,22 @@
-import MetaTrader5 as mt5
+try:
+    import MetaTrader5 as mt5
+except ImportError:  # Windows-only package; offline tools (benchmarks, stored bars) still import this module
+    mt5 = None
 import pandas as pd
 from datetime import datetime, timedelta
 from utils.config import SYMBOL, TIMEFRAME, LOCAL_TZ
+from utils.logger import timed
 
 
 def initialize_mt5():
+    if mt5 is None:
+        raise RuntimeError("MetaTrader5 package is not installed.")
     if not mt5.initialize():
         raise RuntimeError(f"MT5 initialization failed: {mt5.last_error()}")
     print("MT5 initialized successfully.")
 
 
+@timed("load_data")
 def load_data(symbol=SYMBOL, timeframe=TIMEFRAME, days=None, start_date=None, end_date=None):
     initialize_mt5()
     # utc_to = datetime.utcnow()
@@ -57,22 +64,28 @@ def get_latest_tick(symbol=SYMBOL):
         raise RuntimeError(f"Failed to get latest tick for {symbol}: {mt5.last_error()}")
     return tick
 
-def load_live_bars(symbol, timeframe, n_bars=500):
+@timed("load_live_bars")
+def load_live_bars(symbol, timeframe, n_bars=500, api=None):
+    """api: MetaTrader5-like object to call instead of the module (shared connection, simulator)."""
+    api = api or mt5
+    if api is None:
+        raise RuntimeError("MetaTrader5 package is not installed.")
+
     timeframe_map = {
-        "M1": mt5.TIMEFRAME_M1,
-        "M5": mt5.TIMEFRAME_M5,
-        "M15": mt5.TIMEFRAME_M15,
-        "M30": mt5.TIMEFRAME_M30,
-        "H1": mt5.TIMEFRAME_H1,
-        "H4": mt5.TIMEFRAME_H4,
-        "D1": mt5.TIMEFRAME_D1
+        "M1": api.TIMEFRAME_M1,
+        "M5": api.TIMEFRAME_M5,
+        "M15": api.TIMEFRAME_M15,
+        "M30": api.TIMEFRAME_M30,
+        "H1": api.TIMEFRAME_H1,
+        "H4": api.TIMEFRAME_H4,
+        "D1": api.TIMEFRAME_D1
     }
 
     tf = timeframe_map[timeframe]
 
-    rates = mt5.copy_rates_from_pos(symbol, tf, 0, n_bars)
+    rates = api.copy_rates_from_pos(symbol, tf, 0, n_bars)
     if rates is None:
-        raise RuntimeError(f"Failed to load live bars: {mt5.last_error()}")
+        raise RuntimeError(f"Failed to load live bars: {api.last_error()}")
 
     df = pd.DataFrame(rates)
     df['time'] = pd.to_datetime(df['time'], unit='s')
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from features.rolling_quantile import rolling_bucket
+
 def add_basic_labels(trades: pd.DataFrame) -> pd.DataFrame:
     trades = trades.copy()
     trades["is_win"] = (trades["profit"] > 0).astype(int)
@@ -30,9 +32,21 @@ def analyze_by_direction(trades: pd.DataFrame) -> pd.Series:
     return trades.groupby("direction")["is_win"].mean()
 
 
-def analyze_by_volatility_quintile(trades, vol_series):
+def rolling_quintile(series: pd.Series, window: int) -> pd.Series:
+    """
+    Causal quintile (0..4) of every bar: where its value ranks within the previous `window` bars,
+    instead of over the whole sample like pd.qcut.
+    """
+    return pd.Series(rolling_bucket(series.to_numpy(), window, 5), index=series.index)
+
+
+def analyze_by_volatility_quintile(trades, vol_series, window=None):
+    """window: bucket by rolling_quintile over that many bars instead of full-sample quintiles."""
     trades = trades.copy()
 
+    if window is not None:
+        vol_series = rolling_quintile(vol_series, window)
+
     trades["volatility"] = vol_series.reindex(
         trades["open_time"],
         method="nearest",
@@ -44,6 +58,9 @@ def analyze_by_volatility_quintile(trades, vol_series):
     if len(valid) < 10:
         return pd.Series(dtype=float)
 
+    if window is not None:
+        return valid.groupby("volatility")["is_win"].mean()
+
     try:
         q = pd.qcut(valid["volatility"], 5, duplicates="drop")
         return valid.groupby(q, observed=False)["is_win"].mean()
@@ -51,12 +68,16 @@ def analyze_by_volatility_quintile(trades, vol_series):
         return pd.Series(dtype=float)
 
 
-def analyze_by_trend_quintile(trades: pd.DataFrame, trend_series: pd.Series) -> pd.Series:
+def analyze_by_trend_quintile(trades: pd.DataFrame, trend_series: pd.Series, window=None) -> pd.Series:
     """
     trend_series: pd.Series indexed by datetime (e.g. price - MA, or slope)
+    window: bucket by rolling_quintile over that many bars instead of full-sample quintiles
     """
     trades = trades.copy()
 
+    if window is not None:
+        trend_series = rolling_quintile(trend_series, window)
+
     # Ensure timezone alignment
     if trend_series.index.tz is None:
         trend_series = trend_series.tz_localize("UTC")
@@ -79,6 +100,9 @@ def analyze_by_trend_quintile(trades: pd.DataFrame, trend_series: pd.Series) ->
     if len(valid) < 10:
         return pd.Series(dtype=float)
 
+    if window is not None:
+        return valid.groupby("trend_strength")["is_win"].mean()
+
     try:
         q = pd.qcut(valid["trend_strength"], 5, duplicates="drop")
         return valid.groupby(q, observed=False)["is_win"].mean()
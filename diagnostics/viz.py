@@ -1,8 +1,10 @@
-import matplotlib
-matplotlib.use("TkAgg")
 import matplotlib.pyplot as plt
 import pandas as pd
 
+from utils.plotting import configure_backend, show_or_save
+
+configure_backend()
+
 
 def plot_bar(series: pd.Series, title: str, ylabel: str = "Win rate"):
     plt.figure(figsize=(8, 4))
@@ -59,4 +61,4 @@ def plot_pattern_summary(
         plt.text(0.5, 0.5, "No trend data", ha="center")
 
     plt.tight_layout()
-    plt.show()
+    return show_or_save(plt.gcf(), "pattern_summary")
@@ -1,9 +1,16 @@
 # evaluation/backtest.py
+import time
+import tracemalloc
+
 import numpy as np
 import pandas as pd
 from typing import Tuple
 
 from backtesting.backtest_engine import backtest_hedging
+from evaluation.metrics import confusion_matrix, class_scores, rolling_f1
+from evaluation.splitter import Fold, FoldData, purge, run_folds, walk_forward_splits
+from execution.position_manager import PositionLimits
+from utils.logger import incr, span, timed
 from utils.target_encoding import decode_target
 
 
@@ -19,6 +26,137 @@ def _compute_profit_factor(trades_df: pd.DataFrame) -> float:
     return float(gross_profit / abs(gross_loss))
 
 
+def _backtest_pf(test_df, signals, conf, conf_threshold, atr_norm_threshold):
+    _, _, trades_df = backtest_hedging(
+        test_df,
+        signals,
+        conf=conf,
+        sl_mult=2,
+        tp_mult=2,
+        initial_balance=1000,
+        position_size=0.1,
+        conf_threshold=conf_threshold,
+        atr_norm_threshold=atr_norm_threshold,
+        contr_size=1,
+        lev=1,
+        marg_limit=1e9,
+        limits=PositionLimits.from_config(),  # the same entry limits as live trading
+    )
+    return _compute_profit_factor(trades_df)
+
+
+def _evaluate_fold(data, fold, model_fn, conf_threshold, atr_norm_threshold, profile_memory=False):
+    """
+    Train on the fold's train rows, score its test rows. Returns (profit factor, fold stats
+    or None). Rows are views of data.X / data.y; model_fn gets an (X, y) pair.
+    Stats carry the fold's wall time and, with profile_memory, its peak Python/NumPy
+    allocation (tracemalloc). Module-level (and model_fn picklable) for run_folds workers.
+    """
+    started = time.perf_counter()
+    tracing = profile_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif profile_memory:
+        tracemalloc.reset_peak()
+    try:
+        pf, stats = _score_fold(data, fold, model_fn, conf_threshold, atr_norm_threshold)
+        peak = tracemalloc.get_traced_memory()[1] if profile_memory else None
+    finally:
+        if tracing:
+            tracemalloc.stop()
+    if stats is not None:
+        stats["fold_seconds"] = time.perf_counter() - started
+        stats["train_rows"] = fold.train_size
+        stats["test_rows"] = fold.test_size
+        stats["peak_mb"] = peak / 2 ** 20 if peak is not None else None
+    return pf, stats
+
+
+def _score_fold(data, fold, model_fn, conf_threshold, atr_norm_threshold):
+    from collections import Counter
+
+    train = data.rows(fold.train)
+    X_test, y_test = data.rows(fold.test)
+    test_df = data.frame(fold.test)
+
+    if fold.index == UNSEEN:
+        return _evaluate_unseen(train, X_test, test_df, model_fn, conf_threshold, atr_norm_threshold), None
+
+    with span("wf.train", fold_start=fold.test_start, rows=fold.train_size):
+        model = model_fn(train)
+
+    try:
+        with span("wf.predict", fold_start=fold.test_start, rows=len(X_test)):
+            probs = model.predict_proba(X_test)
+    except Exception:
+        incr("wf.predict_errors")
+        return 0.0, None
+
+    classes = model.classes_
+    max_idx = np.argmax(probs, axis=1)
+
+    # encoded predictions (0,1,2)
+    encoded_preds = np.asarray(classes)[max_idx]
+
+    # decode to trading labels (-1,0,1)
+    signals = decode_target(encoded_preds)
+
+    conf = np.max(probs, axis=1)
+
+    # === DIAGNOSTICS ===
+    pred_dist = Counter(signals)
+    actual_dist = Counter(y_test)
+
+    # Per-class correctness (rows = true, cols = predicted, classes -1, 0, 1)
+    cm = confusion_matrix(signals, y_test)
+    correct_m1, correct_0, correct_1 = (int(v) for v in np.diag(cm))
+    total_m1, total_0, total_1 = (int(v) for v in cm.sum(axis=1))
+    per_class = class_scores(cm)
+
+    stats = {
+        "pred_dist": dict(pred_dist),
+        "actual_dist": dict(actual_dist),
+        "mean_conf": float(np.mean(conf)),
+        "max_conf": float(np.max(conf)),
+        "min_conf": float(np.min(conf)),
+        "correct_1": correct_1,
+        "correct_0": correct_0,
+        "correct_-1": correct_m1,
+        "total_1": total_1,
+        "total_0": total_0,
+        "total_-1": total_m1,
+        "f1_1": per_class[1][2],
+        "f1_-1": per_class[-1][2],
+        "rolling_f1_min": float(np.min(rolling_f1(signals, y_test, min(50, len(y_test))))),
+        "best_iteration": getattr(model, "best_iteration_", None),  # early stopping, None = off
+    }
+
+    # Run backtest
+    try:
+        pf = _backtest_pf(test_df, signals, conf, conf_threshold, atr_norm_threshold)
+    except Exception:
+        return 0.0, stats
+    return pf, stats
+
+
+def _evaluate_unseen(train, X_test, test_df, model_fn, conf_threshold, atr_norm_threshold):
+    model = model_fn(train)
+
+    try:
+        probs = model.predict_proba(X_test)
+        classes = model.classes_
+        max_idx = np.argmax(probs, axis=1)
+        signals = np.asarray(classes)[max_idx]
+        conf = np.max(probs, axis=1)
+        return _backtest_pf(test_df, signals, conf, conf_threshold, atr_norm_threshold)
+    except Exception:
+        return 0.0
+
+
+UNSEEN = "unseen"  # Fold.index of the final hold-out segment
+
+
+@timed("walk_forward_backtest")
 def walk_forward_backtest(
     model_fn,
     df: pd.DataFrame,
@@ -27,11 +165,26 @@ def walk_forward_backtest(
     conf_threshold: float = 0.55,
     atr_norm_threshold: float = 0.0,
     unseen_ratio: float = 0.1,
+    horizon: int = 0,
+    embargo: int = 0,
+    n_jobs: int = 1,
+    folds=None,
+    profile_memory: bool = False,
+    max_folds: int | None = None,
+    score_unseen: bool = True,
 ):
-    from collections import Counter
-    import numpy as np
-
-    scores = []
+    """
+    Expanding walk-forward folds of `step` bars from train_ratio up to the unseen segment,
+    then one fit on everything before the unseen segment, scored on it.
+    horizon / embargo: purge train rows whose labels (future_n bars ahead) reach the test
+    block, and the embargo rows after it (see evaluation.splitter).
+    n_jobs: folds (and the unseen fit) run in a process pool; model_fn must be picklable.
+    folds: explicit splitter folds (rolling_splits, cpcv_splits, ...) instead of walk-forward.
+    df may also be a FoldData (features as one matrix); model_fn receives (X, y) views.
+    fold_stats include fold_seconds, train/test rows and, with profile_memory, peak_mb.
+    max_folds / score_unseen=False: a cheaper screening run (evenly spaced subset of the
+    folds, no unseen fit; unseen_pf is then 0.0), see optimization.multi_fidelity.
+    """
     fold_stats = []   # store diagnostics for Optuna
     n = len(df)
 
@@ -41,139 +194,33 @@ def walk_forward_backtest(
     start_train = int(n * train_ratio)
     unseen_start = int(n * (1.0 - unseen_ratio))
 
-    # --- Walk-forward folds ---
-    for start in range(start_train, unseen_start - step, step):
-        train_df = df.iloc[:start]
-        test_df = df.iloc[start:start + step]
-
-        model = model_fn(train_df)
-
-        X_test = test_df.drop(columns=["target"])
-        y_test = test_df["target"].values
-
-        try:
-            probs = model.predict_proba(X_test)
-        except Exception:
-            scores.append(0.0)
-            continue
-
-        classes = model.classes_
-        max_idx = np.argmax(probs, axis=1)
-
-        # encoded predictions (0,1,2)
-        encoded_preds = np.array([classes[i] for i in max_idx])
-
-        # decode to trading labels (-1,0,1)
-        signals = decode_target(encoded_preds)
-
-        conf = np.max(probs, axis=1)
-
-        # === DIAGNOSTICS ===
-        pred_dist = Counter(signals)
-        actual_dist = Counter(y_test)
-
-        mean_conf = float(np.mean(conf))
-        max_conf = float(np.max(conf))
-        min_conf = float(np.min(conf))
-
-        # Per-class correctness
-        correct_1 = int(((signals == 1) & (y_test == 1)).sum())
-        correct_0 = int(((signals == 0) & (y_test == 0)).sum())
-        correct_m1 = int(((signals == -1) & (y_test == -1)).sum())
-
-        total_1 = int((y_test == 1).sum())
-        total_0 = int((y_test == 0).sum())
-        total_m1 = int((y_test == -1).sum())
-
-        # Store fold stats
-        fold_stats.append({
-            "pred_dist": dict(pred_dist),
-            "actual_dist": dict(actual_dist),
-            "mean_conf": mean_conf,
-            "max_conf": max_conf,
-            "min_conf": min_conf,
-            "correct_1": correct_1,
-            "correct_0": correct_0,
-            "correct_-1": correct_m1,
-            "total_1": total_1,
-            "total_0": total_0,
-            "total_-1": total_m1,
-        })
-
-        # Print diagnostics
-        # print("\n=== FOLD DEBUG ===")
-        # print("Predicted:", pred_dist)
-        # print("Actual:", actual_dist)
-        # print("Mean conf:", mean_conf)
-        # print("Max conf:", max_conf)
-        # print("Min conf:", min_conf)
-        # print("Correct 1:", correct_1, "/", total_1)
-        # print("Correct 0:", correct_0, "/", total_0)
-        # print("Correct -1:", correct_m1, "/", total_m1)
-
-        # Run backtest
-        try:
-            final_balance, _, trades_df = backtest_hedging(
-                test_df,
-                signals,
-                conf=conf,
-                sl_mult=2,
-                tp_mult=2,
-                initial_balance=1000,
-                position_size=0.1,
-                conf_threshold=conf_threshold,
-                atr_norm_threshold=atr_norm_threshold,
-                contr_size=1,
-                lev=1,
-                marg_limit=1e9,
-            )
-        except Exception:
-            scores.append(0.0)
-            continue
-
-        # print("Trades executed:", len(trades_df))
-
-        pf = _compute_profit_factor(trades_df)
-        scores.append(pf)
-
-    wf_pf = float(np.mean(scores)) if scores else 0.0
+    if folds is None:
+        folds = walk_forward_splits(n, start_train, step, end=unseen_start, horizon=horizon, embargo=embargo)
+    # a fold with no test rows (custom folds, or a block emptied by purging) has nothing to score
+    folds = [fold for fold in folds if fold.test]
+    if max_folds is not None and len(folds) > max_folds:
+        keep = np.unique(np.linspace(0, len(folds) - 1, max_folds).round().astype(int))
+        folds = [folds[i] for i in keep]
+    incr("wf.folds", len(folds))
 
     # --- Unseen validation ---
-    if unseen_start <= start_train or unseen_start >= n - step:
-        return wf_pf, 0.0, fold_stats
-
-    train_df = df.iloc[:unseen_start]
-    test_df = df.iloc[unseen_start:]
-
-    model = model_fn(train_df)
-    X_test = test_df.drop(columns=["target"])
-    y_test = test_df["target"].values
-
-    try:
-        probs = model.predict_proba(X_test)
-        classes = model.classes_
-        max_idx = np.argmax(probs, axis=1)
-        signals = np.array([classes[i] for i in max_idx])
-        conf = np.max(probs, axis=1)
-
-        _, _, trades_df = backtest_hedging(
-            test_df,
-            signals,
-            conf=conf,
-            sl_mult=2,
-            tp_mult=2,
-            initial_balance=1000,
-            position_size=0.1,
-            conf_threshold=conf_threshold,
-            atr_norm_threshold=atr_norm_threshold,
-            contr_size=1,
-            lev=1,
-            marg_limit=1e9,
-        )
-        unseen_pf = _compute_profit_factor(trades_df)
-    except Exception:
-        unseen_pf = 0.0
+    has_unseen = score_unseen and not (unseen_start <= start_train or unseen_start >= n - step)
+    if has_unseen:
+        unseen = [(unseen_start, n)]
+        folds.append(Fold(UNSEEN, purge([(0, unseen_start)], unseen, horizon), unseen))
+
+    # one matrix for every fold instead of an iloc/drop copy of the history per fold
+    with span("wf.fold_data", rows=n):
+        data = df if isinstance(df, FoldData) else FoldData.from_frame(df)
+    results = run_folds(_evaluate_fold, data, folds, n_jobs=n_jobs, model_fn=model_fn,
+                        conf_threshold=conf_threshold, atr_norm_threshold=atr_norm_threshold,
+                        profile_memory=profile_memory)
+
+    unseen_pf = results.pop()[0] if has_unseen else 0.0
+    scores = [score for score, _ in results]
+    fold_stats.extend(stats for _, stats in results if stats is not None)
 
+    wf_pf = float(np.mean(scores)) if scores else 0.0
     return wf_pf, unseen_pf, fold_stats
 
 
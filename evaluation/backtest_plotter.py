@@ -3,7 +3,10 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-from evaluation.metrics import f1_score, confusion_matrix
+from evaluation.metrics import confusion_matrix, rolling_f1
+from utils.plotting import configure_backend, show_or_save
+
+configure_backend()
 
 
 # ---------------------------------------------------------
@@ -35,22 +38,15 @@ def plot_equity_curve(df, preds, future_n=2, title="Equity Curve"):
     plt.grid(True)
     plt.legend()
     plt.tight_layout()
-    plt.show()
+    return show_or_save(plt.gcf(), title)
 
 
 # ---------------------------------------------------------
 # 2. Rolling F1 Score Plot
 # ---------------------------------------------------------
-def plot_rolling_f1(df, preds, window=200, title="Rolling F1 Score"):
-    df = df.copy()
-    df["pred"] = preds
-
-    f1_values = []
-
-    for i in range(window, len(df)):
-        y_true = df["target"].iloc[i - window:i]
-        y_pred = df["pred"].iloc[i - window:i]
-        f1_values.append(f1_score(y_pred, y_true))
+def plot_rolling_f1(df, preds, window=200, title="Rolling F1 Score", positive_class=1):
+    # Value at bar i scores the window [i - window, i)
+    f1_values = rolling_f1(preds, df["target"].values, window, positive_class)[:-1]
 
     plt.figure(figsize=(12, 6))
     plt.plot(df.index[window:], f1_values, label="Rolling F1", color="purple")
@@ -60,7 +56,7 @@ def plot_rolling_f1(df, preds, window=200, title="Rolling F1 Score"):
     plt.grid(True)
     plt.legend()
     plt.tight_layout()
-    plt.show()
+    return show_or_save(plt.gcf(), title)
 
 
 # ---------------------------------------------------------
@@ -82,7 +78,7 @@ def plot_confusion_matrix(df, preds, title="Confusion Matrix"):
     plt.xlabel("Predicted")
     plt.ylabel("True")
     plt.tight_layout()
-    plt.show()
+    return show_or_save(plt.gcf(), title)
 
 
 # ---------------------------------------------------------
@@ -101,7 +97,7 @@ def plot_model_comparison(scores: dict, title="Model Comparison"):
     plt.title(title)
     plt.ylabel("Score")
     plt.tight_layout()
-    plt.show()
+    return show_or_save(plt.gcf(), title)
 
 
 # ---------------------------------------------------------
@@ -128,4 +124,4 @@ def plot_feature_importance(model, feature_names, top_n=20, title="Feature Impor
     plt.title(title)
     plt.xlabel("Importance")
     plt.tight_layout()
-    plt.show()
+    return show_or_save(plt.gcf(), title)
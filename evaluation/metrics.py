@@ -56,19 +56,85 @@ def f1_score(y_pred, y_true, positive_class=1):
     return float(2 * p * r / (p + r))
 
 
-def confusion_matrix(y_pred, y_true):
+def _class_index(y, classes):
+    """
+    Position of every label in `classes` (sorted), -1 for unknown labels.
+    """
+    pos = np.searchsorted(classes, y)
+    pos = np.clip(pos, 0, len(classes) - 1)
+    return np.where(classes[pos] == y, pos, -1)
+
+
+def confusion_matrix(y_pred, y_true, classes=(-1, 0, 1)):
     """
     Returns a 3x3 confusion matrix for classes [-1, 0, 1].
     Rows = true class
     Columns = predicted class
+    Single pass: each (true, pred) pair is mapped to one cell and counted with bincount.
+    """
+    y_pred, y_true = _to_numpy(y_pred, y_true)
+    classes = np.sort(np.asarray(classes))
+    k = len(classes)
+
+    true_idx = _class_index(y_true, classes)
+    pred_idx = _class_index(y_pred, classes)
+    valid = (true_idx >= 0) & (pred_idx >= 0)
+
+    cells = true_idx[valid] * k + pred_idx[valid]
+    return np.bincount(cells, minlength=k * k).reshape(k, k).astype(int)
+
+
+def _precision_recall_f1(tp, fp, fn):
+    # Same zero-division rules as precision() / recall() / f1_score(), element-wise
+    tp, fp, fn = (np.asarray(a, dtype=np.float64) for a in (tp, fp, fn))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.where(tp + fp == 0, 0.0, tp / (tp + fp))
+        r = np.where(tp + fn == 0, 0.0, tp / (tp + fn))
+        f1 = np.where(p + r == 0, 0.0, 2 * p * r / (p + r))
+
+    return p, r, f1
+
+
+def class_scores(cm, classes=(-1, 0, 1)):
+    """
+    Per-class precision / recall / F1 from a confusion matrix (rows = true).
+    Returns {class: (precision, recall, f1)}.
+    """
+    cm = np.asarray(cm)
+    classes = np.sort(np.asarray(classes))  # row/column order of confusion_matrix
+    tp = np.diag(cm)
+    fp = cm.sum(axis=0) - tp
+    fn = cm.sum(axis=1) - tp
+    p, r, f1 = _precision_recall_f1(tp, fp, fn)
+    return {c.item(): (float(p[i]), float(r[i]), float(f1[i])) for i, c in enumerate(classes)}
+
+
+def rolling_precision_recall_f1(y_pred, y_true, window, positive_class=1):
+    """
+    Precision, recall and F1 of `positive_class` over every full window, in O(n).
+    Element k covers positions [k, k + window), so each array has n - window + 1 values.
+    Counts come from cumulative sums of indicator arrays instead of rescoring each slice.
     """
     y_pred, y_true = _to_numpy(y_pred, y_true)
+    n = len(y_true)
+    if window <= 0 or window > n:
+        empty = np.array([], dtype=np.float64)
+        return empty, empty, empty
+
+    pred_pos = y_pred == positive_class
+    true_pos = y_true == positive_class
+
+    def window_sum(mask):
+        c = np.concatenate([[0], np.cumsum(mask, dtype=np.int64)])
+        return c[window:] - c[:-window]
+
+    tp = window_sum(pred_pos & true_pos)
+    fp = window_sum(pred_pos & ~true_pos)
+    fn = window_sum(~pred_pos & true_pos)
 
-    classes = [-1, 0, 1]
-    matrix = np.zeros((3, 3), dtype=int)
+    return _precision_recall_f1(tp, fp, fn)
 
-    for i, true_c in enumerate(classes):
-        for j, pred_c in enumerate(classes):
-            matrix[i, j] = np.sum((y_true == true_c) & (y_pred == pred_c))
 
-    return matrix
+def rolling_f1(y_pred, y_true, window, positive_class=1):
+    return rolling_precision_recall_f1(y_pred, y_true, window, positive_class)[2]
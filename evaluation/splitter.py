@@ -0,0 +1,263 @@
+# evaluation/splitter.py
+# Time-series cross-validation splits with purging and embargo, and a fold executor.
+#   walk_forward_splits  expanding train window, consecutive test blocks
+#   rolling_splits       fixed-size train window sliding with the test block
+#   cpcv_splits          combinatorial purged CV (every choice of k test groups out of N)
+# Labels look `horizon` bars ahead (build_features future_n), so train rows whose label
+# window reaches a test block are purged, and `embargo` rows after each test block are
+# dropped from training. Folds index one feature matrix / label vector (FoldData) by row
+# range; run_folds() evaluates them in a process pool over a memory-mapped copy, results
+# come back in fold order whatever the worker count.
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.logger import incr, span
+
+
+class Fold:
+    """Row ranges of one split: train and test are tuples of [start, stop) pairs."""
+
+    __slots__ = ("index", "train", "test")
+
+    def __init__(self, index, train, test):
+        self.index = index
+        self.train = tuple((int(a), int(b)) for a, b in train if b > a)
+        self.test = tuple((int(a), int(b)) for a, b in test if b > a)
+
+    @property
+    def train_size(self):
+        return sum(b - a for a, b in self.train)
+
+    @property
+    def test_size(self):
+        return sum(b - a for a, b in self.test)
+
+    @property
+    def test_start(self):
+        return self.test[0][0]
+
+    def train_indices(self):
+        return _indices(self.train)
+
+    def test_indices(self):
+        return _indices(self.test)
+
+    def __repr__(self):
+        return f"Fold({self.index}, train={list(self.train)}, test={list(self.test)})"
+
+
+def _indices(ranges):
+    if not ranges:
+        return np.empty(0, dtype=np.int64)
+    if len(ranges) == 1:
+        return np.arange(*ranges[0])
+    return np.concatenate([np.arange(a, b) for a, b in ranges])
+
+
+def purge(train, test, horizon=0, embargo=0):
+    """
+    Remove from the train ranges every row whose label window [i, i + horizon] overlaps
+    a test range, and the `embargo` rows following each test range.
+    """
+    blocked = [(max(a - horizon, 0), b + embargo) for a, b in test]
+    out = []
+    for a, b in train:
+        pieces = [(a, b)]
+        for lo, hi in blocked:
+            nxt = []
+            for s, e in pieces:
+                if e <= lo or s >= hi:
+                    nxt.append((s, e))
+                    continue
+                if s < lo:
+                    nxt.append((s, lo))
+                if e > hi:
+                    nxt.append((hi, e))
+            pieces = nxt
+        out.extend(pieces)
+    return out
+
+
+def walk_forward_splits(n, start, step, end=None, horizon=0, embargo=0):
+    """
+    Test blocks [t, t + step) for t = start, start + step, ... while t < end - step
+    (end defaults to n); train is everything before t, minus the purged tail.
+    """
+    end = n if end is None else end
+    folds = []
+    for i, t in enumerate(range(start, end - step, step)):
+        test = [(t, min(t + step, n))]
+        folds.append(Fold(i, purge([(0, t)], test, horizon, embargo), test))
+    return folds
+
+
+def rolling_splits(n, train_size, step, start=None, end=None, horizon=0, embargo=0):
+    """Like walk_forward_splits, but train is the `train_size` rows before each test block."""
+    start = train_size if start is None else start
+    end = n if end is None else end
+    folds = []
+    for i, t in enumerate(range(start, end - step, step)):
+        test = [(t, min(t + step, n))]
+        folds.append(Fold(i, purge([(max(t - train_size, 0), t)], test, horizon, embargo), test))
+    return folds
+
+
+def cpcv_splits(n, n_groups=6, n_test_groups=2, horizon=0, embargo=0):
+    """
+    Combinatorial purged CV: rows cut into n_groups contiguous groups, each combination of
+    n_test_groups groups is a test set, the remaining groups (purged, embargoed) train.
+    """
+    if not 0 < n_test_groups < n_groups:
+        raise ValueError(f"need 0 < n_test_groups < n_groups, got {n_test_groups}, {n_groups}")
+    bounds = np.linspace(0, n, n_groups + 1).astype(int)
+    groups = [(bounds[g], bounds[g + 1]) for g in range(n_groups)]
+    folds = []
+    for i, chosen in enumerate(combinations(range(n_groups), n_test_groups)):
+        test = _merge([groups[g] for g in chosen])
+        train = _merge([groups[g] for g in range(n_groups) if g not in chosen])
+        folds.append(Fold(i, purge(train, test, horizon, embargo), test))
+    return folds
+
+
+def _merge(ranges):
+    out = []
+    for a, b in sorted(ranges):
+        if out and out[-1][1] == a:
+            out[-1] = (out[-1][0], b)
+        else:
+            out.append((a, b))
+    return out
+
+
+# ---------------------------------------------------------
+# Fold data: one feature matrix + label vector, folds are views
+# ---------------------------------------------------------
+BACKTEST_COLUMNS = ("close", "high", "low", "atr")  # what backtest_hedging reads
+
+
+class FoldData:
+    """
+    The feature frame as one C-ordered matrix X (every column but the target, in frame
+    order) and the label vector y. A contiguous fold range is a view (X[a:b], y[a:b]):
+    no per-fold copy of the training history. Written once to .npy files it reopens
+    memory-mapped in every worker process, shared through the OS page cache.
+    """
+
+    def __init__(self, X, y, columns, index):
+        self.X = X
+        self.y = y
+        self.columns = list(columns)
+        self.index = index
+        self._col = {c: j for j, c in enumerate(self.columns)}
+
+    @classmethod
+    def from_frame(cls, df, target="target"):
+        columns = [c for c in df.columns if c != target]
+        dtypes = [df[c].dtype for c in columns]
+        for c, dtype in zip(columns, dtypes):
+            if not np.issubdtype(dtype, np.number) and dtype != bool:
+                raise TypeError(f"column {c!r} is not numeric; cannot put it in the feature matrix")
+        # float32 when every column fits (compact frames without float64 prices), else float64
+        X = np.empty((len(df), len(columns)), dtype=np.result_type(np.float32, *dtypes))
+        for j, c in enumerate(columns):
+            X[:, j] = df[c].to_numpy()
+        return cls(X, df[target].to_numpy(), columns, df.index)
+
+    def __len__(self):
+        return len(self.y)
+
+    def rows(self, ranges):
+        """(X, y) of `ranges`: views for a single range, one gathered copy otherwise."""
+        if len(ranges) == 1:
+            a, b = ranges[0]
+            return self.X[a:b], self.y[a:b]
+        idx = _indices(ranges)
+        return self.X[idx], self.y[idx]
+
+    def frame(self, ranges, columns=BACKTEST_COLUMNS):
+        """Small DataFrame of a few columns (the test block for backtest_hedging)."""
+        idx = slice(*ranges[0]) if len(ranges) == 1 else _indices(ranges)
+        return pd.DataFrame({c: self.X[idx, self._col[c]] for c in columns if c in self._col},
+                            index=self.index[idx])
+
+    def nbytes(self):
+        return self.X.nbytes + self.y.nbytes
+
+    # ---------------------------------------------------------
+    # Memory-mapped copy for worker processes
+    # ---------------------------------------------------------
+    def write(self, root):
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        np.save(root / "X.npy", np.ascontiguousarray(self.X))
+        np.save(root / "y.npy", np.ascontiguousarray(self.y))
+        index = self.index
+        tz = str(index.tz) if getattr(index, "tz", None) is not None else None
+        np.save(root / "index.npy", np.asarray(index.asi8, dtype=np.int64))
+        (root / "meta.json").write_text(json.dumps(
+            {"columns": list(map(str, self.columns)), "tz": tz, "index_name": index.name}))
+        return root
+
+    @classmethod
+    def open(cls, root):
+        root = Path(root)
+        meta = json.loads((root / "meta.json").read_text())
+        index = pd.DatetimeIndex(np.load(root / "index.npy").view("datetime64[ns]"), name=meta["index_name"])
+        if meta["tz"] is not None:
+            index = index.tz_localize("UTC").tz_convert(meta["tz"])
+        return cls(np.load(root / "X.npy", mmap_mode="r"), np.load(root / "y.npy", mmap_mode="r"),
+                   meta["columns"], index)
+
+
+# ---------------------------------------------------------
+# Fold executor
+# ---------------------------------------------------------
+_WORKER_DATA = None
+
+
+def _init_worker(root):
+    global _WORKER_DATA
+    _WORKER_DATA = FoldData.open(root)
+
+
+def _run_fold(fn, fold, kwargs):
+    return fn(_WORKER_DATA, fold, **kwargs)
+
+
+def run_folds(fn, data, folds, n_jobs=1, tmp_dir=None, **kwargs):
+    """
+    [fn(data, fold, **kwargs) for fold in folds], in fold order; data is a FoldData
+    (a DataFrame is converted once). fn takes its rows with data.rows(fold.train) etc.
+    n_jobs > 1: a process pool over a memory-mapped copy of data; fn (and kwargs) must be
+    picklable, e.g. module-level functions and functools.partial(train_xgb, params=...).
+    Each fold sees exactly the rows it would see in-process, so the results do not
+    depend on n_jobs.
+    """
+    if isinstance(data, pd.DataFrame):
+        data = FoldData.from_frame(data)
+    folds = list(folds)
+    if n_jobs is None or n_jobs <= 0:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(folds))
+
+    if n_jobs <= 1:
+        return [fn(data, f, **kwargs) for f in folds]
+
+    root = tempfile.mkdtemp(prefix="folds_", dir=tmp_dir)
+    try:
+        with span("folds.share", rows=len(data)):
+            data.write(root)
+        incr("folds.parallel_runs")
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(root,)) as pool:
+            futures = [pool.submit(_run_fold, fn, f, kwargs) for f in folds]
+            return [f.result() for f in futures]
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
@@ -0,0 +1,268 @@
+# execution/broker_cache.py
+# Cached broker state for the live decision path. Account, symbol info, last tick and the
+# margin of one lot are refreshed on a schedule (background thread) or on tick events,
+# so filters and margin checks read memory instead of making MT5 round-trips per signal.
+import itertools
+import threading
+import time
+
+from utils.logger import incr, span
+
+
+class SharedConnection:
+    """
+    One MT5 terminal connection shared by several threads (decision loop, background
+    refresh, order worker): calls are serialized (the terminal API is a single IPC
+    channel), attributes such as constants pass through.
+    """
+
+    def __init__(self, api):
+        self._api = api
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._api, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+
+        self.__dict__[name] = call
+        return call
+
+
+class BrokerStateCache:
+    """
+    cache = BrokerStateCache(mt5, ["[SP500]"]).refresh()
+    cache.start(interval=1.0)                      # optional background refresh
+    cache.has_enough_margin("[SP500]", 0.5, mt5.ORDER_TYPE_BUY, limit=0.5)   # no round-trip
+    cache.reserve_margin("[SP500]", 0.5, mt5.ORDER_TYPE_BUY, limit=0.5, key=order.order_id)  # check + hold
+    cache.release_margin(order.order_id, filled=1.0)                          # its report arrived
+    price = cache.fresh_price("[SP500]", mt5.ORDER_TYPE_BUY)                 # one tick call
+
+    Staleness limits (seconds) per item; get_*() refreshes an item only once it is older.
+    Margin reservations are kept per order: a queued order holds its margin until its
+    report; the filled part is held until an account snapshot taken after the fill
+    (which includes it in account.margin). reservation_ttl drops reservations of orders
+    that never report (e.g. placed orders filled later).
+    """
+
+    def __init__(self, mt5, symbols, account_ttl=1.0, tick_ttl=0.5, info_ttl=300.0,
+                 margin_ttl=30.0, reservation_ttl=60.0, clock=time.monotonic):
+        self.mt5 = mt5
+        self.symbols = list(symbols)
+        self.account_ttl = account_ttl
+        self.tick_ttl = tick_ttl
+        self.info_ttl = info_ttl
+        self.margin_ttl = margin_ttl
+        self.reservation_ttl = reservation_ttl
+        self.clock = clock
+
+        self._lock = threading.RLock()
+        self._account = None
+        self._account_at = -float("inf")
+        self._reservations = {}     # key -> [margin, reserved at, filled at (None while in flight)]
+        self._note_keys = itertools.count()
+        self._ticks = {}        # symbol -> (tick, at)
+        self._infos = {}        # symbol -> (info, at)
+        self._margins = {}      # (symbol, direction) -> (margin of 1 lot, price, at)
+
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ---------------------------------------------------------
+    # Refresh
+    # ---------------------------------------------------------
+    def _call(self, name, *args):
+        incr("broker.calls")
+        with span(f"broker.{name}"):
+            result = getattr(self.mt5, name)(*args)
+        if result is None:
+            raise RuntimeError(f"{name} failed: {self.mt5.last_error()}")
+        return result
+
+    def refresh_account(self):
+        started = self.clock()
+        account = self._call("account_info")
+        with self._lock:
+            self._account = account
+            self._account_at = self.clock()
+            # fills before this snapshot are in account.margin now; orders in flight are not
+            for key, (_, _, filled_at) in list(self._reservations.items()):
+                if filled_at is not None and filled_at <= started:
+                    del self._reservations[key]
+        return account
+
+    def refresh_tick(self, symbol):
+        tick = self._call("symbol_info_tick", symbol)
+        self.on_tick(symbol, tick)
+        return tick
+
+    def refresh_info(self, symbol):
+        info = self._call("symbol_info", symbol)
+        with self._lock:
+            self._infos[symbol] = (info, self.clock())
+        return info
+
+    def refresh_margin(self, symbol, direction):
+        price = self._price(self.tick(symbol), direction)
+        margin = self._call("order_calc_margin", direction, symbol, 1.0, price)
+        with self._lock:
+            self._margins[(symbol, direction)] = (margin, price, self.clock())
+        return margin, price
+
+    def refresh(self, force=True):
+        """Refresh everything (force) or only the stale items."""
+        now = self.clock()
+        if force or now - self._account_at > self.account_ttl:
+            self.refresh_account()
+        for symbol in self.symbols:
+            if force or self._stale(self._infos.get(symbol), self.info_ttl, now):
+                self.refresh_info(symbol)
+            if force or self._stale(self._ticks.get(symbol), self.tick_ttl, now):
+                self.refresh_tick(symbol)
+            for direction in (self.mt5.ORDER_TYPE_BUY, self.mt5.ORDER_TYPE_SELL):
+                entry = self._margins.get((symbol, direction))
+                if force or entry is None or now - entry[2] > self.margin_ttl:
+                    self.refresh_margin(symbol, direction)
+        return self
+
+    def on_tick(self, symbol, tick):
+        """Tick event hook (also used by refresh_tick)."""
+        with self._lock:
+            self._ticks[symbol] = (tick, self.clock())
+
+    @staticmethod
+    def _stale(entry, ttl, now):
+        return entry is None or now - entry[1] > ttl
+
+    # ---------------------------------------------------------
+    # Background refresh
+    # ---------------------------------------------------------
+    def start(self, interval=1.0):
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh(force=False)
+                except Exception as e:
+                    incr("broker.refresh_errors")
+                    print("Broker cache refresh failed:", e)
+
+        self._thread = threading.Thread(target=run, name="broker-cache", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # ---------------------------------------------------------
+    # Reads (cached)
+    # ---------------------------------------------------------
+    def account(self):
+        if self._account is None or self.clock() - self._account_at > self.account_ttl:
+            return self.refresh_account()
+        incr("broker.cache_hits")
+        return self._account
+
+    def tick(self, symbol):
+        entry = self._ticks.get(symbol)
+        if self._stale(entry, self.tick_ttl, self.clock()):
+            return self.refresh_tick(symbol)
+        incr("broker.cache_hits")
+        return entry[0]
+
+    def symbol_info(self, symbol):
+        entry = self._infos.get(symbol)
+        if self._stale(entry, self.info_ttl, self.clock()):
+            return self.refresh_info(symbol)
+        incr("broker.cache_hits")
+        return entry[0]
+
+    def _price(self, tick, direction):
+        return tick.ask if direction == self.mt5.ORDER_TYPE_BUY else tick.bid
+
+    def price(self, symbol, direction):
+        """Cached ask (buy) / bid (sell)."""
+        return self._price(self.tick(symbol), direction)
+
+    def fresh_price(self, symbol, direction):
+        """Ask/bid from a tick fetched now: the price an order should be sent at."""
+        return self._price(self.refresh_tick(symbol), direction)
+
+    def required_margin(self, symbol, volume, direction):
+        """Margin for `volume` lots, scaled from the cached one-lot margin to the cached price."""
+        entry = self._margins.get((symbol, direction))
+        if entry is None or self.clock() - entry[2] > self.margin_ttl:
+            per_lot, at_price = self.refresh_margin(symbol, direction)
+        else:
+            per_lot, at_price = entry[0], entry[1]
+        price = self.price(symbol, direction)
+        return per_lot * volume * (price / at_price if at_price else 1.0)
+
+    def _held(self):
+        # call with the lock held; drops reservations past reservation_ttl
+        now = self.clock()
+        total = 0.0
+        for key, (margin, reserved_at, _) in list(self._reservations.items()):
+            if now - reserved_at > self.reservation_ttl:
+                del self._reservations[key]
+            else:
+                total += margin
+        return total
+
+    def has_enough_margin(self, symbol, volume, direction, limit):
+        """Same rule as trade.has_enough_margin: used + required <= equity * limit."""
+        account = self.account()
+        required = self.required_margin(symbol, volume, direction)
+        with self._lock:
+            used = account.margin + self._held()
+        return used + required <= account.equity * limit
+
+    def note_order(self, symbol, volume, direction):
+        """Count a filled order's margin as used until an account refresh reflects it."""
+        required = self.required_margin(symbol, volume, direction)
+        with self._lock:
+            now = self.clock()
+            self._reservations[("note", next(self._note_keys))] = [required, now, now]
+
+    def reserve_margin(self, symbol, volume, direction, limit, key):
+        """
+        Atomic has_enough_margin + hold for concurrent deciders (one per symbol): returns
+        the margin reserved under `key` (e.g. the order id), or None when it does not fit
+        under equity * limit. End it with release_margin(key, filled) from the order's report.
+        """
+        account = self.account()
+        required = self.required_margin(symbol, volume, direction)
+        with self._lock:
+            if account.margin + self._held() + required > account.equity * limit:
+                return None
+            self._reservations[key] = [required, self.clock(), None]
+        return required
+
+    def release_margin(self, key, filled=0.0):
+        """
+        The order of `key` ended: give back its unfilled share; the filled share (0..1) stays
+        held until an account refresh includes it.
+        """
+        with self._lock:
+            entry = self._reservations.get(key)
+            if entry is None:
+                return
+            if filled <= 0:
+                del self._reservations[key]
+                return
+            entry[0] *= min(filled, 1.0)
+            entry[2] = self.clock()
+
+    def pending_margin(self):
+        with self._lock:
+            return self._held()
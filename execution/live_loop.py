@@ -0,0 +1,206 @@
+# execution/live_loop.py
+# Multi-symbol live engine: N symbol/timeframe streams in one process, polled concurrently
+# by a thread pool over a single (serialized) MT5 connection. Each stream keeps its own
+# incremental feature state; account, ticks and margin come from one BrokerStateCache, so
+# the margin limit applies to the whole portfolio, and orders go through one TradeExecutor.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+
+from backtesting.backtest_engine import MODEL_PATH, generate_signals
+from data_loader.mt5_loader import load_live_bars
+from execution.broker_cache import BrokerStateCache, SharedConnection
+from execution.position_manager import PositionManager
+from execution.trade_executor import OrderRequest, TradeExecutor
+from features.feature_graph import IncrementalFeatures, feature_names
+from features.regime.regime_detector import RegimeDetector
+from filters.signal_filter import skip_reason
+from utils.config import (
+    SL_ATR_MULT, TP_ATR_MULT, POSITION_SIZE, HTF_TIMEFRAMES, REGIME_FEATURE, REGIME_FILTER,
+    BROKER_REFRESH_SECONDS, EXEC_LATENCY_BUDGET, PORTFOLIO_MARGIN_LIMIT,
+)
+from utils.logger import incr, set_context, span
+from utils.params_io import load_best_params
+
+
+class SymbolStream:
+    """Per symbol/timeframe state: model, incremental features and the last bar acted on."""
+
+    def __init__(self, symbol, timeframe, model, params, volume=POSITION_SIZE, htf=HTF_TIMEFRAMES,
+                 regime=None):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.model = model
+        self.volume = volume
+        if regime is None:
+            regime = REGIME_FEATURE or bool(REGIME_FILTER)
+        self.features = IncrementalFeatures(feature_names(model), params, htf=htf, timeframe=timeframe,
+                                            regime=RegimeDetector(online=True) if regime else None)
+        self.columns = getattr(model, "feature_names_in_", None)
+        self.last_bar_time = None
+
+    @property
+    def name(self):
+        return f"{self.symbol}/{self.timeframe}"
+
+
+def build_streams(specs, default_params=None):
+    """
+    SymbolStreams from config dicts: {"symbol", "timeframe", optional "model" (path),
+    "params" (indicator params), "volume"}. Each model file is loaded once.
+    """
+    if default_params is None:
+        default_params = load_best_params().get("indicators", {})
+    models = {}
+    streams = []
+    for spec in specs:
+        path = str(spec.get("model", MODEL_PATH))
+        if path not in models:
+            models[path] = joblib.load(path)
+        streams.append(SymbolStream(
+            spec["symbol"], spec["timeframe"], models[path],
+            spec.get("params", default_params),
+            volume=spec.get("volume", POSITION_SIZE),
+        ))
+    return streams
+
+
+class LiveEngine:
+    """
+    engine = LiveEngine(build_streams(LIVE_STREAMS), mt5).start()
+    engine.run()                    # poll every stream each poll_seconds until stop()
+    engine.poll_once()              # or drive the polls yourself (tests, simulator)
+
+    margin_limit: used + reserved + required margin must stay <= equity * margin_limit,
+    checked atomically across all streams; likewise the position limits (positions per
+    direction, exposure) of `limits` (default: config) over every symbol.
+    """
+
+    def __init__(self, streams, api, poll_seconds=300, max_workers=None, margin_limit=PORTFOLIO_MARGIN_LIMIT,
+                 latency_budget=EXEC_LATENCY_BUDGET, refresh_seconds=BROKER_REFRESH_SECONDS, on_report=None,
+                 limits=None):
+        self.streams = list(streams)
+        self.api = SharedConnection(api)
+        self.poll_seconds = poll_seconds
+        self.margin_limit = margin_limit
+        self.refresh_seconds = refresh_seconds
+        symbols = list(dict.fromkeys(s.symbol for s in self.streams))
+        self.broker = BrokerStateCache(self.api, symbols)
+        self.positions = PositionManager(self.api, limits, broker=self.broker)
+        self.on_report = on_report
+        self.executor = TradeExecutor(self.api, self.broker, latency_budget=latency_budget,
+                                      on_report=self._on_report)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or len(self.streams),
+                                        thread_name_prefix="live-stream")
+        self._stop = threading.Event()
+
+    def start(self):
+        for symbol in self.broker.symbols:
+            info = self.api.symbol_info(symbol)
+            if info is None:
+                raise RuntimeError(f"Symbol '{symbol}' not found in MT5.")
+            if not info.visible and not self.api.symbol_select(symbol, True):
+                raise RuntimeError(f"Failed to select symbol '{symbol}'.")
+        self.broker.refresh()
+        self.positions.sync()
+        if self.refresh_seconds:
+            self.broker.start(self.refresh_seconds)
+        self.executor.start()
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        self.broker.stop()
+        self.executor.stop(wait)
+        self._pool.shutdown(wait=wait)
+
+    # ---------------------------------------------------------
+    # Polling
+    # ---------------------------------------------------------
+    def poll_once(self):
+        """Tick every stream concurrently; returns {stream name: submitted order or None}."""
+        with span("live_poll", streams=len(self.streams)):
+            try:
+                self.positions.poll()
+            except Exception as e:
+                incr("live.errors")
+                print("Position update failed:", e)
+            futures = {s.name: self._pool.submit(self._safe_tick, s) for s in self.streams}
+            return {name: f.result() for name, f in futures.items()}
+
+    def run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.poll_once()
+            self._stop.wait(max(self.poll_seconds - (time.monotonic() - started), 0.0))
+
+    def _on_report(self, report):
+        self.positions.on_report(report)
+        if self.on_report is not None:
+            self.on_report(report)
+
+    def _safe_tick(self, stream):
+        set_context(symbol=stream.symbol, timeframe=stream.timeframe)
+        try:
+            with span("live_tick"):
+                return self._tick(stream)
+        except Exception as e:
+            incr("live.errors")
+            print(f"[{stream.name}] Error in live loop:", e)
+            return None
+
+    def _tick(self, stream):
+        df = load_live_bars(stream.symbol, stream.timeframe, n_bars=stream.features.bars_needed, api=self.api)
+        df_feat = stream.features.update(df).dropna()
+        if df_feat.empty:
+            return None
+
+        # only act on a new bar
+        bar_time = df_feat.index[-1]
+        if stream.last_bar_time is not None and bar_time <= stream.last_bar_time:
+            return None
+        stream.last_bar_time = bar_time
+        incr("live.bars")
+
+        regime = int(df_feat["regime"].iloc[-1]) if "regime" in df_feat.columns else None
+        if stream.columns is not None:
+            X = df_feat[list(stream.columns)]
+        else:
+            X = df_feat if REGIME_FEATURE else df_feat.drop(columns=["regime"], errors="ignore")
+        signals, conf = generate_signals(stream.model, X)
+        return self._act(stream, bar_time, signals[-1], conf[-1], df["close"].iloc[-1],
+                         df_feat["atr"].iloc[-1], regime)
+
+    def _act(self, stream, bar_time, sig, c, price, atr_value, regime):
+        reason = skip_reason(sig, c, price, atr_value, regime)
+        if reason is not None:
+            incr(f"live.skip_{reason}")
+            return None
+
+        direction = self.api.ORDER_TYPE_BUY if sig == 1 else self.api.ORDER_TYPE_SELL
+        order = OrderRequest(
+            stream.symbol, int(sig), stream.volume,
+            sl_distance=SL_ATR_MULT * atr_value,
+            tp_distance=TP_ATR_MULT * atr_value,
+            decision_price=price,
+            comment=f"ML_live {stream.timeframe}",
+        )
+        limit = self.positions.reserve(order)
+        if limit is not None:
+            incr(f"live.skip_{limit}")
+            print(f"[{stream.name}] {bar_time} Position limit ({limit}), skipping trade.")
+            return None
+
+        order.reserved_margin = self.broker.reserve_margin(stream.symbol, stream.volume, direction, self.margin_limit,
+                                                           key=order.order_id)
+        if order.reserved_margin is None:
+            self.positions.release(order)
+            incr("live.skip_margin")
+            print(f"[{stream.name}] {bar_time} Portfolio margin limit reached, skipping trade.")
+            return None
+
+        self.executor.submit(order)
+        incr("live.orders")
+        return order
@@ -0,0 +1,279 @@
+# execution/position_manager.py
+# Open-position state and entry limits (max concurrent positions per direction, gross
+# exposure cap). PositionBook is the pure bookkeeping + rule, shared by backtest_hedging
+# and the live PositionManager, which keeps it in sync with the broker incrementally:
+# our own fills (executor reports) and deal events (history_deals_get) since the last poll,
+# with a full positions_get rescan only at start-up and for periodic reconciliation.
+import threading
+import time
+
+from utils.config import MAX_LONG_POSITIONS, MAX_SHORT_POSITIONS, MAX_EXPOSURE, EXEC_LATENCY_BUDGET
+from utils.logger import incr
+
+
+class PositionLimits:
+    """
+    max_long / max_short: concurrent positions per direction.
+    max_exposure: gross notional of open positions (entry price * volume * contract size)
+    as a multiple of equity. None disables a limit.
+    """
+
+    __slots__ = ("max_long", "max_short", "max_exposure")
+
+    def __init__(self, max_long=None, max_short=None, max_exposure=None):
+        self.max_long = max_long
+        self.max_short = max_short
+        self.max_exposure = max_exposure
+
+    @classmethod
+    def from_config(cls):
+        return cls(MAX_LONG_POSITIONS, MAX_SHORT_POSITIONS, MAX_EXPOSURE)
+
+    @property
+    def active(self):
+        return any(v is not None for v in (self.max_long, self.max_short, self.max_exposure))
+
+
+class PositionBook:
+    """
+    book = PositionBook(limits)
+    if book.limit_reason(1, notional, equity) is None: book.open(key, 1, notional)
+    ...
+    book.close(key)
+
+    Counts and gross notional are kept incrementally: every call is O(1).
+    """
+
+    def __init__(self, limits=None):
+        self.limits = limits or PositionLimits()
+        self.positions = {}     # key -> (direction, notional)
+        self.n_long = 0
+        self.n_short = 0
+        self.exposure = 0.0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def open(self, key, direction, notional):
+        if key in self.positions:
+            self.close(key)
+        self.positions[key] = (direction, notional)
+        if direction == 1:
+            self.n_long += 1
+        else:
+            self.n_short += 1
+        self.exposure += notional
+
+    def close(self, key):
+        entry = self.positions.pop(key, None)
+        if entry is None:
+            return False
+        direction, notional = entry
+        if direction == 1:
+            self.n_long -= 1
+        else:
+            self.n_short -= 1
+        self.exposure = max(self.exposure - notional, 0.0) if self.positions else 0.0
+        return True
+
+    def clear(self):
+        self.positions.clear()
+        self.n_long = self.n_short = 0
+        self.exposure = 0.0
+
+    def limit_reason(self, direction, notional, equity):
+        """None when a new position fits, else the limit it would break ("max_long", "max_short", "exposure")."""
+        limits = self.limits
+        if direction == 1:
+            if limits.max_long is not None and self.n_long >= limits.max_long:
+                return "max_long"
+        elif limits.max_short is not None and self.n_short >= limits.max_short:
+            return "max_short"
+        if limits.max_exposure is not None and self.exposure + notional > equity * limits.max_exposure:
+            return "exposure"
+        return None
+
+
+class PositionManager:
+    """
+    positions = PositionManager(mt5, limits, broker=cache).sync()
+    positions.poll()                                   # apply new deals (cheap, incremental)
+    positions.limit_reason(symbol, 1, 0.5, price)      # None -> may open
+    executor = TradeExecutor(..., on_report=positions.on_report)
+
+    reserve(order) / on_report(report) hold a slot for an order in flight, so concurrent
+    deciders cannot both take the last one; sync() drops slots older than pending_ttl
+    (orders that never reported). magic: only count positions with this magic (None =
+    every position on the account). reconcile_seconds: full rescan interval.
+    """
+
+    def __init__(self, mt5, limits=None, broker=None, magic=None, contract_size=None,
+                 reconcile_seconds=300.0, pending_ttl=EXEC_LATENCY_BUDGET, clock=time.monotonic):
+        self.mt5 = mt5
+        self.book = PositionBook(limits or PositionLimits.from_config())
+        self.broker = broker
+        self.magic = magic
+        self.contract_size = contract_size
+        self.reconcile_seconds = reconcile_seconds
+        self.pending_ttl = pending_ttl
+        self.clock = clock
+
+        self.positions = {}     # position ticket -> {"symbol", "direction", "volume", "price", "magic"}
+        self._pending = {}      # ("pending", order id) -> reserved at
+        self._lock = threading.RLock()
+        self._last_deal = 0          # highest deal ticket applied
+        self._deals_from = None      # deal time (epoch seconds, server clock) to query from
+        self._synced_at = -float("inf")
+
+    # ---------------------------------------------------------
+    # State updates
+    # ---------------------------------------------------------
+    def _contract_size(self, symbol):
+        if self.contract_size is not None:
+            return self.contract_size
+        info = self.broker.symbol_info(symbol) if self.broker is not None else self.mt5.symbol_info(symbol)
+        return info.trade_contract_size if info is not None else 1.0
+
+    def _add(self, ticket, symbol, direction, volume, price, magic):
+        # idempotent: a fill is seen both in the executor report and as an IN deal
+        if self.magic is not None and magic != self.magic:
+            return
+        with self._lock:
+            if ticket in self.positions:
+                return
+            self.positions[ticket] = {"symbol": symbol, "direction": direction, "volume": volume,
+                                      "price": price, "magic": magic}
+            self.book.open(ticket, direction, volume * price * self._contract_size(symbol))
+
+    def _reduce(self, ticket, volume):
+        with self._lock:
+            known = self.positions.get(ticket)
+            if known is None:
+                return
+            remaining = known["volume"] - volume
+            if remaining <= 1e-9:
+                del self.positions[ticket]
+                self.book.close(ticket)
+                incr("positions.closed")
+                return
+            known["volume"] = remaining
+            self.book.open(ticket, known["direction"], remaining * known["price"] * self._contract_size(known["symbol"]))
+
+    def _deals(self):
+        # server time may run ahead of local time: query up to a day past now
+        deals = self.mt5.history_deals_get(self._deals_from, int(time.time()) + 86400)
+        if deals is None:
+            raise RuntimeError(f"history_deals_get failed: {self.mt5.last_error()}")
+        return sorted((d for d in deals if d.ticket > self._last_deal), key=lambda d: d.ticket)
+
+    def sync(self):
+        """Full rescan from positions_get (start-up / reconciliation); earlier deals are skipped."""
+        if self._deals_from is None:
+            self._deals_from = int(time.time()) - 86400
+        deals = self._deals()
+        positions = self.mt5.positions_get()
+        if positions is None:
+            raise RuntimeError(f"positions_get failed: {self.mt5.last_error()}")
+        incr("positions.sync")
+        if deals:
+            self._last_deal = deals[-1].ticket
+            self._deals_from = deals[-1].time
+        with self._lock:
+            now = self.clock()
+            for key in [k for k, at in self._pending.items() if now - at > self.pending_ttl]:
+                del self._pending[key]
+                incr("positions.pending_expired")
+            pending = {k: v for k, v in self.book.positions.items() if k in self._pending}
+            self.positions.clear()
+            self.book.clear()
+            for p in positions:
+                direction = 1 if p.type == self.mt5.ORDER_TYPE_BUY else -1
+                self._add(p.ticket, p.symbol, direction, p.volume, p.price_open, p.magic)
+            for key, (direction, notional) in pending.items():
+                self.book.open(key, direction, notional)
+            self._synced_at = self.clock()
+        return self
+
+    def poll(self):
+        """Apply deals since the last poll; falls back to sync() every reconcile_seconds."""
+        if self.clock() - self._synced_at > self.reconcile_seconds:
+            return self.sync()
+        for deal in self._deals():
+            self._last_deal = deal.ticket
+            self._deals_from = deal.time
+            self.on_deal(deal)
+        return self
+
+    def on_deal(self, deal):
+        """Deal event (hedging account): an IN deal opens its position, an OUT deal reduces/closes it."""
+        if deal.entry == self.mt5.DEAL_ENTRY_IN:
+            direction = 1 if deal.type == self.mt5.DEAL_TYPE_BUY else -1
+            self._add(deal.position_id, deal.symbol, direction, deal.volume, deal.price, deal.magic)
+        elif deal.entry == self.mt5.DEAL_ENTRY_OUT:
+            self._reduce(deal.position_id, deal.volume)
+
+    # ---------------------------------------------------------
+    # Orders in flight
+    # ---------------------------------------------------------
+    def _notional(self, symbol, volume, price):
+        return volume * price * self._contract_size(symbol)
+
+    def _equity(self):
+        if self.broker is not None:
+            return self.broker.account().equity
+        account = self.mt5.account_info()
+        if account is None:
+            raise RuntimeError(f"account_info failed: {self.mt5.last_error()}")
+        return account.equity
+
+    def limit_reason(self, symbol, direction, volume, price, equity=None):
+        if not self.book.limits.active:
+            return None
+        if equity is None and self.book.limits.max_exposure is not None:
+            equity = self._equity()
+        with self._lock:
+            return self.book.limit_reason(direction, self._notional(symbol, volume, price), equity)
+
+    def reserve(self, order, equity=None):
+        """limit_reason + hold a slot for `order` (an OrderRequest) until on_report(); atomic."""
+        if not self.book.limits.active:
+            return None
+        if equity is None and self.book.limits.max_exposure is not None:
+            equity = self._equity()
+        notional = self._notional(order.symbol, order.volume, order.decision_price)
+        with self._lock:
+            reason = self.book.limit_reason(order.direction, notional, equity)
+            if reason is None:
+                key = ("pending", order.order_id)
+                self.book.open(key, order.direction, notional)
+                self._pending[key] = self.clock()
+        return reason
+
+    def release(self, order):
+        """Give back the slot of an order that was not sent (or whose execution failed)."""
+        key = ("pending", order.order_id)
+        with self._lock:
+            self._pending.pop(key, None)
+            self.book.close(key)
+
+    def on_report(self, report):
+        """TradeExecutor on_report hook (every outcome, errors included): release the slot, add what was filled."""
+        order = report.order
+        with self._lock:
+            self.release(order)
+            for ticket, (_, volume, price) in zip(report.orders, report.fills):
+                self._add(ticket, order.symbol, order.direction, volume, price, order.magic)
+
+    # ---------------------------------------------------------
+    # Reads
+    # ---------------------------------------------------------
+    def open_positions(self, symbol=None):
+        with self._lock:
+            return {t: dict(p) for t, p in self.positions.items() if symbol is None or p["symbol"] == symbol}
+
+    def counts(self):
+        with self._lock:
+            return {"long": self.book.n_long, "short": self.book.n_short, "exposure": self.book.exposure}
@@ -0,0 +1,298 @@
+# execution/sim_broker.py
+# Simulated broker exposing the subset of the MetaTrader5 module API the live code uses,
+# with configurable per-call latency and rejection behaviour (requotes, unsupported filling
+# modes, partial fills). Lets the live path be timed and exercised offline.
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+AccountInfo = namedtuple("AccountInfo", "login balance equity margin margin_free leverage currency")
+SymbolInfo = namedtuple("SymbolInfo", "name visible trade_contract_size volume_min volume_step point digits filling_mode")
+Tick = namedtuple("Tick", "time time_msc bid ask last")
+OrderSendResult = namedtuple("OrderSendResult", "retcode deal order volume price bid ask comment request")
+TradePosition = namedtuple("TradePosition", "ticket time type magic identifier volume price_open sl tp symbol comment")
+TradeDeal = namedtuple("TradeDeal", "ticket order time time_msc type entry magic position_id volume price profit symbol comment")
+
+
+class SimBroker:
+    # MetaTrader5 constants used by the repo
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    TRADE_ACTION_DEAL = 1
+    ORDER_TIME_GTC = 0
+    ORDER_FILLING_FOK = 0
+    ORDER_FILLING_IOC = 1
+    ORDER_FILLING_RETURN = 2
+    SYMBOL_FILLING_FOK = 1
+    SYMBOL_FILLING_IOC = 2
+    TRADE_RETCODE_REQUOTE = 10004
+    TRADE_RETCODE_PLACED = 10008
+    TRADE_RETCODE_DONE = 10009
+    TRADE_RETCODE_DONE_PARTIAL = 10010
+    TRADE_RETCODE_PRICE_CHANGED = 10020
+    TRADE_RETCODE_PRICE_OFF = 10021
+    TRADE_RETCODE_INVALID_FILL = 10030
+    DEAL_TYPE_BUY = 0
+    DEAL_TYPE_SELL = 1
+    DEAL_ENTRY_IN = 0
+    DEAL_ENTRY_OUT = 1
+    TIMEFRAME_M1 = 1
+    TIMEFRAME_M5 = 5
+    TIMEFRAME_M15 = 15
+    TIMEFRAME_M30 = 30
+    TIMEFRAME_H1 = 16385
+    TIMEFRAME_H4 = 16388
+    TIMEFRAME_D1 = 16408
+
+    def __init__(self, symbols=("[SP500]",), price=4000.0, spread=0.5, balance=2000.0,
+                 leverage=20, contract_size=1.0, latency=0.0, latency_jitter=0.0, volatility=0.0002,
+                 requote_rate=0.0, partial_rate=0.0, fillings=(0, 1, 2), seed=0):
+        """
+        latency: seconds slept per API call (a round-trip to the terminal), plus up to
+        latency_jitter seconds of uniform noise.
+        volatility: relative std of the price move between two calls (random walk).
+        requote_rate: probability an order is requoted (10004) even within its deviation;
+        orders whose price is further than `deviation` points from the market always are.
+        partial_rate: probability an IOC/RETURN order fills only part of its volume (10010).
+        fillings: ORDER_FILLING_* modes the symbol accepts; others get 10030.
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.requote_rate = requote_rate
+        self.partial_rate = partial_rate
+        self.fillings = tuple(fillings)
+        self.volatility = volatility
+        self.spread = spread
+        self.leverage = leverage
+        self.contract_size = contract_size
+        self.balance = balance
+        self.rng = np.random.default_rng(seed)
+        self.mids = {s: float(price) for s in symbols}
+        self.calls = 0
+        self.positions = []
+        self.deals = []
+        self._ticket = 0
+        self._lock = threading.Lock()
+        self._last_error = (1, "Success")
+        self._bars = {}     # (symbol, timeframe const) -> structured rates array
+        self._cursor = {}   # (symbol, timeframe const) -> bars visible (incl. the forming one)
+
+    # ---------------------------------------------------------
+    # Internals
+    # ---------------------------------------------------------
+    def _round_trip(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency or self.latency_jitter:
+            with self._lock:
+                jitter = self.latency_jitter * self.rng.uniform() if self.latency_jitter else 0.0
+            time.sleep(self.latency + jitter)
+
+    def _move(self, symbol):
+        with self._lock:
+            self.mids[symbol] *= 1.0 + self.volatility * self.rng.standard_normal()
+            return self.mids[symbol]
+
+    def _quote(self, symbol):
+        mid = self._move(symbol)
+        return mid - self.spread / 2, mid + self.spread / 2
+
+    def _margin(self, volume, price):
+        return volume * self.contract_size * price / self.leverage
+
+    def set_price(self, symbol, price):
+        with self._lock:
+            self.mids[symbol] = float(price)
+
+    def set_bars(self, symbol, timeframe, df, visible=1):
+        """
+        Bars to replay through copy_rates_from_pos (df as load_data returns it).
+        `visible` bars are available at first; advance() reveals more.
+        """
+        rates = np.zeros(len(df), dtype=[
+            ("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+            ("tick_volume", "<u8"), ("spread", "<i4"), ("real_volume", "<u8"),
+        ])
+        rates["time"] = df.index.tz_convert("UTC").asi8 // 1_000_000_000
+        for col in ("open", "high", "low", "close", "tick_volume", "spread", "real_volume"):
+            rates[col] = df[col].to_numpy()
+        key = (symbol, getattr(self, f"TIMEFRAME_{timeframe}"))
+        with self._lock:
+            self._bars[key] = rates
+            self._cursor[key] = visible
+            self.mids.setdefault(symbol, float(df["close"].iloc[0]))
+
+    def advance(self, n=1):
+        """
+        Reveal the next n bars of every replayed series; the mid follows the last close and
+        positions whose SL/TP lies inside a revealed bar's range are closed there (SL first).
+        """
+        hits = {}   # ticket -> exit price
+        with self._lock:
+            for key, rates in self._bars.items():
+                start = self._cursor[key]
+                self._cursor[key] = min(start + n, len(rates))
+                self.mids[key[0]] = float(rates["close"][self._cursor[key] - 1])
+                for bar in rates[start:self._cursor[key]]:
+                    for p in self.positions:
+                        if p["symbol"] != key[0] or p["ticket"] in hits:
+                            continue
+                        long = p["type"] == self.ORDER_TYPE_BUY
+                        sl, tp = p.get("sl"), p.get("tp")
+                        if sl is not None and (bar["low"] <= sl if long else bar["high"] >= sl):
+                            hits[p["ticket"]] = sl
+                        elif tp is not None and (bar["high"] >= tp if long else bar["low"] <= tp):
+                            hits[p["ticket"]] = tp
+        for ticket, price in hits.items():
+            self.close_position(ticket, price)
+
+    def close_position(self, ticket, price=None):
+        """Close a position at `price` (default: the current bid/ask); books the PnL and an OUT deal."""
+        with self._lock:
+            p = next((p for p in self.positions if p["ticket"] == ticket), None)
+            if p is None:
+                return False
+            self.positions.remove(p)
+            sign = 1 if p["type"] == self.ORDER_TYPE_BUY else -1
+            if price is None:
+                mid = self.mids[p["symbol"]]
+                price = mid - sign * self.spread / 2
+            profit = sign * (price - p["price"]) * p["volume"] * self.contract_size
+            self.balance += profit
+        deal_type = self.DEAL_TYPE_SELL if sign == 1 else self.DEAL_TYPE_BUY
+        self._deal(ticket, deal_type, self.DEAL_ENTRY_OUT, p, p["volume"], price, profit)
+        return True
+
+    def _deal(self, order, deal_type, entry, position, volume, price, profit=0.0):
+        ticket = self._next_ticket()
+        now = time.time()
+        with self._lock:
+            self.deals.append(TradeDeal(ticket, order, int(now), int(now * 1000), deal_type, entry,
+                                        position.get("magic", 0), position["ticket"], volume, price,
+                                        profit, position["symbol"], ""))
+        return ticket
+
+    # ---------------------------------------------------------
+    # MetaTrader5-like API
+    # ---------------------------------------------------------
+    def initialize(self, *args, **kwargs):
+        self._round_trip()
+        return True
+
+    def shutdown(self):
+        return True
+
+    def last_error(self):
+        return self._last_error
+
+    def account_info(self):
+        self._round_trip()
+        with self._lock:
+            margin = sum(self._margin(p["volume"], p["price"]) for p in self.positions)
+            floating = 0.0
+            for p in self.positions:
+                mid = self.mids[p["symbol"]]
+                sign = 1 if p["type"] == self.ORDER_TYPE_BUY else -1
+                floating += sign * (mid - p["price"]) * p["volume"] * self.contract_size
+        equity = self.balance + floating
+        return AccountInfo(1, self.balance, equity, margin, equity - margin, self.leverage, "USD")
+
+    def symbol_info(self, symbol):
+        self._round_trip()
+        if symbol not in self.mids:
+            return None
+        flags = (self.SYMBOL_FILLING_FOK if self.ORDER_FILLING_FOK in self.fillings else 0) | \
+                (self.SYMBOL_FILLING_IOC if self.ORDER_FILLING_IOC in self.fillings else 0)
+        return SymbolInfo(symbol, True, self.contract_size, 0.01, 0.01, 0.01, 2, flags)
+
+    def symbol_select(self, symbol, enable=True):
+        self._round_trip()
+        return symbol in self.mids
+
+    def symbol_info_tick(self, symbol):
+        self._round_trip()
+        if symbol not in self.mids:
+            return None
+        bid, ask = self._quote(symbol)
+        now = time.time()
+        return Tick(int(now), int(now * 1000), bid, ask, (bid + ask) / 2)
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        self._round_trip()
+        key = (symbol, timeframe)
+        if key not in self._bars:
+            self._last_error = (-2, f"No bars for {symbol}")
+            return None
+        with self._lock:
+            end = self._cursor[key] - start_pos
+            return self._bars[key][max(0, end - count):end].copy()
+
+    def order_calc_margin(self, action, symbol, volume, price):
+        self._round_trip()
+        return self._margin(volume, price)
+
+    def positions_get(self, symbol=None, ticket=None):
+        self._round_trip()
+        with self._lock:
+            out = [p for p in self.positions
+                   if (symbol is None or p["symbol"] == symbol) and (ticket is None or p["ticket"] == ticket)]
+        return tuple(TradePosition(p["ticket"], p["time"], p["type"], p["magic"], p["ticket"], p["volume"],
+                                   p["price"], p["sl"] or 0.0, p["tp"] or 0.0, p["symbol"], "")
+                     for p in out)
+
+    def history_deals_get(self, date_from, date_to, group=None):
+        """Deals with time in [date_from, date_to] (datetimes or epoch seconds)."""
+        self._round_trip()
+        lo = date_from.timestamp() if hasattr(date_from, "timestamp") else date_from
+        hi = date_to.timestamp() if hasattr(date_to, "timestamp") else date_to
+        with self._lock:
+            return tuple(d for d in self.deals if lo <= d.time <= hi)
+
+    def _next_ticket(self):
+        with self._lock:
+            self._ticket += 1
+            return self._ticket
+
+    def _reject(self, retcode, bid, ask, comment, request):
+        return OrderSendResult(retcode, 0, 0, 0.0, 0.0, bid, ask, comment, request)
+
+    def order_send(self, request):
+        self._round_trip()
+        symbol = request["symbol"]
+        if symbol not in self.mids:
+            self._last_error = (-2, "Unknown symbol")
+            return None
+        bid, ask = self._quote(symbol)
+        price = ask if request["type"] == self.ORDER_TYPE_BUY else bid
+
+        filling = request.get("type_filling", self.ORDER_FILLING_FOK)
+        if filling not in self.fillings:
+            return self._reject(self.TRADE_RETCODE_INVALID_FILL, bid, ask, "Unsupported filling mode", request)
+
+        with self._lock:
+            requote = self.rng.uniform() < self.requote_rate
+            partial = filling != self.ORDER_FILLING_FOK and self.rng.uniform() < self.partial_rate
+        points = abs(price - request.get("price", price)) / 0.01
+        if requote or points > request.get("deviation", 0):
+            return self._reject(self.TRADE_RETCODE_REQUOTE, bid, ask, "Requote", request)
+
+        volume = request["volume"]
+        retcode = self.TRADE_RETCODE_DONE
+        if partial:
+            volume = max(round(volume / 2, 2), 0.01)
+            retcode = self.TRADE_RETCODE_DONE_PARTIAL
+
+        ticket = self._next_ticket()
+        position = {
+            "ticket": ticket, "time": int(time.time()), "symbol": symbol, "type": request["type"],
+            "volume": volume, "price": price,
+            "sl": request.get("sl"), "tp": request.get("tp"), "magic": request.get("magic", 0),
+        }
+        with self._lock:
+            self.positions.append(position)
+        deal = self._deal(ticket, self.DEAL_TYPE_BUY if request["type"] == self.ORDER_TYPE_BUY else self.DEAL_TYPE_SELL,
+                          self.DEAL_ENTRY_IN, position, volume, price)
+        return OrderSendResult(retcode, deal, ticket, volume, price,
+                               bid, ask, "Request executed", request)
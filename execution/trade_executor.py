@@ -0,0 +1,359 @@
+# execution/trade_executor.py
+# Order execution off the decision path: orders are queued and sent by a worker thread,
+# requotes are retried at fresh prices within a latency budget, unsupported filling modes
+# fall back FOK -> IOC -> RETURN, partial fills are topped up, and every order ends in an
+# ExecutionReport with fills, slippage and latency (also when sending it raised).
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from utils.logger import incr, observe
+
+# MT5 trade server return codes
+RETCODE_REQUOTE = 10004
+RETCODE_PLACED = 10008      # accepted, filled asynchronously (exchange / RETURN execution)
+RETCODE_DONE = 10009
+RETCODE_DONE_PARTIAL = 10010
+RETCODE_PRICE_CHANGED = 10020
+RETCODE_PRICE_OFF = 10021
+RETCODE_INVALID_FILL = 10030
+
+# retry at a fresh price
+PRICE_RETCODES = frozenset({RETCODE_REQUOTE, RETCODE_PRICE_CHANGED, RETCODE_PRICE_OFF})
+
+
+class OrderRequest:
+    """
+    A market order as the strategy sees it: direction 1 / -1, SL/TP as distances from the
+    fill price (so a retry at a new price keeps the same risk), decision_price for slippage.
+    reserved_margin: margin already held for it via BrokerStateCache.reserve_margin under
+    key order_id; the unfilled part is released when the order ends.
+    """
+
+    __slots__ = ("order_id", "symbol", "direction", "volume", "sl_distance", "tp_distance",
+                 "decision_price", "deviation", "magic", "comment", "reserved_margin", "submitted_at")
+
+    _ids = itertools.count(1)
+
+    def __init__(self, symbol, direction, volume, sl_distance=None, tp_distance=None,
+                 decision_price=None, deviation=20, magic=123456, comment="ML_live",
+                 reserved_margin=None):
+        self.order_id = next(self._ids)
+        self.symbol = symbol
+        self.direction = direction
+        self.volume = volume
+        self.sl_distance = sl_distance
+        self.tp_distance = tp_distance
+        self.decision_price = decision_price
+        self.deviation = deviation
+        self.magic = magic
+        self.comment = comment
+        self.reserved_margin = reserved_margin
+        self.submitted_at = None
+
+
+class ExecutionReport:
+    __slots__ = ("order", "status", "fills", "orders", "attempts", "requotes", "filling_mode",
+                 "retcode", "comment", "latency_ms")
+
+    def __init__(self, order):
+        self.order = order
+        self.status = "pending"     # filled / partial / placed / rejected / expired / error
+        self.fills = []             # (deal ticket, volume, price)
+        self.orders = []            # order ticket per fill (= position ticket on hedging accounts)
+        self.attempts = 0
+        self.requotes = 0
+        self.filling_mode = None
+        self.retcode = None
+        self.comment = ""
+        self.latency_ms = None
+
+    @property
+    def filled_volume(self):
+        return sum(v for _, v, _ in self.fills)
+
+    @property
+    def avg_price(self):
+        volume = self.filled_volume
+        return sum(v * p for _, v, p in self.fills) / volume if volume else None
+
+    @property
+    def slippage(self):
+        """Adverse price difference vs the decision price (positive = worse), price units."""
+        if self.order.decision_price is None or not self.fills:
+            return None
+        return self.order.direction * (self.avg_price - self.order.decision_price)
+
+    def as_dict(self):
+        return {
+            "symbol": self.order.symbol,
+            "direction": self.order.direction,
+            "volume": self.order.volume,
+            "status": self.status,
+            "filled_volume": self.filled_volume,
+            "avg_price": self.avg_price,
+            "decision_price": self.order.decision_price,
+            "slippage": self.slippage,
+            "attempts": self.attempts,
+            "requotes": self.requotes,
+            "filling_mode": self.filling_mode,
+            "retcode": self.retcode,
+            "comment": self.comment,
+            "latency_ms": self.latency_ms,
+        }
+
+
+class TradeExecutor:
+    """
+    executor = TradeExecutor(mt5, broker=cache).start()
+    future = executor.submit(OrderRequest("[SP500]", 1, 0.5, sl_distance=6, tp_distance=9,
+                                          decision_price=4000.0))
+    report = future.result()            # or executor.execute(order) synchronously
+
+    latency_budget: seconds from submission after which no new attempt is made.
+    """
+
+    def __init__(self, mt5, broker=None, latency_budget=2.0, max_attempts=6, filling_modes=None,
+                 history=10_000, on_report=None, clock=time.monotonic):
+        self.mt5 = mt5
+        self.broker = broker
+        self.latency_budget = latency_budget
+        self.max_attempts = max_attempts
+        self.filling_modes = tuple(filling_modes) if filling_modes is not None else (
+            mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_RETURN)
+        self.on_report = on_report
+        self.clock = clock
+
+        self.reports = deque(maxlen=history)
+        self._filling_by_symbol = {}    # last mode the server accepted
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    # Worker
+    # ---------------------------------------------------------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trade-executor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        """Finish the queued orders, then stop the worker."""
+        if self._thread is not None:
+            self._queue.put(None)
+            if wait:
+                self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            order, future = item
+            try:
+                future.set_result(self.execute(order))
+            except Exception as e:
+                incr("exec.errors")
+                future.set_exception(e)
+
+    def submit(self, order):
+        """Queue an order; returns a Future resolving to its ExecutionReport."""
+        order.submitted_at = self.clock()
+        future = Future()
+        self._queue.put((order, future))
+        incr("exec.submitted")
+        if self._thread is None:
+            self.start()
+        return future
+
+    def pending(self):
+        return self._queue.qsize()
+
+    # ---------------------------------------------------------
+    # Execution
+    # ---------------------------------------------------------
+    def _order_type(self, order):
+        return self.mt5.ORDER_TYPE_BUY if order.direction == 1 else self.mt5.ORDER_TYPE_SELL
+
+    def _price(self, order):
+        order_type = self._order_type(order)
+        if self.broker is not None:
+            return self.broker.fresh_price(order.symbol, order_type)
+        tick = self.mt5.symbol_info_tick(order.symbol)
+        if tick is None:
+            raise RuntimeError(f"symbol_info_tick failed: {self.mt5.last_error()}")
+        return tick.ask if order_type == self.mt5.ORDER_TYPE_BUY else tick.bid
+
+    def _request(self, order, volume, price, filling):
+        sl = tp = None
+        if order.sl_distance is not None:
+            sl = price - order.direction * order.sl_distance
+        if order.tp_distance is not None:
+            tp = price + order.direction * order.tp_distance
+        request = {
+            "action": self.mt5.TRADE_ACTION_DEAL,
+            "symbol": order.symbol,
+            "volume": volume,
+            "type": self._order_type(order),
+            "price": price,
+            "deviation": order.deviation,
+            "magic": order.magic,
+            "comment": order.comment,
+            "type_time": self.mt5.ORDER_TIME_GTC,
+            "type_filling": filling,
+        }
+        if sl is not None:
+            request["sl"] = sl
+        if tp is not None:
+            request["tp"] = tp
+        return request
+
+    def _modes(self, symbol):
+        # start from the mode that worked last time for this symbol
+        known = self._filling_by_symbol.get(symbol)
+        if known is None:
+            return list(self.filling_modes)
+        return [known] + [m for m in self.filling_modes if m != known]
+
+    def execute(self, order):
+        """
+        Send `order` until filled, rejected, or out of attempts / latency budget. Always
+        returns (and records) a report: an exception while sending ends it as "error",
+        and the unfilled part of the reserved margin is released either way.
+        """
+        if order.submitted_at is None:
+            order.submitted_at = self.clock()
+        report = ExecutionReport(order)
+        try:
+            self._send(order, report)
+        except Exception as e:
+            incr("exec.errors")
+            report.status = "error"
+            report.comment = f"{type(e).__name__}: {e}"
+        finally:
+            try:
+                self._release_margin(order, report)
+            finally:
+                report.latency_ms = (self.clock() - order.submitted_at) * 1000.0
+                self._record(report)
+        return report
+
+    def _send(self, order, report):
+        modes = self._modes(order.symbol)
+        mode_idx = 0
+        remaining = order.volume
+        price = None
+
+        while remaining > 1e-9:
+            if report.attempts >= self.max_attempts:
+                report.status = "expired"
+                break
+            if report.attempts and self.clock() - order.submitted_at > self.latency_budget:
+                report.status = "expired"
+                break
+            if mode_idx >= len(modes):
+                report.status = "rejected"
+                break
+
+            if price is None:
+                price = self._price(order)
+            filling = modes[mode_idx]
+            report.attempts += 1
+            result = self.mt5.order_send(self._request(order, round(remaining, 2), price, filling))
+
+            if result is None:
+                report.retcode = None
+                report.comment = str(self.mt5.last_error())
+                report.status = "rejected"
+                break
+
+            report.retcode = result.retcode
+            report.comment = result.comment
+
+            if result.retcode in (RETCODE_DONE, RETCODE_DONE_PARTIAL):
+                report.fills.append((result.deal, result.volume, result.price))
+                report.orders.append(result.order)
+                report.filling_mode = filling
+                self._filling_by_symbol[order.symbol] = filling
+                remaining -= result.volume
+                if self.broker is not None and order.reserved_margin is None:
+                    self.broker.note_order(order.symbol, result.volume, self._order_type(order))
+                price = None  # top up a partial fill at a fresh price
+                continue
+
+            if result.retcode == RETCODE_PLACED:
+                # accepted; the deal follows asynchronously (PositionManager sees it as a deal)
+                report.orders.append(result.order)
+                report.filling_mode = filling
+                self._filling_by_symbol[order.symbol] = filling
+                report.status = "placed"
+                break
+
+            if result.retcode in PRICE_RETCODES:
+                report.requotes += 1
+                incr("exec.requotes")
+                price = None
+                continue
+
+            if result.retcode == RETCODE_INVALID_FILL:
+                incr("exec.filling_fallbacks")
+                mode_idx += 1
+                continue
+
+            report.status = "rejected"
+            break
+
+        if report.fills:
+            if remaining <= 1e-9:
+                report.status = "filled"
+            elif report.status in ("pending", "expired", "rejected"):
+                report.status = "partial"
+
+    def _release_margin(self, order, report):
+        # a placed order keeps its reservation (it still fills; reservation_ttl ends it)
+        if self.broker is not None and order.reserved_margin and report.status != "placed":
+            self.broker.release_margin(order.order_id, report.filled_volume / order.volume)
+
+    def _record(self, report):
+        with self._lock:
+            self.reports.append(report)
+        incr(f"exec.{report.status}")
+        observe("exec.latency_ms", report.latency_ms)
+        if report.slippage is not None:
+            observe("exec.slippage_abs", abs(report.slippage))
+        if self.on_report is not None:
+            self.on_report(report)
+
+    # ---------------------------------------------------------
+    # Stats
+    # ---------------------------------------------------------
+    def stats(self):
+        with self._lock:
+            reports = list(self.reports)
+        n = len(reports)
+        if not n:
+            return {"orders": 0}
+        filled = [r for r in reports if r.fills]
+        slippage = [r.slippage for r in filled if r.slippage is not None]
+        latencies = sorted(r.latency_ms for r in reports)
+        return {
+            "orders": n,
+            "filled": sum(r.status == "filled" for r in reports),
+            "partial": sum(r.status == "partial" for r in reports),
+            "rejected": sum(r.status == "rejected" for r in reports),
+            "expired": sum(r.status == "expired" for r in reports),
+            "placed": sum(r.status == "placed" for r in reports),
+            "errors": sum(r.status == "error" for r in reports),
+            "fill_rate": len(filled) / n,
+            "mean_attempts": sum(r.attempts for r in reports) / n,
+            "requotes": sum(r.requotes for r in reports),
+            "mean_slippage": sum(slippage) / len(slippage) if slippage else None,
+            "p50_latency_ms": latencies[n // 2],
+            "max_latency_ms": latencies[-1],
+        }
@@ -1,81 +1,41 @@
 import pandas as pd
 import numpy as np
 
-from features.indicators import (
-    ema, rsi, atr, volatility_std, momentum,
-    stochastic_oscillator, macd, bollinger_bands,
-    candle_components
-)
+from features.feature_graph import FEATURE_ORDER, compute, groups
+from features.multi_timeframe import htf_features, is_htf_column
+from features.regime.regime_detector import REGIME_INPUTS, RegimeDetector
+from utils.logger import timed
 
+GROUPS = groups()
 
-def add_basic_price_features(df):
-    close = df["close"]
-    df["return_1"] = close.pct_change(1)
-    df["return_2"] = close.pct_change(2)
-    df["return_5"] = close.pct_change(5)
-    df["high_low_range"] = df["high"] - df["low"]
-    df["close_open"] = df["close"] - df["open"]
-    df["rolling_return_3"] = close.pct_change(3)
-    df["rolling_return_6"] = close.pct_change(6)
-    df["rolling_return_12"] = close.pct_change(12)
+
+def _add_group(df, group, params=None):
+    # compute one group through the graph; feature columns already in df are reused as inputs
+    names = GROUPS[group]
+    values = compute(df, names, params)
+    for name in names:
+        df[name] = values[name]
     return df
 
 
+def add_basic_price_features(df):
+    return _add_group(df, "basic")
+
+
 def add_volatility_features(df, params):
-    close = df["close"]
-    df["atr"] = atr(df["high"], df["low"], close, params.get("atr_window", 14))
-    df["vol_std"] = volatility_std(close.pct_change(), params.get("vol_window", 20))
-    return df
+    return _add_group(df, "volatility", params)
 
 
 def add_momentum_features(df, params):
-    close = df["close"]
-    df["rsi"] = rsi(close, params.get("rsi_window", 14))
-    df["momentum"] = momentum(close, params.get("momentum_window", 10))
-
-    k, d = stochastic_oscillator(
-        df["high"], df["low"], close,
-        params.get("stoch_k", 14),
-        params.get("stoch_d", 3)
-    )
-    df["stoch_k"] = k
-    df["stoch_d"] = d
-    return df
+    return _add_group(df, "momentum", params)
 
 
 def add_trend_features(df, params):
-    close = df["close"]
-    df["ema_fast"] = ema(close, params.get("ema_fast", 10))
-    df["ema_slow"] = ema(close, params.get("ema_slow", 20))
-    df["ema_slope_fast"] = df["ema_fast"].diff()
-    df["ema_slope_slow"] = df["ema_slow"].diff()
-    return df
+    return _add_group(df, "trend", params)
 
 
 def add_optional_advanced_features(df, params):
-    close = df["close"]
-
-    _, _, hist = macd(
-        close,
-        params.get("macd_fast", 12),
-        params.get("macd_slow", 26),
-        params.get("macd_signal", 9)
-    )
-    df["macd_hist"] = hist
-
-    lower, mid, upper = bollinger_bands(close, params.get("bb_window", 20))
-    df["bb_pos"] = (close - mid) / (upper - lower + 1e-9)
-    df["bb_width"] = (upper - lower) / (mid.replace(0, np.nan))
-
-    uw, lw, body, ratio = candle_components(
-        df["open"], df["high"], df["low"], df["close"]
-    )
-    df["wick_upper"] = uw
-    df["wick_lower"] = lw
-    df["body_size"] = body
-    df["body_ratio"] = ratio
-
-    return df
+    return _add_group(df, "advanced", params)
 
 
 # def add_target(df, future_n=2, threshold=0.0):
@@ -88,40 +48,13 @@ def add_optional_advanced_features(df, params):
 
 
 def add_regime_features(df):
-    # --- TIME REGIMES ---
-    df["hour"] = df.index.hour
-    df["weekday"] = df.index.dayofweek
-
-    # --- VOLATILITY REGIMES ---
-    df["atr_norm"] = df["atr"] / df["close"]
-    df["vol_compression"] = df["atr"] / df["atr"].rolling(20).mean()
-    df["vol_shock"] = df["atr"].pct_change()
-
-    # --- TREND REGIMES ---
-    df["ma_fast"] = ema(df["close"], 10)
-    df["ma_slow"] = ema(df["close"], 30)
-    df["trend_strength"] = df["ma_fast"] - df["ma_slow"]
-    df["trend_slope"] = df["trend_strength"].diff()
-    df["ma_dist"] = (df["close"] - df["ma_slow"]) / df["ma_slow"]
-
-    # --- BOLLINGER REGIMES ---
-    df["bb_width_norm"] = df["bb_width"] / df["close"]
-    df["bb_squeeze"] = (
-        df["bb_width_norm"] < df["bb_width_norm"].rolling(100).quantile(0.2)
-    ).astype(int)
-
-    # --- RETURN REGIMES ---
-    df["ret_abs"] = df["return_1"].abs()
-    df["ret_rolling_std"] = df["return_1"].rolling(20).std()
-    df["ret_zscore"] = (
-        df["return_1"] - df["return_1"].rolling(20).mean()
-    ) / df["return_1"].rolling(20).std()
-
-    return df
+    # needs atr, bb_width and return_1 from the earlier groups
+    return _add_group(df, "regime")
 
 
-def add_tp_sl_target(df, sl_mult=2.0, tp_mult=2.0, future_n=20):
-    df = df.copy()
+def add_tp_sl_target(df, sl_mult=2.0, tp_mult=2.0, future_n=20, inplace=False):
+    if not inplace:
+        df = df.copy()
 
     # Compute SL/TP levels
     sl_price = df["close"] - df["atr"] * sl_mult
@@ -131,6 +64,14 @@ def add_tp_sl_target(df, sl_mult=2.0, tp_mult=2.0, future_n=20):
     future_high = df["high"].rolling(future_n).max().shift(-future_n)
     future_low  = df["low"].rolling(future_n).min().shift(-future_n)
 
+    if inplace:
+        # Same labels, written as one int8 column instead of three passes over an int64 one
+        target = np.zeros(len(df), dtype=np.int8)
+        target[(future_high >= tp_price).to_numpy()] = 1
+        target[(future_low <= sl_price).to_numpy()] = -1
+        df["target"] = target
+        return df
+
     # Initialize target
     df["target"] = 0
 
@@ -140,19 +81,96 @@ def add_tp_sl_target(df, sl_mult=2.0, tp_mult=2.0, future_n=20):
     return df
 
 
-def build_features(df, params=None, future_n=20, sl_mult=2.0, tp_mult=2.0):
-    df = df.copy()
+# ---------------------------------------------------------
+# Compact (memory-lean) mode
+# ---------------------------------------------------------
+PRICE_COLUMNS = ("open", "high", "low", "close")
+CATEGORICAL_COLUMNS = ("hour", "weekday", "bb_squeeze", "regime")
+
+
+def _compact_base(df):
+    """
+    Copy of the raw bars for compact mode: prices stay float64 (they drive SL/TP and PnL),
+    every other numeric column becomes float32.
+    """
+    out = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if col in PRICE_COLUMNS:
+            out[col] = values.astype(np.float64, copy=True)
+        elif np.issubdtype(values.dtype, np.number):
+            out[col] = values.astype(np.float32)
+        else:
+            out[col] = values
+    return out
+
+
+def _compact_value(name, values):
+    # float64 features -> float32, categorical ints -> int8
+    values = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+    if name in CATEGORICAL_COLUMNS:
+        return values.astype(np.int8)
+    if values.dtype == np.float64:
+        return values.astype(np.float32)
+    return values
+
+
+def _select(features, required=()):
+    # requested features in column order; atr is always kept (SL/TP labels and the simulator use it)
+    if features is None:
+        return FEATURE_ORDER
+    wanted = {name for name in features if not is_htf_column(name) and name != "regime"}
+    wanted |= {"atr", *required}
+    unknown = wanted.difference(FEATURE_ORDER)
+    if unknown:
+        raise ValueError(f"Unknown features: {sorted(unknown)}")
+    return [name for name in FEATURE_ORDER if name in wanted]
+
+
+@timed("build_features")
+def build_features(df, params=None, future_n=20, sl_mult=2.0, tp_mult=2.0, compact=False,
+                   features=None, cache=None, htf=(), htf_source=None, regime=None):
+    """
+    features: subset of feature columns to build (e.g. feature_graph.feature_names(model));
+    only the nodes they depend on are computed. Default: all of them.
+    cache: feature_graph.FeatureCache shared across calls on the same raw frame.
+    htf: higher timeframes (e.g. ("M15", "H1")) whose indicators are added as <tf>_<name>
+    columns, as of the last HTF bar closed at each base bar (see features.multi_timeframe).
+    htf_source: source(timeframe, start, end) -> bars (e.g. BarStore.loader(symbol));
+    default: resample the base bars.
+    regime: True (fresh online RegimeDetector) or a RegimeDetector; adds a causal "regime"
+    column (online detectors only see the bars up to each row, fitted ones use their levels).
+    compact=True: float32 features, int8 hour/weekday/bb_squeeze/target, prices float64.
+    Each feature is downcast as it is produced, so peak memory is about one float64
+    temporary per feature instead of several full-frame copies.
+    XGBoost and LightGBM train on float32 natively.
+    """
     params = params or {}
+    names = _select(features, REGIME_INPUTS if regime else ())
+
+    # 1. Features (intermediates are computed on the raw float64 bars in both modes)
+    values = compute(df, names, params, cache=cache,
+                     convert=_compact_value if compact else None)
+    raw = df
+    df = _compact_base(df) if compact else df.copy()
+    for name in names:
+        df[name] = values.pop(name)
 
-    # 1. Add all features
-    df = add_basic_price_features(df)
-    df = add_volatility_features(df, params)
-    df = add_momentum_features(df, params)
-    df = add_trend_features(df, params)
-    df = add_optional_advanced_features(df, params)
-    df = add_regime_features(df)
+    if htf:
+        for name, column in htf_features(raw, htf, params, source=htf_source).items():
+            df[name] = column.astype(np.float32) if compact else column
+
+    if regime:
+        detector = RegimeDetector(online=True) if regime is True else regime
+        regimes = detector.stream(df) if detector.online else detector.transform(df)
+        df["regime"] = regimes.to_numpy().astype(np.int8) if compact else regimes
 
     # 2. Drop NaNs BEFORE computing target
+    if compact:
+        df.dropna(inplace=True)
+        add_tp_sl_target(df, sl_mult=sl_mult, tp_mult=tp_mult, future_n=future_n, inplace=True)
+        return df
+
     df = df.dropna().copy()
 
     # 3. Compute target AFTER features
@@ -162,5 +180,3 @@ def build_features(df, params=None, future_n=20, sl_mult=2.0, tp_mult=2.0):
     df = df.dropna(subset=["target"])
 
     return df
-
-
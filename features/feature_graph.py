@@ -0,0 +1,471 @@
+# features/feature_graph.py
+# Features declared as nodes of a DAG. A feature list resolves to the minimal set of
+# computations; shared intermediates (EMAs, true range, rolling stats, Bollinger bands)
+# are keyed by their parameters, so each one is computed once per call, or once per
+# FeatureCache across calls.
+#
+# Keys:
+#   "close", "high", ...          raw columns
+#   "atr", "rsi", ...             features (column names of build_features)
+#   ("ema", 10), ("tr",), ...     intermediates, keyed by kind + parameters
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from features.indicators import (
+    ema, rsi, true_range, momentum,
+    stochastic_oscillator, bollinger_bands, candle_components
+)
+from features.rolling_quantile import below_rolling_quantile
+
+RAW_COLUMNS = ("open", "high", "low", "close", "tick_volume", "spread", "real_volume")
+
+# Wilder smoothing (alpha = 1/w) converges slower than span-EMAs (alpha = 2/(w+1))
+EMA_WARMUP = 10
+WILDER_WARMUP = 20
+
+
+# ---------------------------------------------------------
+# Intermediates
+# ---------------------------------------------------------
+# kind -> (deps(*args), fn(*dep_values, *args), own lookback(*args))
+def _ema_fn(close, w):
+    return ema(close, w)
+
+
+def _atr_fn(tr, w):
+    # same as indicators.atr, but on a shared true range
+    return tr.ewm(alpha=1 / w, adjust=False).mean()
+
+
+def _macd_hist_fn(ema_fast, ema_slow, fast, slow, signal):
+    # same arithmetic as indicators.macd, on shared EMAs
+    macd_line = ema_fast - ema_slow
+    signal_line = ema(macd_line, signal)
+    return macd_line - signal_line
+
+
+INTERMEDIATES = {
+    "ret": (lambda k: ["close"], lambda close, k: close.pct_change(k), lambda k: k),
+    "ema": (lambda w: ["close"], _ema_fn, lambda w: EMA_WARMUP * w),
+    "tr": (lambda: ["high", "low", "close"], true_range, lambda: 1),
+    "atr": (lambda w: [("tr",)], _atr_fn, lambda w: WILDER_WARMUP * w),
+    "rsi": (lambda w: ["close"], rsi, lambda w: WILDER_WARMUP * w),
+    "mom": (lambda w: ["close"], momentum, lambda w: w),
+    "rmean": (lambda src, w: [src], lambda s, src, w: s.rolling(w).mean(), lambda src, w: w),
+    "rstd": (lambda src, w: [src], lambda s, src, w: s.rolling(w).std(), lambda src, w: w),
+    "stoch": (
+        lambda k, d: ["high", "low", "close"],
+        lambda h, l, c, k, d: stochastic_oscillator(h, l, c, k, d),
+        lambda k, d: k + d,
+    ),
+    "macd_hist": (
+        lambda f, s, sig: [("ema", f), ("ema", s)],
+        _macd_hist_fn,
+        lambda f, s, sig: EMA_WARMUP * sig,
+    ),
+    "bb": (lambda w: ["close"], lambda c, w: bollinger_bands(c, w), lambda w: w),
+    "candle": (lambda: ["open", "high", "low", "close"], candle_components, lambda: 1),
+}
+
+
+# ---------------------------------------------------------
+# Features
+# ---------------------------------------------------------
+def _p(params, name, default):
+    return params.get(name, default)
+
+
+class FeatureNode:
+    __slots__ = ("name", "deps", "fn", "group")
+
+    def __init__(self, name, group, deps, fn):
+        self.name = name
+        self.group = group
+        self.deps = deps    # params -> list of keys
+        self.fn = fn        # (*dep_values, index) -> Series / array
+
+
+FEATURES = OrderedDict()
+
+
+def feature(name, group, deps, fn):
+    FEATURES[name] = FeatureNode(name, group, deps, fn)
+
+
+def _same(x, index):
+    return x
+
+
+# --- basic price ---
+feature("return_1", "basic", lambda p: [("ret", 1)], _same)
+feature("return_2", "basic", lambda p: [("ret", 2)], _same)
+feature("return_5", "basic", lambda p: [("ret", 5)], _same)
+feature("high_low_range", "basic", lambda p: ["high", "low"], lambda h, l, index: h - l)
+feature("close_open", "basic", lambda p: ["close", "open"], lambda c, o, index: c - o)
+feature("rolling_return_3", "basic", lambda p: [("ret", 3)], _same)
+feature("rolling_return_6", "basic", lambda p: [("ret", 6)], _same)
+feature("rolling_return_12", "basic", lambda p: [("ret", 12)], _same)
+
+# --- volatility ---
+feature("atr", "volatility", lambda p: [("atr", _p(p, "atr_window", 14))], _same)
+feature("vol_std", "volatility", lambda p: [("rstd", ("ret", 1), _p(p, "vol_window", 20))], _same)
+
+# --- momentum ---
+feature("rsi", "momentum", lambda p: [("rsi", _p(p, "rsi_window", 14))], _same)
+feature("momentum", "momentum", lambda p: [("mom", _p(p, "momentum_window", 10))], _same)
+feature("stoch_k", "momentum", lambda p: [("stoch", _p(p, "stoch_k", 14), _p(p, "stoch_d", 3))],
+        lambda kd, index: kd[0])
+feature("stoch_d", "momentum", lambda p: [("stoch", _p(p, "stoch_k", 14), _p(p, "stoch_d", 3))],
+        lambda kd, index: kd[1])
+
+# --- trend ---
+feature("ema_fast", "trend", lambda p: [("ema", _p(p, "ema_fast", 10))], _same)
+feature("ema_slow", "trend", lambda p: [("ema", _p(p, "ema_slow", 20))], _same)
+feature("ema_slope_fast", "trend", lambda p: [("ema", _p(p, "ema_fast", 10))], lambda e, index: e.diff())
+feature("ema_slope_slow", "trend", lambda p: [("ema", _p(p, "ema_slow", 20))], lambda e, index: e.diff())
+
+# --- advanced ---
+feature("macd_hist", "advanced",
+        lambda p: [("macd_hist", _p(p, "macd_fast", 12), _p(p, "macd_slow", 26), _p(p, "macd_signal", 9))],
+        _same)
+feature("bb_pos", "advanced", lambda p: ["close", ("bb", _p(p, "bb_window", 20))],
+        lambda c, bb, index: (c - bb[1]) / (bb[2] - bb[0] + 1e-9))
+feature("bb_width", "advanced", lambda p: [("bb", _p(p, "bb_window", 20))],
+        lambda bb, index: (bb[2] - bb[0]) / (bb[1].replace(0, np.nan)))
+feature("wick_upper", "advanced", lambda p: [("candle",)], lambda cc, index: cc[0])
+feature("wick_lower", "advanced", lambda p: [("candle",)], lambda cc, index: cc[1])
+feature("body_size", "advanced", lambda p: [("candle",)], lambda cc, index: cc[2])
+feature("body_ratio", "advanced", lambda p: [("candle",)], lambda cc, index: cc[3])
+
+# --- regime ---
+feature("hour", "regime", lambda p: [], lambda index: pd.Series(index.hour, index=index))
+feature("weekday", "regime", lambda p: [], lambda index: pd.Series(index.dayofweek, index=index))
+feature("atr_norm", "regime", lambda p: ["atr", "close"], lambda a, c, index: a / c)
+feature("vol_compression", "regime", lambda p: ["atr", ("rmean", "atr", 20)],
+        lambda a, m, index: a / m)
+feature("vol_shock", "regime", lambda p: ["atr"], lambda a, index: a.pct_change())
+feature("ma_fast", "regime", lambda p: [("ema", 10)], _same)
+feature("ma_slow", "regime", lambda p: [("ema", 30)], _same)
+feature("trend_strength", "regime", lambda p: ["ma_fast", "ma_slow"], lambda f, s, index: f - s)
+feature("trend_slope", "regime", lambda p: ["trend_strength"], lambda t, index: t.diff())
+feature("ma_dist", "regime", lambda p: ["close", "ma_slow"], lambda c, s, index: (c - s) / s)
+feature("bb_width_norm", "regime", lambda p: ["bb_width", "close"], lambda w, c, index: w / c)
+feature("bb_squeeze", "regime", lambda p: ["bb_width_norm"],
+        lambda w, index: pd.Series(below_rolling_quantile(w.to_numpy(), 100, 0.2).astype(int), index=index))
+feature("ret_abs", "regime", lambda p: [("ret", 1)], lambda r, index: r.abs())
+feature("ret_rolling_std", "regime", lambda p: [("rstd", ("ret", 1), 20)], _same)
+feature("ret_zscore", "regime", lambda p: [("ret", 1), ("rmean", ("ret", 1), 20), ("rstd", ("ret", 1), 20)],
+        lambda r, m, s, index: (r - m) / s)
+
+# Column order of build_features (saved models depend on it)
+FEATURE_ORDER = list(FEATURES)
+
+# Extra lookback of features that are not pure passthroughs of an intermediate
+FEATURE_LOOKBACK = {
+    "ema_slope_fast": 1,
+    "ema_slope_slow": 1,
+    "vol_shock": 1,
+    "trend_slope": 1,
+    "bb_squeeze": 100,
+}
+
+
+def groups():
+    out = OrderedDict()
+    for node in FEATURES.values():
+        out.setdefault(node.group, []).append(node.name)
+    return out
+
+
+# ---------------------------------------------------------
+# Resolution
+# ---------------------------------------------------------
+def _deps(key, params):
+    if isinstance(key, tuple):
+        kind, *args = key
+        return list(INTERMEDIATES[kind][0](*args))
+    if key in FEATURES:
+        return list(FEATURES[key].deps(params))
+    return []  # raw column
+
+
+def resolve(features, params=None, available=()):
+    """
+    Minimal computation plan for `features`: every key needed, in dependency order
+    (dependencies first). Keys in `available` are inputs; their dependencies are skipped.
+    """
+    params = params or {}
+    available = set(available)
+    order, seen = [], set()
+
+    def visit(key):
+        if key in seen:
+            return
+        seen.add(key)
+        if key not in available:
+            for dep in _deps(key, params):
+                visit(dep)
+        order.append(key)
+
+    for name in features:
+        if name not in FEATURES:
+            raise ValueError(f"Unknown feature: {name}")
+        visit(name)
+    return order
+
+
+def required_columns(features, params=None):
+    """Raw input columns needed for `features`."""
+    return [k for k in resolve(features, params) if isinstance(k, str) and k not in FEATURES]
+
+
+def lookback(features, params=None):
+    """
+    Bars of history needed before a value of `features` is (numerically) independent of
+    where the input starts. EMA/Wilder nodes count several spans so the truncated tail
+    weight is negligible (< e^-20).
+    """
+    params = params or {}
+    memo = {}
+
+    def own(key):
+        if isinstance(key, tuple):
+            kind, *args = key
+            return INTERMEDIATES[kind][2](*args)
+        return FEATURE_LOOKBACK.get(key, 0)
+
+    def total(key):
+        if key not in memo:
+            deps = _deps(key, params)
+            memo[key] = own(key) + max((total(d) for d in deps), default=0)
+        return memo[key]
+
+    return max((total(name) for name in features), default=0)
+
+
+def feature_names(model):
+    """Feature columns a fitted model expects (sklearn feature_names_in_), minus raw columns."""
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        return None
+    return [n for n in names if n in FEATURES]
+
+
+# ---------------------------------------------------------
+# Cache
+# ---------------------------------------------------------
+class FeatureCache:
+    """
+    LRU store for node values of one raw frame, shared across calls (e.g. Optuna trials):
+    ("ema", 17) computed in one trial is reused by every later trial asking for it.
+    Bound to the frame it was filled from; a different frame clears it.
+    """
+
+    def __init__(self, max_items=64):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.token = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _token(df):
+        return (id(df), len(df), df.index[0] if len(df) else None, df.index[-1] if len(df) else None)
+
+    def bind(self, df):
+        token = self._token(df)
+        if token != self.token:
+            self.items.clear()
+            self.token = token
+
+    def get(self, key):
+        if key in self.items:
+            self.items.move_to_end(key)
+            self.hits += 1
+            return self.items[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+
+
+# ---------------------------------------------------------
+# Evaluation
+# ---------------------------------------------------------
+def _cache_key(key, params):
+    # features are cached under their fully resolved dependencies (i.e. their own params,
+    # and those of the features they read, like atr_window for atr_norm)
+    if isinstance(key, tuple):
+        kind, *args = key
+        return (kind,) + tuple(_cache_key(a, params) if isinstance(a, str) else a for a in args)
+    if key in FEATURES:
+        return (key,) + tuple(_cache_key(d, params) for d in _deps(key, params))
+    return key
+
+
+def compute(df, features=None, params=None, cache=None, convert=None):
+    """
+    Compute `features` (default: all) from the raw bars in df.
+    Feature columns already present in df (and not requested) are used as inputs.
+    Returns {feature_name: values}. Intermediates are dropped as soon as their last
+    consumer ran; convert(name, series) is applied to every output as it is produced
+    (used to downcast in compact mode).
+    """
+    params = params or {}
+    features = list(features) if features is not None else FEATURE_ORDER
+    wanted = set(features)
+    available = set(df.columns) - wanted
+    plan = resolve(features, params, available)
+
+    def deps_of(key):
+        return [] if key in available else _deps(key, params)
+
+    consumers = {}
+    for key in plan:
+        for dep in deps_of(key):
+            consumers[dep] = consumers.get(dep, 0) + 1
+
+    if cache is not None:
+        cache.bind(df)
+
+    index = df.index
+    values = {}
+    outputs = {}
+
+    for key in plan:
+        if key in available or (isinstance(key, str) and key not in FEATURES):
+            values[key] = df[key]
+            continue
+
+        ckey = _cache_key(key, params)
+        value = cache.get(ckey) if cache is not None else None
+
+        if value is None:
+            dep_values = [values[d] for d in deps_of(key)]
+            if isinstance(key, tuple):
+                kind, *args = key
+                value = INTERMEDIATES[kind][1](*dep_values, *args)
+            else:
+                value = FEATURES[key].fn(*dep_values, index)
+            if cache is not None:
+                cache.put(ckey, value)
+
+        values[key] = value
+
+        if key in wanted:
+            outputs[key] = convert(key, value) if convert is not None else value
+
+        # free inputs nobody else needs
+        for dep in deps_of(key):
+            consumers[dep] -= 1
+            if consumers[dep] == 0 and dep not in wanted:
+                values.pop(dep, None)
+        if consumers.get(key, 0) == 0 and key not in wanted:
+            values.pop(key, None)
+
+    return outputs
+
+
+# ---------------------------------------------------------
+# Incremental (live) path
+# ---------------------------------------------------------
+class IncrementalFeatures:
+    """
+    Feature rows for streaming bars. Keeps only the last lookback()+1 raw bars and
+    evaluates the same graph on tail + new bars, so every poll costs O(lookback)
+    instead of a full rebuild over the whole download.
+    """
+
+    OVERLAP = 10  # bars re-requested per poll once warm (duplicates are dropped)
+
+    def __init__(self, features=None, params=None, htf=(), timeframe=None, htf_source=None,
+                 regime=None):
+        self.features = list(features) if features is not None else FEATURE_ORDER
+        self.params = params or {}
+
+        # online RegimeDetector: its state carries over between polls, fed only the new bars
+        self.regime = regime
+        if regime is not None:
+            from features.regime.regime_detector import REGIME_INPUTS
+
+            self.features = [n for n in FEATURE_ORDER if n in set(self.features) | set(REGIME_INPUTS)]
+
+        self.window = lookback(self.features, self.params) + 1
+
+        # higher-timeframe columns (features.multi_timeframe) are recomputed on the tail too
+        self.htf = tuple(htf)
+        self.htf_source = htf_source
+        self.base_tf = None
+        if timeframe is not None:
+            from features.multi_timeframe import TIMEFRAME_MINUTES
+
+            self.base_tf = TIMEFRAME_MINUTES[timeframe]
+        if self.htf:
+            from features.multi_timeframe import htf_lookback
+
+            if timeframe is None:
+                raise ValueError("timeframe (of the streamed bars) is required with htf.")
+            self.window = max(self.window, htf_lookback(self.htf, self.params, base_tf=self.base_tf))
+        self.tail = None
+
+    @property
+    def bars_needed(self):
+        """How many recent bars the next update() should receive."""
+        return self.window if self.tail is None else self.OVERLAP
+
+    def _bar_length(self):
+        """Bar spacing as a Timedelta: the timeframe when known, else inferred from the tail."""
+        if self.base_tf is None:
+            from features.multi_timeframe import base_minutes
+
+            if len(self.tail) < 2:
+                return pd.Timedelta(0)      # unknown yet: anything after the tail re-warms
+            self.base_tf = base_minutes(self.tail.index)
+        return pd.Timedelta(minutes=self.base_tf)
+
+    def update(self, bars):
+        """
+        Feed the latest raw bars (may overlap what was already seen). Returns raw columns +
+        features for the bars that were new, in build_features column order.
+        Bars that start right after the tail (a catch-up of OVERLAP or more bars) continue
+        it. A gap drops the state and returns no rows; bars_needed is then the full window,
+        so the next poll re-fetches a complete warm-up.
+        """
+        if self.tail is not None and len(bars):
+            tail_end = self.tail.index[-1]
+            if bars.index[0] > tail_end + self._bar_length():
+                self.tail = None
+                return bars.iloc[:0]
+            bars = bars[bars.index > tail_end]
+
+        if bars.empty:
+            return bars.iloc[:0]
+
+        raw = bars if self.tail is None else pd.concat([self.tail, bars])
+        values = compute(raw, self.features, self.params)
+        n_new = len(bars)
+
+        out = raw.iloc[-n_new:].copy()
+        for name in FEATURE_ORDER:
+            if name in values:
+                out[name] = values[name].iloc[-n_new:] if isinstance(values[name], pd.Series) \
+                    else np.asarray(values[name])[-n_new:]
+
+        if self.htf:
+            from features.multi_timeframe import htf_features
+
+            for name, column in htf_features(raw, self.htf, self.params, source=self.htf_source,
+                                             base_tf=self.base_tf, use_cache=False).items():
+                out[name] = column[-n_new:]
+
+        if self.regime is not None:
+            out["regime"] = self.regime.stream(out)
+
+        self.tail = raw.iloc[-self.window:]
+        return out
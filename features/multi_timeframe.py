@@ -0,0 +1,195 @@
+# features/multi_timeframe.py
+# Higher-timeframe (HTF) context for base bars: M15/H1/H4 bars are resampled from the base
+# bars (or read from a bar store), HTF indicators are computed once on those bars through
+# the feature graph, and each base bar gets the values of the last HTF bar that had
+# *closed* by the time the base bar closed (no lookahead).
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from features.feature_graph import compute, lookback
+from utils.config import LOCAL_TZ
+
+TIMEFRAME_MINUTES = {
+    "M1": 1,
+    "M5": 5,
+    "M15": 15,
+    "M30": 30,
+    "H1": 60,
+    "H4": 240,
+    "D1": 1440,
+}
+
+# Scale-free features only: HTF price levels would just duplicate the base ones
+HTF_FEATURES = (
+    "return_1", "rolling_return_3", "rsi", "stoch_k",
+    "atr_norm", "bb_pos", "bb_width", "ma_dist",
+)
+
+_NS_PER_MINUTE = 60 * 1_000_000_000
+
+_cache = OrderedDict()
+_CACHE_ITEMS = 16
+
+
+def htf_column(timeframe, name):
+    return f"{timeframe.lower()}_{name}"
+
+
+def htf_columns(timeframes, features=HTF_FEATURES):
+    return [htf_column(tf, name) for tf in timeframes for name in features]
+
+
+def is_htf_column(name):
+    prefix, _, rest = name.partition("_")
+    return bool(rest) and prefix.upper() in TIMEFRAME_MINUTES
+
+
+def _utc_ns(index):
+    if index.tz is None:
+        index = index.tz_localize("UTC")
+    return index.tz_convert("UTC").asi8
+
+
+def base_minutes(index):
+    """Bar length of index in minutes (median spacing, so weekend gaps don't matter)."""
+    if len(index) < 2:
+        raise ValueError("Need at least two bars to infer the base timeframe.")
+    diffs = np.diff(_utc_ns(index[:1001]))
+    return int(np.median(diffs) // _NS_PER_MINUTE)
+
+
+# ---------------------------------------------------------
+# Resampling
+# ---------------------------------------------------------
+def resample_ohlc(df, timeframe):
+    """
+    Aggregate bars into `timeframe` bins aligned in UTC (labelled by bin start, like MT5).
+    Vectorized with reduceat over bin boundaries; empty bins are not created.
+    """
+    ns = TIMEFRAME_MINUTES[timeframe] * _NS_PER_MINUTE
+    t = _utc_ns(df.index)
+    if len(t) == 0:
+        return df.iloc[:0].copy()
+
+    bins = t // ns * ns
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    ends = np.r_[starts[1:], len(t)] - 1
+
+    out = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if col == "open":
+            out[col] = values[starts]
+        elif col == "high":
+            out[col] = np.maximum.reduceat(values, starts)
+        elif col == "low":
+            out[col] = np.minimum.reduceat(values, starts)
+        elif col == "close":
+            out[col] = values[ends]
+        elif col == "spread":
+            out[col] = np.minimum.reduceat(values, starts)
+        elif np.issubdtype(values.dtype, np.number):
+            out[col] = np.add.reduceat(values, starts)
+
+    index = pd.DatetimeIndex(bins[starts].astype("datetime64[ns]")).tz_localize("UTC").tz_convert(LOCAL_TZ)
+    index.name = df.index.name
+    return pd.DataFrame(out, index=index)
+
+
+# ---------------------------------------------------------
+# Alignment
+# ---------------------------------------------------------
+def align_positions(htf_index, timeframe, base_index, base_tf_minutes):
+    """
+    For every base bar, the row of the last HTF bar completed when the base bar closed
+    (-1 = none yet). HTF bar [t, t + tf) is usable once t + tf <= base_open + base_tf.
+    """
+    available = _utc_ns(htf_index) + TIMEFRAME_MINUTES[timeframe] * _NS_PER_MINUTE
+    known = _utc_ns(base_index) + base_tf_minutes * _NS_PER_MINUTE
+    return np.searchsorted(available, known, side="right") - 1
+
+
+def _take(values, pos):
+    out = values.astype(np.float64, copy=False)[np.maximum(pos, 0)]
+    out[pos < 0] = np.nan
+    return out
+
+
+# ---------------------------------------------------------
+# HTF indicators (cached)
+# ---------------------------------------------------------
+def _token(df):
+    # cheap identity of a raw frame: size, time span and a checksum of the closes
+    t = _utc_ns(df.index)
+    return (len(df), int(t[0]), int(t[-1]), float(df["close"].to_numpy().sum()))
+
+
+def _htf_indicators(df, timeframe, params, features, source, base_tf):
+    if source is not None:
+        # enough HTF history before the first base bar for the indicators to warm up
+        warmup = (lookback(features, params) + 1) * TIMEFRAME_MINUTES[timeframe]
+        start = df.index[0] - pd.Timedelta(minutes=warmup)
+        bars = source(timeframe, start, df.index[-1])
+        if bars is not None and len(bars):
+            return compute(bars, features, params), bars.index
+    if TIMEFRAME_MINUTES[timeframe] <= base_tf:
+        raise ValueError(f"HTF {timeframe} must be longer than the base timeframe ({base_tf} min).")
+    bars = resample_ohlc(df, timeframe)
+    return compute(bars, features, params), bars.index
+
+
+def htf_indicators(df, timeframe, params=None, features=HTF_FEATURES, source=None,
+                   base_tf=None, use_cache=True):
+    """
+    HTF indicator values ({name: Series on HTF bars}) for the base bars in df.
+    Cached per (frame, timeframe, params, features): Optuna trials sharing indicator
+    params reuse them, and the per-bar cost is only the alignment.
+    """
+    params = params or {}
+    features = tuple(features)
+    base_tf = base_tf or base_minutes(df.index)
+
+    if not use_cache:
+        return _htf_indicators(df, timeframe, params, features, source, base_tf)
+
+    key = (_token(df), timeframe, tuple(sorted(params.items())), features, id(source) if source else None)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    value = _htf_indicators(df, timeframe, params, features, source, base_tf)
+    _cache[key] = value
+    while len(_cache) > _CACHE_ITEMS:
+        _cache.popitem(last=False)
+    return value
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def htf_features(df, timeframes, params=None, features=HTF_FEATURES, source=None,
+                 base_tf=None, use_cache=True):
+    """
+    {column: float64 array aligned to df.index} for every timeframe x feature.
+    source(timeframe, start, end) -> bars or None (e.g. BarStore.loader(symbol));
+    without it (or when it has nothing) HTF bars are resampled from df.
+    """
+    base_tf = base_tf or base_minutes(df.index)
+    out = {}
+    for tf in timeframes:
+        values, htf_index = htf_indicators(df, tf, params, features, source, base_tf, use_cache)
+        pos = align_positions(htf_index, tf, df.index, base_tf)
+        for name in features:
+            column = values[name]
+            column = column.to_numpy() if isinstance(column, pd.Series) else np.asarray(column)
+            out[htf_column(tf, name)] = _take(column, pos)
+    return out
+
+
+def htf_lookback(timeframes, params=None, features=HTF_FEATURES, base_tf=5):
+    """Base bars of history the HTF columns need (one extra HTF bar for the partial bin)."""
+    bars = lookback(features, params) + 2
+    return max((bars * TIMEFRAME_MINUTES[tf] // base_tf for tf in timeframes), default=0)
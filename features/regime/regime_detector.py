@@ -1,18 +1,62 @@
 import numpy as np
 import pandas as pd
 
+from features.regime.streaming_quantile import P2Quantile
+
+# Regime codes
+CRUSH, TREND, RANGE, EXPANSION = 0, 1, 2, 3
+
+# Columns the detector reads (all produced by build_features)
+REGIME_INPUTS = ("bb_width", "atr", "ema_slope_fast", "ema_slope_slow")
+
+
+def classify(bb, atr, ema_slope, bb_crush_level, atr_crush_level, bb_expansion_level,
+             ema_slope_threshold=0.0):
+    """
+    Regime per bar from plain arrays; the levels may be scalars or per-bar arrays.
+    Priority: crush (0) > trend (1) > expansion (3) > range (2).
+    NaN inputs fail every comparison, i.e. fall through to range like before.
+    """
+    with np.errstate(invalid="ignore"):
+        cond_crush = (bb <= bb_crush_level) & (atr <= atr_crush_level)
+        cond_trend = np.abs(ema_slope) >= ema_slope_threshold
+        cond_expansion = bb >= bb_expansion_level
+    return np.select([cond_crush, cond_trend, cond_expansion], [CRUSH, TREND, EXPANSION], default=RANGE)
+
+
+def _inputs(df):
+    bb = df["bb_width"].to_numpy(dtype=np.float64)
+    atr = df["atr"].to_numpy(dtype=np.float64)
+    # EMA slope proxy for trend strength
+    ema_slope = df["ema_slope_fast"].to_numpy(dtype=np.float64) - df["ema_slope_slow"].to_numpy(dtype=np.float64)
+    return bb, atr, ema_slope
+
+
 class RegimeDetector:
+    """
+    Batch: fit() takes full-history percentiles, transform() applies them.
+    Online (online=True): levels are P² streaming estimates over every bar seen so far;
+    update()/stream() classify bars as they arrive, without refitting on the history.
+    Bars before `warmup` samples have no levels (no crush/expansion, trend still applies).
+    """
+
     def __init__(
         self,
         bb_expansion_percentile=70.0,
         bb_crush_percentile=30.0,
         atr_crush_percentile=30.0,
         ema_slope_threshold=0.0,
+        online=False,
+        warmup=100,
     ):
         self.bb_expansion_percentile = bb_expansion_percentile
         self.bb_crush_percentile = bb_crush_percentile
         self.atr_crush_percentile = atr_crush_percentile
         self.ema_slope_threshold = ema_slope_threshold
+        self.online = online
+        self.warmup = warmup
+        if online:
+            self.reset()
 
     def fit(self, df):
         self.bb_expansion_level = np.percentile(df["bb_width"], self.bb_expansion_percentile)
@@ -21,31 +65,61 @@ class RegimeDetector:
         return self
 
     def transform(self, df):
-        regimes = pd.Series(index=df.index, dtype="int64")
-
-        bb = df["bb_width"]
-        atr = df["atr"]
+        """Regimes of df with the current levels (fitted, or the online estimates so far)."""
+        bb, atr, ema_slope = _inputs(df)
+        regimes = classify(bb, atr, ema_slope, self.bb_crush_level, self.atr_crush_level,
+                           self.bb_expansion_level, self.ema_slope_threshold)
+        return pd.Series(regimes.astype(np.int64), index=df.index)
 
-        # EMA slope proxy for trend strength
-        ema_slope = df["ema_slope_fast"] - df["ema_slope_slow"]
-
-        # 0: no-trade / volatility crush
-        cond_crush = (bb <= self.bb_crush_level) & (atr <= self.atr_crush_level)
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
 
-        # 1: trend
-        cond_trend = ema_slope.abs() >= self.ema_slope_threshold
+    # ---------------------------------------------------------
+    # Online mode
+    # ---------------------------------------------------------
+    def reset(self):
+        self._bb_expansion = P2Quantile.from_percentile(self.bb_expansion_percentile)
+        self._bb_crush = P2Quantile.from_percentile(self.bb_crush_percentile)
+        self._atr_crush = P2Quantile.from_percentile(self.atr_crush_percentile)
+        self.bb_expansion_level = self.bb_crush_level = self.atr_crush_level = np.nan
+        self.last_time = None
+        return self
 
-        # 3: volatility expansion
-        cond_expansion = bb >= self.bb_expansion_level
+    def _levels(self, bb, atr):
+        """Feed one bar to the estimators; returns the levels valid for that bar."""
+        expansion = self._bb_expansion.update(bb)
+        crush = self._bb_crush.update(bb)
+        atr_crush = self._atr_crush.update(atr)
+        if self._bb_crush.count < self.warmup:
+            return np.nan, np.nan, np.nan
+        self.bb_expansion_level, self.bb_crush_level, self.atr_crush_level = expansion, crush, atr_crush
+        return crush, atr_crush, expansion
 
-        regimes[cond_crush] = 0
-        regimes[cond_trend & ~cond_crush] = 1
-        regimes[cond_expansion & ~cond_crush & ~cond_trend] = 3
+    def update(self, bb, atr, ema_slope):
+        """Classify one new bar (levels include it: it is known at its close)."""
+        crush, atr_crush, expansion = self._levels(bb, atr)
+        return int(classify(np.float64(bb), np.float64(atr), np.float64(ema_slope),
+                            crush, atr_crush, expansion, self.ema_slope_threshold))
 
-        # 2: range (default)
-        regimes[regimes.isna()] = 2
+    def stream(self, df):
+        """
+        Online regimes for the rows of df not seen yet (by index time), advancing the state.
+        Feeding overlapping frames (e.g. every live poll) only processes the new bars.
+        Returns a Series over the new rows.
+        """
+        if not self.online:
+            raise RuntimeError("stream() needs RegimeDetector(online=True).")
+        if self.last_time is not None:
+            df = df[df.index > self.last_time]
+        if df.empty:
+            return pd.Series(np.empty(0, dtype=np.int64), index=df.index)
 
-        return regimes.astype(int)
+        bb, atr, ema_slope = _inputs(df)
+        levels = np.empty((len(df), 3), dtype=np.float64)
+        for j, (b, a) in enumerate(zip(bb.tolist(), atr.tolist())):
+            levels[j] = self._levels(b, a)
 
-    def fit_transform(self, df):
-        return self.fit(df).transform(df)
+        regimes = classify(bb, atr, ema_slope, levels[:, 0], levels[:, 1], levels[:, 2],
+                           self.ema_slope_threshold)
+        self.last_time = df.index[-1]
+        return pd.Series(regimes.astype(np.int64), index=df.index)
@@ -0,0 +1,101 @@
+# features/regime/streaming_quantile.py
+# P² (Jain & Chlamtac, 1985) streaming quantile estimator: five markers, O(1) memory and
+# O(1) per update, so live regime levels follow the market without storing the history.
+import math
+
+import numpy as np
+
+
+class P2Quantile:
+    """
+    q = P2Quantile(0.3)
+    for x in values: q.update(x)
+    q.value  -> running estimate of the 30th percentile (exact for the first 5 samples)
+    NaNs are ignored.
+    """
+
+    __slots__ = ("p", "count", "heights", "positions", "desired", "increments", "_init")
+
+    def __init__(self, p):
+        if not 0.0 < p < 1.0:
+            raise ValueError(f"p must be in (0, 1), got {p}")
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1.0, 1.0 + 2 * p, 1.0 + 4 * p, 3.0 + 2 * p, 5.0]
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+        self._init = []
+
+    @classmethod
+    def from_percentile(cls, percentile):
+        return cls(percentile / 100.0)
+
+    @property
+    def value(self):
+        if self.count == 0:
+            return math.nan
+        if self.count <= 5:
+            # exact (linear interpolation, like np.percentile) until the markers exist
+            return float(np.percentile(self._init, self.p * 100.0))
+        return self.heights[2]
+
+    def update(self, x):
+        if x != x:  # NaN
+            return self.value
+        self.count += 1
+
+        if self.count <= 5:
+            self._init.append(x)
+            if self.count == 5:
+                self.heights = sorted(self._init)
+            return self.value
+
+        q = self.heights
+        n = self.positions
+
+        # 1. cell of x, extending the extremes
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # 2. move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = candidate
+                n[i] += step
+
+        return q[2]
+
+    def _parabolic(self, i, d):
+        q = self.heights
+        n = self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def update_many(self, values):
+        """Feed a batch; returns the estimate after each value (float64 array)."""
+        out = np.empty(len(values), dtype=np.float64)
+        update = self.update
+        for j, x in enumerate(np.asarray(values, dtype=np.float64).tolist()):
+            out[j] = update(x)
+        return out
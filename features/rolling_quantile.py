@@ -0,0 +1,166 @@
+# features/rolling_quantile.py
+# Rolling order statistics with pandas' rolling(window, min_periods).quantile(q) semantics
+# (linear interpolation, NaNs skipped, NaN below min_periods):
+#   RollingQuantile        incremental sorted buffer, O(log w) search per update (live)
+#   rolling_rank           rank of each value within its trailing window (batch)
+#   below_rolling_quantile values < rolling quantile, answered from ranks (batch)
+# The batch functions make one vectorized pass per window element, O(n * w): faster than
+# pandas' skiplist (O(n log w)) for short windows, slower for long ones. Above the
+# *_PASSES_MAX_WINDOW sizes (crossovers measured on 1M values) they call pandas instead.
+import bisect
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+RANK_PASSES_MAX_WINDOW = 768
+QUANTILE_PASSES_MAX_WINDOW = 256
+
+
+def _position(q, nobs):
+    # same arithmetic as pandas' roll_quantile: index + fraction into the sorted window
+    idx_with_fraction = q * (nobs - 1)
+    idx = int(idx_with_fraction)
+    return idx, idx_with_fraction - idx
+
+
+def _interpolate(low, high, frac):
+    return low + (high - low) * frac
+
+
+class RollingQuantile:
+    """
+    rq = RollingQuantile(100, 0.2)
+    for x in stream: level = rq.update(x)
+    Keeps the raw window (for eviction) and a sorted copy of its non-NaN values.
+    """
+
+    __slots__ = ("window", "q", "min_periods", "values", "sorted")
+
+    def __init__(self, window, q, min_periods=None):
+        if not 0.0 <= q <= 1.0:
+            raise ValueError(f"q must be in [0, 1], got {q}")
+        self.window = window
+        self.q = q
+        self.min_periods = window if min_periods is None else min_periods
+        self.values = deque()
+        self.sorted = []
+
+    @property
+    def nobs(self):
+        return len(self.sorted)
+
+    @property
+    def value(self):
+        nobs = len(self.sorted)
+        if nobs == 0 or nobs < self.min_periods:
+            return np.nan
+        idx, frac = _position(self.q, nobs)
+        if frac == 0:
+            return self.sorted[idx]
+        return _interpolate(self.sorted[idx], self.sorted[idx + 1], frac)
+
+    def update(self, x):
+        """Push one value (evicting the oldest once full); returns the current quantile."""
+        x = float(x)
+        self.values.append(x)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old == old:
+                del self.sorted[bisect.bisect_left(self.sorted, old)]
+        if x == x:
+            bisect.insort(self.sorted, x)
+        return self.value
+
+    def update_many(self, values):
+        out = np.empty(len(values), dtype=np.float64)
+        update = self.update
+        for j, x in enumerate(np.asarray(values, dtype=np.float64).tolist()):
+            out[j] = update(x)
+        return out
+
+
+def _padded(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    return np.concatenate([np.full(window - 1, np.nan), values]), values
+
+
+def rolling_rank(values, window):
+    """
+    For every position t: (less, less_equal, nobs) = how many non-NaN values of the window
+    ending at t are < / <= values[t], and how many non-NaN values it holds.
+    `window` vectorized passes over contiguous slices (no per-row Python, no (n, w) copy),
+    or pandas' rolling rank above RANK_PASSES_MAX_WINDOW.
+    """
+    padded, values = _padded(values, window)
+    n = len(values)
+    dtype = np.int16 if window < 2 ** 15 else np.int32
+    valid = np.r_[0, np.cumsum(~np.isnan(padded))]
+    nobs = (valid[window:] - valid[:-window]).astype(np.int32)
+
+    if window > RANK_PASSES_MAX_WINDOW:
+        rolling = pd.Series(values).rolling(window, min_periods=1)
+        # min rank - 1 = values below, max rank = values below or tied (NaN values: 0)
+        less = (rolling.rank(method="min").to_numpy() - 1)
+        less_equal = rolling.rank(method="max").to_numpy()
+        return np.nan_to_num(less).astype(dtype), np.nan_to_num(less_equal).astype(dtype), nobs
+
+    less = np.zeros(n, dtype=dtype)
+    less_equal = np.zeros(n, dtype=dtype)
+    hit = np.empty(n, dtype=bool)
+    for k in range(window):
+        other = padded[k:k + n]
+        np.less(other, values, out=hit)
+        less += hit.view(np.uint8)
+        np.less_equal(other, values, out=hit)
+        less_equal += hit.view(np.uint8)
+    return less, less_equal, nobs
+
+
+def below_rolling_quantile(values, window, q, min_periods=None):
+    """
+    Boolean array equal to `s < s.rolling(window, min_periods).quantile(q)`.
+    Ranks decide almost every row (values clearly below/above the two order statistics
+    around the quantile); the quantile itself is evaluated only for the few values that
+    sit between them. Above QUANTILE_PASSES_MAX_WINDOW: pandas' rolling quantile.
+    """
+    min_periods = window if min_periods is None else min_periods
+    if window > QUANTILE_PASSES_MAX_WINDOW:
+        s = pd.Series(np.asarray(values, dtype=np.float64))
+        return (s < s.rolling(window, min_periods=min_periods).quantile(q)).to_numpy()
+    less, less_equal, nobs = rolling_rank(values, window)
+    padded, values = _padded(values, window)
+
+    ok = (nobs >= max(min_periods, 1)) & ~np.isnan(values)
+    idx_with_fraction = q * (np.maximum(nobs, 1) - 1)
+    idx = idx_with_fraction.astype(np.int64)
+    exact = idx_with_fraction == idx
+
+    # values[t] < s_idx  <=>  at most idx window values are <= values[t]
+    out = ok & (less_equal <= idx)
+
+    # between s_idx and s_idx+1 with a fractional position: compute the quantile
+    ambiguous = np.flatnonzero(ok & ~exact & (less_equal > idx) & (less <= idx + 1))
+    if len(ambiguous):
+        windows = np.sort(padded[ambiguous[:, None] + np.arange(window)], axis=1)  # NaNs last
+        i = idx[ambiguous]
+        low = windows[np.arange(len(ambiguous)), i]
+        high = windows[np.arange(len(ambiguous)), i + 1]
+        level = _interpolate(low, high, idx_with_fraction[ambiguous] - i)
+        out[ambiguous] = values[ambiguous] < level
+    return out
+
+
+def rolling_bucket(values, window, n_bins=5, min_periods=None):
+    """
+    Bucket 0..n_bins-1 of each value by its rank within the trailing window
+    (a causal quintile when n_bins=5); NaN where the window has too few values.
+    """
+    min_periods = window if min_periods is None else min_periods
+    less, less_equal, nobs = rolling_rank(values, window)
+    values = np.asarray(values, dtype=np.float64)
+    # mid-rank of ties, as a fraction of the other values in the window
+    rank = (less + (less_equal - less - 1) / 2.0) / np.maximum(nobs - 1, 1)
+    bucket = np.minimum(np.floor(rank * n_bins), n_bins - 1)
+    bucket[(nobs < max(min_periods, 2)) | np.isnan(values)] = np.nan
+    return bucket
@@ -0,0 +1,18 @@
+import numpy as np
+
+from utils.config import ATR_THRESHOLD, CONF_THRESHOLD, REGIME_FILTER
+
+
+def skip_reason(sig, conf, price, atr_value, regime=None,
+                conf_threshold=CONF_THRESHOLD, atr_threshold=ATR_THRESHOLD, regime_filter=REGIME_FILTER):
+    """
+    Live entry filters (same order as the backtest). Returns None when the signal may trade,
+    otherwise the counter suffix of the filter that stopped it ("atr", "regime", "signal").
+    """
+    if atr_value / price < atr_threshold:
+        return "atr"
+    if regime in regime_filter:
+        return "regime"
+    if conf < conf_threshold or sig == 0 or np.isnan(atr_value) or atr_value <= 0:
+        return "signal"
+    return None
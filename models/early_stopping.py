@@ -0,0 +1,44 @@
+# models/early_stopping.py
+# Time-ordered validation split for early stopping of the boosting trainers: the most
+# recent slice of the training rows validates, the `gap` rows before it are dropped
+# (their labels look into the validation slice: gap = the label horizon), the rest fits.
+import numpy as np
+
+from utils.config import EARLY_STOPPING_ROUNDS, EARLY_STOPPING_VALID
+
+MIN_FIT_ROWS = 200
+
+
+def holdout_split(n, valid_ratio=EARLY_STOPPING_VALID, gap=0):
+    """
+    (fit, valid) slices of n time-ordered rows, or None when n is too short to hold
+    anything out (then train on everything, without early stopping).
+    """
+    n_valid = int(n * valid_ratio)
+    fit_end = n - n_valid - gap
+    if n_valid <= 0 or fit_end < MIN_FIT_ROWS:
+        return None
+    return slice(0, fit_end), slice(n - n_valid, n)
+
+
+def take(a, rows):
+    """Rows of a DataFrame / Series / array (positional)."""
+    return a.iloc[rows] if hasattr(a, "iloc") else a[rows]
+
+
+def early_stopping_rounds(params):
+    """The trainer's rounds: params["early_stopping_rounds"] if given (None/0 = off), else config."""
+    rounds = params.get("early_stopping_rounds", EARLY_STOPPING_ROUNDS)
+    return int(rounds) if rounds else None
+
+
+def split_rows(X, y, sample_weight, valid_ratio=EARLY_STOPPING_VALID, gap=0):
+    """((X, y, w) fit, (X, y, w) valid), or None (see holdout_split)."""
+    split = holdout_split(len(y), valid_ratio, gap)
+    if split is None:
+        return None
+    fit, valid = split
+    # every class must be seen in the fit rows (num_class is fixed at 3)
+    if len(np.unique(take(y, fit))) < len(np.unique(y)):
+        return None
+    return tuple((take(X, s), take(y, s), take(sample_weight, s)) for s in split)
@@ -3,7 +3,9 @@ import lightgbm as lgb
 import pandas as pd
 import numpy as np
 from sklearn.calibration import CalibratedClassifierCV
-from utils.target_encoding import encode_target
+from models.early_stopping import early_stopping_rounds, split_rows
+from utils.logger import observe, span, timed
+from utils.target_encoding import features_and_target
 
 
 def _compute_sample_weights(y: pd.Series) -> np.ndarray:
@@ -12,9 +14,10 @@ def _compute_sample_weights(y: pd.Series) -> np.ndarray:
     return np.array([inv_freq[v] for v in y])
 
 
-def train_lgbm(train_df: pd.DataFrame, params: dict | None = None):
-    X = train_df.drop(columns=["target"])
-    y = encode_target(train_df["target"])
+@timed("train_lgbm")
+def train_lgbm(train_df: pd.DataFrame, params: dict | None = None, horizon: int = 20):
+    # horizon: label horizon (build_features future_n), rows dropped before the early-stopping hold-out
+    X, y = features_and_target(train_df)
 
     default_params = {
         "objective": "multiclass",
@@ -29,12 +32,33 @@ def train_lgbm(train_df: pd.DataFrame, params: dict | None = None):
     }
 
     model_params = {**default_params, **(params or {})}
+    rounds = early_stopping_rounds(model_params)
+    model_params.pop("early_stopping_rounds", None)
     sample_weight = _compute_sample_weights(y)
 
-    base_model = lgb.LGBMClassifier(**model_params)
-    base_model.fit(X, y, sample_weight=sample_weight)
+    best_iteration = None
+    split = split_rows(X, y, sample_weight, gap=horizon) if rounds else None
+    if split is not None:
+        # stop on the log-loss of the most recent rows, then train only the best trees
+        (X_fit, y_fit, w_fit), (X_val, y_val, w_val) = split
+        base_model = lgb.LGBMClassifier(**model_params)
+        with span("train_lgbm.early_stopping", rows=len(X_fit)):
+            base_model.fit(X_fit, y_fit, sample_weight=w_fit, eval_set=[(X_val, y_val)],
+                           eval_sample_weight=[w_val], eval_metric="multi_logloss",
+                           callbacks=[lgb.early_stopping(rounds, verbose=False)])
+        # lightgbm counts iterations from 1
+        best_iteration = int(base_model.best_iteration_ or model_params["n_estimators"]) - 1
+        observe("train_lgbm.best_iteration", best_iteration)
+        model_params["n_estimators"] = best_iteration + 1
+        base_model = lgb.LGBMClassifier(**model_params)
+    else:
+        base_model = lgb.LGBMClassifier(**model_params)
+        with span("train_lgbm.fit", rows=len(X)):
+            base_model.fit(X, y, sample_weight=sample_weight)
 
-    calibrated = CalibratedClassifierCV(base_model, method="isotonic", cv=3)
-    calibrated.fit(X, y, sample_weight=sample_weight)
+    with span("train_lgbm.calibrate", rows=len(X)):
+        calibrated = CalibratedClassifierCV(base_model, method="isotonic", cv=3)
+        calibrated.fit(X, y, sample_weight=sample_weight)
 
+    calibrated.best_iteration_ = best_iteration
     return calibrated
@@ -3,7 +3,8 @@ from sklearn.calibration import CalibratedClassifierCV
 from sklearn.ensemble import RandomForestClassifier
 import pandas as pd
 import numpy as np
-from utils.target_encoding import encode_target
+from utils.logger import span, timed
+from utils.target_encoding import features_and_target
 
 
 def _compute_sample_weights(y: pd.Series) -> np.ndarray:
@@ -12,9 +13,9 @@ def _compute_sample_weights(y: pd.Series) -> np.ndarray:
     return np.array([inv_freq[v] for v in y])
 
 
+@timed("train_rf")
 def train_rf(train_df: pd.DataFrame, params: dict | None = None):
-    X = train_df.drop(columns=["target"])
-    y = encode_target(train_df["target"])
+    X, y = features_and_target(train_df)
 
     default_params = {
         "n_estimators": 300,
@@ -30,9 +31,11 @@ def train_rf(train_df: pd.DataFrame, params: dict | None = None):
     sample_weight = _compute_sample_weights(y)
 
     base_model = RandomForestClassifier(**model_params)
-    base_model.fit(X, y, sample_weight=sample_weight)
+    with span("train_rf.fit", rows=len(X)):
+        base_model.fit(X, y, sample_weight=sample_weight)
 
-    calibrated = CalibratedClassifierCV(base_model, method="isotonic", cv=3)
-    calibrated.fit(X, y, sample_weight=sample_weight)
+    with span("train_rf.calibrate", rows=len(X)):
+        calibrated = CalibratedClassifierCV(base_model, method="isotonic", cv=3)
+        calibrated.fit(X, y, sample_weight=sample_weight)
 
     return calibrated
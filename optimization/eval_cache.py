@@ -0,0 +1,103 @@
+# optimization/eval_cache.py
+# Persistent memo of trial evaluations. TPE re-suggests identical integer indicator windows
+# and the study grows across sessions, so the same configuration is often evaluated again;
+# the key is a canonical hash of (data fingerprint, indicator params, model params,
+# evaluation settings) and a hit returns the stored walk-forward result instantly.
+import json
+import sqlite3
+import threading
+import time
+
+from utils.config import EVAL_CACHE_PATH
+from utils.fingerprint import canonical, canonical_hash
+from utils.logger import incr
+
+CACHE_VERSION = 1  # bump when the evaluation itself changes (backtest, scoring, trainers)
+
+
+class EvalCache:
+    """
+    cache = EvalCache("eval_cache.db")
+    key = cache.key(fingerprint, indicators, model_params, settings)
+    result = cache.get(key)
+    if result is None:
+        result = evaluate(...)
+        cache.put(key, result, seconds)
+    """
+
+    def __init__(self, path=EVAL_CACHE_PATH):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS evals (key TEXT PRIMARY KEY, result TEXT, "
+                         "seconds REAL, created REAL)")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def key(*parts):
+        return canonical_hash(CACHE_VERSION, *parts)
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT result, seconds FROM evals WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                incr("eval_cache.miss")
+                return None
+            self.hits += 1
+            self.saved_seconds += row[1] or 0.0
+        incr("eval_cache.hit")
+        return json.loads(row[0])
+
+    def put(self, key, result, seconds=0.0):
+        """Store result (JSON-able up to numpy scalars); returns it as get() will return it."""
+        result = canonical(result, digits=None)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO evals VALUES (?, ?, ?, ?)",
+                             (key, json.dumps(result), float(seconds), time.time()))
+            self._db.commit()
+        return result
+
+    def cached(self, key, fn):
+        """fn() through the cache; hit or miss, the result has JSON types (lists, str keys)."""
+        result = self.get(key)
+        if result is None:
+            started = time.perf_counter()
+            result = fn()
+            result = self.put(key, result, time.perf_counter() - started)
+        return result
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM evals").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0, "saved_seconds": self.saved_seconds}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def merge_stats(stats):
+    """Sum of the stats() of several caches (one per optimization worker)."""
+    total = {"entries": max((s["entries"] for s in stats), default=0)}
+    for k in ("hits", "misses", "saved_seconds"):
+        total[k] = sum(s[k] for s in stats)
+    lookups = total["hits"] + total["misses"]
+    total["hit_rate"] = total["hits"] / lookups if lookups else 0.0
+    return total
+
+
+def print_cache_report(stats):
+    """stats: EvalCache.stats() (or merge_stats of several)."""
+    print("\n===== Evaluation cache =====")
+    print(f"Lookups: {stats['hits'] + stats['misses']}  hits: {stats['hits']}  misses: {stats['misses']}  "
+          f"hit rate: {stats['hit_rate']:.0%}")
+    print(f"Entries: {stats['entries']}  evaluation time saved: {stats['saved_seconds']:.0f}s")
+    return stats
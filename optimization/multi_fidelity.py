@@ -0,0 +1,169 @@
+# optimization/multi_fidelity.py
+# Multi-fidelity trials: a trial is first scored at cheap fidelities (recent part of the
+# history, a few walk-forward folds, fewer boosting rounds) and reports each score to
+# Optuna; a successive-halving / Hyperband pruner stops the trials that rank low at a rung,
+# so only the promising ones pay for the full walk-forward + unseen evaluation.
+import time
+
+import numpy as np
+import optuna
+import pandas as pd
+
+from utils.config import (
+    MF_PRUNER, MF_REDUCTION_FACTOR, MF_SCREEN_HISTORY, MF_SCREEN_FOLDS, MF_SCREEN_ESTIMATORS, MF_AUDIT_EVERY,
+)
+from utils.logger import incr, observe
+
+MIN_ESTIMATORS = 20
+
+
+class Fidelity:
+    """
+    history: fraction of the feature rows kept (the most recent ones).
+    max_folds: walk-forward folds evaluated (evenly spaced), None = all.
+    estimators: factor on the model's n_estimators.
+    The full fidelity (1.0, None, 1.0) also scores the unseen segment.
+    """
+
+    __slots__ = ("history", "max_folds", "estimators")
+
+    def __init__(self, history=1.0, max_folds=None, estimators=1.0):
+        self.history = history
+        self.max_folds = max_folds
+        self.estimators = estimators
+
+    @property
+    def full(self):
+        return self.history >= 1.0 and self.max_folds is None and self.estimators >= 1.0
+
+    def data(self, df):
+        if self.history >= 1.0:
+            return df
+        return df.iloc[len(df) - int(len(df) * self.history):]
+
+    def model_params(self, params):
+        if self.estimators >= 1.0 or "n_estimators" not in params:
+            return params
+        return {**params, "n_estimators": max(int(params["n_estimators"] * self.estimators), MIN_ESTIMATORS)}
+
+    def as_dict(self):
+        return {"history": self.history, "max_folds": self.max_folds, "estimators": self.estimators}
+
+    def __repr__(self):
+        return f"Fidelity({self.history}, {self.max_folds}, {self.estimators})"
+
+
+DEFAULT_RUNGS = (
+    Fidelity(MF_SCREEN_HISTORY, MF_SCREEN_FOLDS, MF_SCREEN_ESTIMATORS),
+    Fidelity(),
+)
+
+
+def rung_step(rung, reduction_factor=MF_REDUCTION_FACTOR):
+    """Resource (Optuna step) of rung k: 1, r, r^2, ... as successive halving expects."""
+    return reduction_factor ** rung
+
+
+def make_pruner(kind=MF_PRUNER, n_rungs=len(DEFAULT_RUNGS), reduction_factor=MF_REDUCTION_FACTOR):
+    """'sh': successive halving (keep the top 1/reduction_factor per rung); 'hyperband'."""
+    if kind == "sh":
+        return optuna.pruners.SuccessiveHalvingPruner(min_resource=1, reduction_factor=reduction_factor)
+    if kind == "hyperband":
+        return optuna.pruners.HyperbandPruner(min_resource=1, max_resource=rung_step(n_rungs - 1, reduction_factor),
+                                              reduction_factor=reduction_factor)
+    raise ValueError(f"Unknown pruner: {kind}")
+
+
+def run_rungs(trial, evaluate, rungs=DEFAULT_RUNGS, reduction_factor=MF_REDUCTION_FACTOR,
+              audit_every=MF_AUDIT_EVERY):
+    """
+    evaluate(fidelity) -> score, for each rung from cheapest to full. Every score is
+    reported to the trial; raises optuna.TrialPruned when the pruner stops it.
+    Every audit_every-th trial runs all rungs whatever the pruner says: an unbiased sample
+    for the rank correlation between fidelities (promoted trials are all top-ranked).
+    Scores and seconds per rung are stored as user attrs for fidelity_report().
+    """
+    audit = bool(audit_every) and trial.number % audit_every == 0
+    trial.set_user_attr("fidelity_audit", audit)
+    scores, seconds = {}, {}
+    score = None
+    for k, fidelity in enumerate(rungs):
+        t0 = time.perf_counter()
+        score = evaluate(fidelity)
+        seconds[k] = time.perf_counter() - t0
+        scores[k] = float(score)
+        observe(f"mf.rung{k}_seconds", seconds[k])
+        trial.set_user_attr("fidelity_scores", scores)
+        trial.set_user_attr("fidelity_seconds", seconds)
+
+        if k == len(rungs) - 1:
+            break
+        trial.report(score, rung_step(k, reduction_factor))
+        if not audit and trial.should_prune():
+            incr(f"mf.pruned_rung{k}")
+            raise optuna.TrialPruned()
+    return score
+
+
+# ---------------------------------------------------------
+# Report
+# ---------------------------------------------------------
+def _rung_frame(study):
+    rows = []
+    for t in study.trials:
+        scores = t.user_attrs.get("fidelity_scores")
+        if not scores:
+            continue
+        seconds = t.user_attrs.get("fidelity_seconds", {})
+        # JSON storage turns the int keys into strings
+        rows.append({"trial": t.number, "state": t.state.name, "audit": t.user_attrs.get("fidelity_audit", False),
+                     **{f"score_{int(k)}": v for k, v in scores.items()},
+                     **{f"seconds_{int(k)}": v for k, v in seconds.items()}})
+    return pd.DataFrame(rows)
+
+
+def fidelity_report(study, n_rungs=len(DEFAULT_RUNGS)):
+    """
+    Wall time spent vs the estimate for running every trial at full fidelity, and the
+    Spearman rank correlation of each cheap rung with the full score over the trials that
+    reached the full rung (audited + promoted).
+    """
+    df = _rung_frame(study)
+    if df.empty:
+        return {}
+    full = n_rungs - 1
+    spent = df.filter(like="seconds_").sum().sum()
+    full_col = f"seconds_{full}"
+    finished = df[df[full_col].notna()] if full_col in df else df.iloc[:0]
+    report = {"trials": len(df), "promoted": int((~finished["audit"]).sum()),
+              "audited": int(df["audit"].sum()), "spent_seconds": float(spent)}
+    if len(finished):
+        # a full-only trial costs what the full rung cost the promoted trials
+        estimate = finished[full_col].mean() * len(df)
+        report["full_only_seconds"] = float(estimate)
+        report["saved_seconds"] = float(estimate - spent)
+        report["saved_ratio"] = float(1.0 - spent / estimate) if estimate else 0.0
+    for k in range(full):
+        pair = finished[[f"score_{k}", f"score_{full}"]].dropna() if len(finished) else None
+        if pair is not None and len(pair) >= 3:
+            report[f"spearman_rung{k}"] = float(pair.iloc[:, 0].corr(pair.iloc[:, 1], method="spearman"))
+    return report
+
+
+def print_fidelity_report(study, n_rungs=len(DEFAULT_RUNGS)):
+    report = fidelity_report(study, n_rungs)
+    if not report:
+        return report
+    print("\n===== Multi-fidelity =====")
+    print(f"Trials: {report['trials']}  promoted to full: {report['promoted']}  audited: {report['audited']}")
+    print(f"Wall time: {report['spent_seconds']:.0f}s", end="")
+    if "full_only_seconds" in report:
+        print(f"  (full-only estimate {report['full_only_seconds']:.0f}s, "
+              f"saved {report['saved_seconds']:.0f}s = {report['saved_ratio']:.0%})")
+    else:
+        print()
+    for k in range(n_rungs - 1):
+        rho = report.get(f"spearman_rung{k}")
+        if rho is not None and not np.isnan(rho):
+            print(f"Rank correlation rung {k} vs full (Spearman): {rho:.3f}")
+    return report
@@ -1,9 +1,19 @@
 # optimization/objective.py
+from functools import partial
+
 from features.feature_engineering import build_features
+from features.feature_graph import FeatureCache
 from evaluation.backtest import walk_forward_backtest
 from models.lgbm_model import train_lgbm
 from models.rf_model import train_rf
 from models.xgb_model import train_xgb
+from optimization.multi_fidelity import Fidelity, run_rungs
+from utils.config import (
+    COMPACT_FEATURES, FEATURE_CACHE_ITEMS, HTF_TIMEFRAMES, REGIME_FEATURE, WF_N_JOBS, MULTI_FIDELITY,
+    EARLY_STOPPING_ROUNDS, EARLY_STOPPING_VALID,
+)
+from utils.fingerprint import data_fingerprint
+from utils.logger import profile, set_context, span
 from optimization.search_space import (
     indicator_search_space,
     xgb_search_space,
@@ -11,10 +21,40 @@ from optimization.search_space import (
     lgbm_search_space,
 )
 
-
-def create_objective(df_raw):
-
-    def objective(trial):
+FUTURE_N = 20  # label horizon (bars): build_features future_n, purge length between train and test
+
+WF_SETTINGS = {
+    "train_ratio": 0.7,
+    "step": 200,
+    "conf_threshold": 0.0,
+    "atr_norm_threshold": 0.0,
+    "unseen_ratio": 0.1,
+    "horizon": FUTURE_N,
+}
+
+
+def evaluation_settings(model_name):
+    """Everything besides the trial params that decides a trial's result (eval cache key)."""
+    return {
+        "model_name": model_name,
+        "walk_forward": WF_SETTINGS,
+        "features": {"future_n": FUTURE_N, "compact": COMPACT_FEATURES, "htf": HTF_TIMEFRAMES,
+                     "regime": REGIME_FEATURE},
+        "early_stopping": [EARLY_STOPPING_ROUNDS, EARLY_STOPPING_VALID],
+    }
+
+
+def create_objective(df_raw, eval_cache=None, fold_store=None):
+    """
+    eval_cache: an optimization.eval_cache.EvalCache; repeated configurations skip the evaluation.
+    fold_store: an optimization.study_storage.FoldStatsStore; per-fold stats go to its side
+    files instead of the "fold_stats" trial attr.
+    """
+    # indicator nodes (EMAs, ATR, Bollinger, ...) are shared by every trial that samples the same window
+    feature_cache = FeatureCache(max_items=FEATURE_CACHE_ITEMS)
+    fingerprint = data_fingerprint(df_raw) if eval_cache is not None else None
+
+    def _objective(trial):
         # Force XGBoost only
         model_name = "xgb"
 
@@ -24,26 +64,56 @@ def create_objective(df_raw):
         # XGBoost hyperparameters (clean keys!)
         model_params = xgb_search_space(trial)
 
-        # Build features
-        df_feat = build_features(
-            df_raw,
-            params=indicator_params,
-            future_n=20,
-        )
-
-        # Define model function
-        model_fn = lambda train_df: train_xgb(train_df, model_params)
-
-        # Walk-forward + unseen validation
-        wf_pf, unseen_pf, fold_stats = walk_forward_backtest(
-            model_fn=model_fn,
-            df=df_feat,
-            train_ratio=0.7,
-            step=200,
-            conf_threshold=0.0,
-            atr_norm_threshold=0.0,
-            unseen_ratio=0.1,
-        )
+        # Build features (on the first evaluation that is not cached)
+        features = {}
+
+        def df_feat():
+            if "df" not in features:
+                features["df"] = build_features(
+                    df_raw,
+                    params=indicator_params,
+                    future_n=FUTURE_N,
+                    compact=COMPACT_FEATURES,
+                    cache=feature_cache,
+                    htf=HTF_TIMEFRAMES,
+                    regime=REGIME_FEATURE,
+                )
+            return features["df"]
+
+        def run_backtest(fidelity):
+            # Walk-forward + unseen validation (the full fidelity) or a cheaper screening run
+            return walk_forward_backtest(
+                # picklable model function, for the fold process pool
+                model_fn=partial(train_xgb, params=fidelity.model_params(model_params), horizon=FUTURE_N),
+                df=fidelity.data(df_feat()),
+                n_jobs=WF_N_JOBS,
+                max_folds=fidelity.max_folds,
+                score_unseen=fidelity.full,
+                **WF_SETTINGS,
+            )
+
+        def evaluate(fidelity):
+            if eval_cache is None:
+                return run_backtest(fidelity)
+            key = eval_cache.key(fingerprint, indicator_params, model_params,
+                                 evaluation_settings(model_name), fidelity.as_dict())
+            return eval_cache.cached(key, lambda: run_backtest(fidelity))
+
+        if MULTI_FIDELITY:
+            full = {}
+
+            def rung_score(fidelity):
+                wf_pf, unseen_pf, fold_stats = evaluate(fidelity)
+                if not fidelity.full:
+                    return wf_pf
+                full["result"] = wf_pf, unseen_pf, fold_stats
+                return 0.7 * wf_pf + 0.3 * unseen_pf
+
+            # screening rungs first; raises TrialPruned for trials that rank low
+            run_rungs(trial, rung_score)
+            wf_pf, unseen_pf, fold_stats = full["result"]
+        else:
+            wf_pf, unseen_pf, fold_stats = evaluate(Fidelity())
 
         # Combined score
         score = 0.7 * wf_pf + 0.3 * unseen_pf
@@ -54,15 +124,23 @@ def create_objective(df_raw):
             clean_stats.append({
                 "pred_dist": {int(k): int(v) for k, v in fs["pred_dist"].items()},
                 "actual_dist": {int(k): int(v) for k, v in fs["actual_dist"].items()},
-                "mean_conf": float(fs["mean_conf"]),
-                "max_conf": float(fs["max_conf"]),
-                "min_conf": float(fs["min_conf"]),
+                "mean_conf": None if fs["mean_conf"] is None else float(fs["mean_conf"]),
+                "max_conf": None if fs["max_conf"] is None else float(fs["max_conf"]),
+                "min_conf": None if fs["min_conf"] is None else float(fs["min_conf"]),
                 "correct_1": int(fs["correct_1"]),
                 "correct_0": int(fs["correct_0"]),
                 "correct_-1": int(fs["correct_-1"]),
                 "total_1": int(fs["total_1"]),
                 "total_0": int(fs["total_0"]),
                 "total_-1": int(fs["total_-1"]),
+                "f1_1": float(fs["f1_1"]),
+                "f1_-1": float(fs["f1_-1"]),
+                "rolling_f1_min": None if fs["rolling_f1_min"] is None else float(fs["rolling_f1_min"]),
+                "fold_seconds": float(fs["fold_seconds"]),
+                "train_rows": int(fs["train_rows"]),
+                "test_rows": int(fs["test_rows"]),
+                "peak_mb": fs["peak_mb"],
+                "best_iteration": fs["best_iteration"],
             })
 
         # Store clean attributes
@@ -71,10 +149,18 @@ def create_objective(df_raw):
         trial.set_user_attr("model_params", model_params)   # <-- IMPORTANT
         trial.set_user_attr("wf_pf", wf_pf)
         trial.set_user_attr("unseen_pf", unseen_pf)
-        trial.set_user_attr("fold_stats", clean_stats)
+        if fold_store is not None:
+            trial.set_user_attr("fold_stats_file", fold_store.write(trial.number, clean_stats).name)
+        else:
+            trial.set_user_attr("fold_stats", clean_stats)
 
         return score
 
+    def objective(trial):
+        set_context(trial=trial.number)
+        with span("trial"), profile(f"trial_{trial.number:05d}"):
+            return _objective(trial)
+
     return objective
 
 
@@ -1,27 +1,68 @@
 # optimization/run_optimization.py
+from concurrent.futures import ProcessPoolExecutor
+
 import optuna
 
 from data_loader.mt5_loader import load_data
+from optimization.eval_cache import EvalCache, merge_stats, print_cache_report
+from optimization.multi_fidelity import make_pruner, print_fidelity_report
 from optimization.objective import create_objective
-from utils.config import SYMBOL, DAYS, START_DATE, END_DATE, NUMBER_TRIALS, TIMEFRAME
+from optimization.study_storage import FoldStatsStore, export_study, make_storage
+from utils.config import (
+    SYMBOL, DAYS, START_DATE, END_DATE, NUMBER_TRIALS, TIMEFRAME, MULTI_FIDELITY, EVAL_CACHE,
+    OPTUNA_STORAGE, OPTUNA_WORKERS, FOLD_STATS_SIDE_FILES,
+)
+from utils.logger import clear_context, flush_summary, print_summary
 from utils.params_io import save_best_params
 
 
-def run_optimization(symbol, timeframe, days, start_date, end_date, n_trials=50):
+def _optimize(df_raw, study_name, storage, n_trials):
+    """One worker: its own objective (feature cache, eval cache) on the shared study."""
+    eval_cache = EvalCache() if EVAL_CACHE else None
+    fold_store = FoldStatsStore(study_name=study_name) if FOLD_STATS_SIDE_FILES else None
+    study = optuna.load_study(
+        study_name=study_name,
+        storage=make_storage(storage),
+        pruner=make_pruner() if MULTI_FIDELITY else None,
+    )
+    try:
+        study.optimize(create_objective(df_raw, eval_cache=eval_cache, fold_store=fold_store),
+                       n_trials=n_trials)
+        return eval_cache.stats() if eval_cache is not None else None
+    finally:
+        clear_context()
+        if eval_cache is not None:
+            eval_cache.close()
+
+
+def run_optimization(symbol, timeframe, days, start_date, end_date, n_trials=50,
+                     storage=OPTUNA_STORAGE, n_workers=OPTUNA_WORKERS):
+    """
+    storage: "sqlite:///optuna.db" or "journal:<path>" (see optimization/study_storage.py).
+    n_workers > 1: worker processes share the study through the storage; more workers,
+    also on other machines, can join by running this with the same journal file.
+    """
     print("Loading MT5 data...")
     df_raw = load_data(symbol, timeframe, days, start_date, end_date)
 
-    print("Preparing objective...")
-    objective = create_objective(df_raw)
-
     print("Starting optimization...")
+    study_name = f"{symbol}_{timeframe}_opt"
     study = optuna.create_study(
         direction="maximize",
-        study_name=f"{symbol}_{timeframe}_opt",
-        storage="sqlite:///optuna.db",
+        study_name=study_name,
+        storage=make_storage(storage),
         load_if_exists=True,
+        pruner=make_pruner() if MULTI_FIDELITY else None,
     )
-    study.optimize(objective, n_trials=n_trials)
+    n_workers = max(1, min(n_workers, n_trials))
+    if n_workers == 1:
+        cache_stats = [_optimize(df_raw, study_name, storage, n_trials)]
+    else:
+        # trials split across the workers, the first ones take the remainder
+        shares = [n_trials // n_workers + (i < n_trials % n_workers) for i in range(n_workers)]
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            cache_stats = list(pool.map(_optimize, [df_raw] * n_workers, [study_name] * n_workers,
+                                        [storage] * n_workers, shares))
 
     print("\n===== Optimization Complete =====")
     print(f"Best Score (combined PF): {study.best_value:.4f}")
@@ -36,6 +77,16 @@ def run_optimization(symbol, timeframe, days, start_date, end_date, n_trials=50)
 
     save_best_params(study)
 
+    if MULTI_FIDELITY:
+        print_fidelity_report(study)
+    if EVAL_CACHE:
+        print_cache_report(merge_stats(cache_stats))
+    if FOLD_STATS_SIDE_FILES:
+        print("Study exported to:", ", ".join(map(str, export_study(study))))
+
+    print_summary()
+    flush_summary()
+
     return study
 
 
@@ -0,0 +1,138 @@
+# optimization/study_storage.py
+# Optuna storage and per-fold diagnostics for optimization runs.
+#   make_storage     "sqlite:///optuna.db" (any RDB URL) or "journal:<path>": Optuna's
+#                    append-only journal file, no database lock between workers, and a
+#                    file lock that also works on a shared (NFS/SMB) filesystem
+#   FoldStatsStore   per-fold stats of each trial in a small columnar side file
+#                    (Parquet with pyarrow, compressed .npz without) instead of a JSON attr
+#   export_study     trials + fold stats of a whole study to Parquet (CSV without pyarrow)
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import optuna
+import pandas as pd
+
+from utils.config import OPTUNA_STORAGE, STUDY_DIR
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # optional; side files fall back to .npz, exports to CSV
+    pyarrow = None
+
+JOURNAL_PREFIX = "journal:"
+
+
+def make_storage(url=OPTUNA_STORAGE):
+    """Storage for optuna.create_study / load_study from a config string."""
+    if not url.startswith(JOURNAL_PREFIX):
+        return url
+    from optuna.storages.journal import JournalFileBackend, JournalFileOpenLock
+
+    path = Path(url[len(JOURNAL_PREFIX):])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # open(O_EXCL)-based lock: safe for several machines on one shared filesystem
+    backend = JournalFileBackend(str(path), lock_obj=JournalFileOpenLock(str(path)))
+    return optuna.storages.JournalStorage(backend)
+
+
+# ---------------------------------------------------------
+# Per-fold diagnostics
+# ---------------------------------------------------------
+DIST_CLASSES = (-1, 0, 1)
+
+
+def fold_stats_frame(fold_stats):
+    """One row per fold: scalar stats as columns, pred/actual distributions as pred_-1 ... actual_1."""
+    rows = []
+    for fold, fs in enumerate(fold_stats):
+        row = {"fold": fold}
+        for key, value in fs.items():
+            if isinstance(value, dict):
+                prefix = key.replace("_dist", "")
+                counts = {int(k): int(v) for k, v in value.items()}
+                row.update({f"{prefix}_{c}": counts.get(c, 0) for c in DIST_CLASSES})
+            else:
+                row[key] = np.nan if value is None else value
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+class FoldStatsStore:
+    """
+    store = FoldStatsStore("studies", study_name)
+    store.write(trial.number, fold_stats)       # one file per trial: workers never share a file
+    df = store.load()                           # every trial, one row per fold
+    """
+
+    def __init__(self, root=STUDY_DIR, study_name="study"):
+        self.dir = Path(root) / study_name / "folds"
+
+    def _path(self, trial_number, suffix):
+        return self.dir / f"trial_{trial_number:06d}{suffix}"
+
+    def write(self, trial_number, fold_stats):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        df = fold_stats_frame(fold_stats)
+        suffix = ".parquet" if pyarrow is not None else ".npz"
+        path = self._path(trial_number, suffix)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        if pyarrow is not None:
+            df.to_parquet(tmp, index=False)
+        else:
+            with open(tmp, "wb") as f:
+                np.savez_compressed(f, **{c: df[c].to_numpy() for c in df.columns})
+        os.replace(tmp, path)   # readers never see a partial file
+        return path
+
+    def read(self, path):
+        path = Path(path)
+        if path.suffix == ".parquet":
+            return pd.read_parquet(path)
+        with np.load(path, allow_pickle=False) as data:
+            return pd.DataFrame({c: data[c] for c in data.files})
+
+    def load(self):
+        frames = []
+        for path in sorted(self.dir.glob("trial_*")):
+            df = self.read(path)
+            df.insert(0, "trial", int(path.stem.split("_")[1]))
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def export_study(study, root=STUDY_DIR):
+    """
+    <root>/<study>/trials.parquet (params, values, attrs) and folds.parquet (per-fold stats,
+    from the side files or the fold_stats attrs of older trials). Returns the paths.
+    """
+    out = Path(root) / study.study_name
+    out.mkdir(parents=True, exist_ok=True)
+    trials = study.trials_dataframe()
+    attr = "user_attrs_fold_stats"
+
+    folds = FoldStatsStore(root, study.study_name).load()
+    if attr in trials.columns:
+        stored = set(folds["trial"]) if len(folds) else set()
+        legacy = [fold_stats_frame(fs).assign(trial=n) for n, fs in zip(trials["number"], trials[attr])
+                  if isinstance(fs, list) and n not in stored]
+        folds = pd.concat([folds, *legacy], ignore_index=True) if legacy else folds
+        trials = trials.drop(columns=[attr])
+    # nested attrs (indicator/model param dicts) as JSON text: one scalar column each
+    for c in trials.columns:
+        if trials[c].map(lambda v: isinstance(v, (dict, list))).any():
+            trials[c] = trials[c].map(lambda v: json.dumps(v) if isinstance(v, (dict, list)) else v)
+
+    paths = []
+    for name, df in (("trials", trials), ("folds", folds)):
+        if pyarrow is not None:
+            path = out / f"{name}.parquet"
+            df.to_parquet(path, index=False)
+        else:
+            path = out / f"{name}.csv"
+            df.to_csv(path, index=False)
+        paths.append(path)
+    if pyarrow is None:
+        print("pyarrow is not installed: study exported as CSV.")
+    return paths
@@ -1,42 +1,57 @@
 # run.py
-import importlib
-
-import os
-import pickle
+# Heavy modules (optuna, xgboost, plotly, MetaTrader5, ...) are imported inside the
+# action that needs them, so the menu and the CLI start instantly.
+import argparse
+import json
 from datetime import datetime, timedelta
 from pathlib import Path
 
-import joblib
-
-from analytics.dashboard import generate_dashboard
-from analytics.utils import build_equity_curve
-from backtesting.real_backtest import backtest_live_real
-from data_loader.account_hystory import load_raw_account_history, normalize_deals_to_trades, get_starting_balance
-from optimization.optimize_indicators import run_optimization
-from train import train
-from backtesting import real_backtest
 from utils import config
-from utils.config import *
-from utils.edit_config import edit_config
-from trade import live_trading_loop
+
+MODEL_PATH = Path("models/saved/active_model.pkl")
+MODEL_META_PATH = MODEL_PATH.with_suffix(".json")
+
+_model_meta_cache = {}
+
+
+def _read_model_meta():
+    """
+    Active model metadata, without unpickling the model when possible.
+    Order: in-memory cache -> sidecar JSON written by train.save_active_model -> unpickle once.
+    """
+    stat = MODEL_PATH.stat()
+    key = (stat.st_mtime, stat.st_size)
+    if key in _model_meta_cache:
+        return _model_meta_cache[key]
+
+    meta = None
+    if MODEL_META_PATH.exists() and MODEL_META_PATH.stat().st_mtime >= stat.st_mtime:
+        with open(MODEL_META_PATH, "r") as f:
+            meta = json.load(f)
+
+    if meta is None:
+        import joblib
+
+        model = joblib.load(MODEL_PATH)
+        meta = {
+            "model_class": model.__class__.__name__,
+            "saved": datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    _model_meta_cache.clear()
+    _model_meta_cache[key] = meta
+    return meta
 
 
 def show_active_model():
-    model_path = Path("models/saved/active_model.pkl")
-    if not os.path.exists(model_path):
+    if not MODEL_PATH.exists():
         print("Active model: NONE")
         return
 
     try:
-        with open(model_path, "rb") as f:
-            model = joblib.load(model_path)
-
-
-        model_name = model.__class__.__name__
-        modified = model_path.stat().st_mtime
-        timestamp = datetime.fromtimestamp(modified).strftime("%Y-%m-%d %H:%M:%S")
-        print(f"Active model: {model_name} (saved {timestamp})")
-    except:
+        meta = _read_model_meta()
+        print(f"Active model: {meta['model_class']} (saved {meta['saved']})")
+    except Exception:
         print("Active model: (could not read file)")
 
 
@@ -48,13 +63,63 @@ def print_config():
     print()
 
 
-def run_live_trading():
+# ---------------------------------------------------------
+# Actions (config is read at call time so edits apply immediately)
+# ---------------------------------------------------------
+def action_optimize(n_trials=None):
+    from optimization.optimize_indicators import run_optimization
+
+    run_optimization(config.SYMBOL, config.TIMEFRAME, config.DAYS, config.START_DATE,
+                     config.END_DATE, n_trials or config.NUMBER_TRIALS)
+
+
+def action_train():
+    from train import train
+
+    train(config.SYMBOL, config.TIMEFRAME, config.DAYS, config.START_DATE, config.END_DATE)
+
+
+def action_backtest():
+    from backtesting.real_backtest import backtest_live_real
+
+    backtest_live_real(config.SYMBOL, config.TIMEFRAME, config.START_DATE, config.END_DATE,
+                       config.SL_ATR_MULT, config.TP_ATR_MULT, config.CONF_THRESHOLD,
+                       config.ATR_THRESHOLD, config.CONTRACT_SIZE, config.LEVERAGE,
+                       config.MARGIN_LIMIT)
+
+
+def action_trade(confirm=True):
     print("\n=== LIVE TRADING ===")
-    confirm = input("Start live trading? (yes/no): ").strip().lower()
-    if confirm == "yes":
-        live_trading_loop()
-    else:
-        print("Cancelled.")
+    if confirm:
+        answer = input("Start live trading? (yes/no): ").strip().lower()
+        if answer != "yes":
+            print("Cancelled.")
+            return
+
+    from trade import live_trading_loop
+
+    live_trading_loop()
+
+
+def action_dashboard(days=7, output_path="dashboard.html"):
+    from analytics.dashboard import generate_dashboard
+    from analytics.utils import build_equity_curve
+    from data_loader.account_hystory import (load_raw_account_history, normalize_deals_to_trades,
+                                             get_starting_balance)
+
+    end = datetime.now()
+    start = end - timedelta(days=days)
+
+    raw = load_raw_account_history(start, end)
+    trades = normalize_deals_to_trades(raw)
+    equity_curve = build_equity_curve(trades, get_starting_balance(start, end))
+    generate_dashboard(trades, equity_curve, output_path=output_path)
+
+
+def action_edit_config():
+    from utils.edit_config import edit_config
+
+    edit_config()
 
 
 def main():
@@ -76,24 +141,17 @@ def main():
         choice = input("\nSelect an option: ").strip()
 
         if choice == "1":
-            run_optimization(SYMBOL, TIMEFRAME, DAYS, START_DATE, END_DATE, NUMBER_TRIALS)
+            action_optimize()
         elif choice == "2":
-            train(SYMBOL, TIMEFRAME, DAYS, START_DATE, END_DATE)
+            action_train()
         elif choice == "3":
-            backtest_live_real(SYMBOL, TIMEFRAME, START_DATE, END_DATE, SL_ATR_MULT, TP_ATR_MULT,
-                               CONF_THRESHOLD, ATR_THRESHOLD, CONTRACT_SIZE, LEVERAGE, MARGIN_LIMIT)
+            action_backtest()
         elif choice == "4":
-            edit_config()
+            action_edit_config()
         elif choice == "5":
-            run_live_trading()
+            action_trade()
         elif choice == "6":
-            end = datetime.now()
-            start = end - timedelta(days=7)
-
-            raw = load_raw_account_history(start, end)
-            trades = normalize_deals_to_trades(raw)
-            equity_curve = build_equity_curve(trades, get_starting_balance(start, end))
-            generate_dashboard(trades, equity_curve, output_path="dashboard.html")
+            action_dashboard()
         elif choice == "0":
             print("Goodbye!")
             break
@@ -101,5 +159,44 @@ def main():
             print("Invalid choice.")
 
 
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Trading system. Without a command the interactive menu starts.")
+    parser.add_argument("--headless", action="store_true", help="save plots to PLOT_DIR instead of showing them")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("optimize", help="run the indicator/model optimization")
+    p.add_argument("--trials", type=int, default=None, help="number of trials (default: NUMBER_TRIALS)")
+
+    sub.add_parser("train", help="train the active model from best_params.json")
+    sub.add_parser("backtest", help="backtest the active model")
+
+    p = sub.add_parser("trade", help="start live trading")
+    p.add_argument("--yes", action="store_true", help="skip the confirmation prompt")
+
+    p = sub.add_parser("dashboard", help="build the account dashboard")
+    p.add_argument("--days", type=int, default=7)
+    p.add_argument("--output", default="dashboard.html")
+
+    args = parser.parse_args(argv)
+
+    if args.headless:
+        from utils.plotting import set_plot_mode
+
+        set_plot_mode("headless")
+
+    if args.command is None:
+        main()
+    elif args.command == "optimize":
+        action_optimize(args.trials)
+    elif args.command == "train":
+        action_train()
+    elif args.command == "backtest":
+        action_backtest()
+    elif args.command == "trade":
+        action_trade(confirm=not args.yes)
+    elif args.command == "dashboard":
+        action_dashboard(args.days, args.output)
+
+
 if __name__ == "__main__":
-    main()
+    cli()
@@ -1,23 +1,33 @@
 import time
 from pathlib import Path
 import joblib
-import MetaTrader5 as mt5
-import numpy as np
+try:
+    import MetaTrader5 as mt5
+except ImportError:  # Windows-only package; the live path can also run against execution.sim_broker
+    mt5 = None
 
 from data_loader.mt5_loader import load_data, load_live_bars  # your load_data
-from features.feature_engineering import build_features
+from execution.broker_cache import BrokerStateCache, SharedConnection
+from execution.position_manager import PositionManager
+from execution.trade_executor import OrderRequest, TradeExecutor
+from features.feature_graph import IncrementalFeatures, feature_names
+from features.regime.regime_detector import RegimeDetector
+from filters.signal_filter import skip_reason
 from backtesting.backtest_engine import generate_signals, load_model  # your generate_signals
 from utils.config import (
     SYMBOL, TIMEFRAME,
     SL_ATR_MULT, TP_ATR_MULT,
-    CONF_THRESHOLD, ATR_THRESHOLD,
     CONTRACT_SIZE, LEVERAGE, MARGIN_LIMIT,
-    POSITION_SIZE,
+    POSITION_SIZE, HTF_TIMEFRAMES, REGIME_FEATURE, REGIME_FILTER,
+    BROKER_REFRESH_SECONDS, EXEC_LATENCY_BUDGET, LIVE_STREAMS,
 )
+from utils.logger import incr, set_context, span, timed
 from utils.params_io import load_best_params
 
 
 def initialize_mt5():
+    if mt5 is None:
+        raise RuntimeError("MetaTrader5 package is not installed.")
     if not mt5.initialize():
         raise RuntimeError(f"MT5 initialization failed: {mt5.last_error()}")
     print("MT5 initialized.")
@@ -37,7 +47,12 @@ def calc_required_margin(symbol, volume, direction):
     return margin
 
 
-def has_enough_margin(symbol, volume, direction):
+@timed("live.margin_check")
+def has_enough_margin(symbol, volume, direction, broker=None):
+    if broker is not None:
+        # cached account + one-lot margin: no round-trip on the decision path
+        return broker.has_enough_margin(symbol, volume, direction, MARGIN_LIMIT)
+
     acc = mt5.account_info()
     if acc is None:
         raise RuntimeError(f"account_info failed: {mt5.last_error()}")
@@ -48,11 +63,31 @@ def has_enough_margin(symbol, volume, direction):
     return acc.margin + required <= max_allowed
 
 
-def place_order(symbol, direction, price, atr_value):
+@timed("live.place_order")
+def place_order(symbol, direction, price, atr_value, broker=None, executor=None):
+    """
+    With a broker cache the order goes out at a tick fetched right now (ask for buy,
+    bid for sell) instead of the bar close, and SL/TP are placed around that price.
+    With an executor the order is only queued (retries, filling fallback and fill
+    tracking happen on its worker thread); True then means "submitted".
+    """
     volume = POSITION_SIZE
+
+    if executor is not None:
+        executor.submit(OrderRequest(
+            symbol, direction, volume,
+            sl_distance=SL_ATR_MULT * atr_value,
+            tp_distance=TP_ATR_MULT * atr_value,
+            decision_price=price,
+        ))
+        return True
+
     sl = None
     tp = None
 
+    if broker is not None:
+        price = broker.fresh_price(symbol, mt5.ORDER_TYPE_BUY if direction == 1 else mt5.ORDER_TYPE_SELL)
+
     if direction == 1:  # long
         sl = price - SL_ATR_MULT * atr_value
         tp = price + TP_ATR_MULT * atr_value
@@ -85,6 +120,8 @@ def place_order(symbol, direction, price, atr_value):
         print("Order failed:", result.retcode, result.comment)
         return False
     else:
+        if broker is not None:
+            broker.note_order(symbol, volume, order_type)
         print(f"Order placed: {direction}, price={price}, sl={sl}, tp={tp}")
         return True
 
@@ -100,65 +137,135 @@ def ensure_symbol(symbol):
     print(f"Symbol '{symbol}' selected.")
 
 
-def live_trading_loop(poll_seconds=300, lookback_days=5):
-    initialize_mt5()
-    ensure_symbol(SYMBOL)
-    model = load_model()
+def _live_tick(model, stream, last_bar_time, broker=None, executor=None, positions=None):
+    """
+    One poll of the live loop. `stream` is the IncrementalFeatures state of the symbol,
+    `broker` an optional BrokerStateCache for the margin check and order price,
+    `executor` an optional TradeExecutor the orders are queued on,
+    `positions` an optional PositionManager enforcing the position/exposure limits.
+    Returns the bar time that was processed (unchanged when there is no new bar).
+    """
+    if positions is not None:
+        positions.poll()
+    df = load_live_bars(SYMBOL, TIMEFRAME, n_bars=stream.bars_needed, api=mt5)
+    df_feat = stream.update(df).dropna()
+    if df_feat.empty:
+        return last_bar_time
+
+    # work on last completed bar
+    last_row = df_feat.iloc[-1:]
+    bar_time = last_row.index[-1]
+
+    # only act on new bar
+    if last_bar_time is not None and bar_time <= last_bar_time:
+        return last_bar_time
+
+    incr("live.bars")
+
+    regime = int(df_feat["regime"].iloc[-1]) if "regime" in df_feat.columns else None
+    columns = getattr(model, "feature_names_in_", None)
+    if columns is not None:
+        # the stream may carry extra columns (regime filter and its inputs)
+        X = df_feat[list(columns)]
+    else:
+        X = df_feat if REGIME_FEATURE else df_feat.drop(columns=["regime"], errors="ignore")
 
-    best_params = load_best_params()
-    indicator_params = best_params["indicators"]
+    signals, conf = generate_signals(model, X)
+    _act(bar_time, signals[-1], conf[-1], df["close"].iloc[-1], df_feat["atr"].iloc[-1], regime,
+         broker, executor, positions)
+    return bar_time
 
-    last_bar_time = None
 
-    while True:
-        try:
-            df = load_live_bars(SYMBOL, TIMEFRAME, n_bars=500)
-            df_feat = build_features(df, params=indicator_params)
-            if df_feat.empty:
-                time.sleep(poll_seconds)
-                continue
+SKIP_MESSAGES = {
+    "atr": "ATR filter, no trade.",
+    "regime": "Regime {regime} filter, no trade.",
+    "signal": "No valid signal.",
+}
 
-            # work on last completed bar
-            last_row = df_feat.iloc[-1:]
-            bar_time = last_row.index[-1]
 
-            # only act on new bar
-            if last_bar_time is not None and bar_time <= last_bar_time:
-                time.sleep(poll_seconds)
-                continue
+@timed("live.signal_to_order")
+def _act(bar_time, sig, c, price, atr_value, regime=None, broker=None, executor=None, positions=None):
+    """Filters, margin check and order for one signal (the signal -> order latency path)."""
+    reason = skip_reason(sig, c, price, atr_value, regime)
+    if reason is not None:
+        incr(f"live.skip_{reason}")
+        print(bar_time, SKIP_MESSAGES[reason].format(regime=regime))
+        return False
 
-            last_bar_time = bar_time
+    direction = mt5.ORDER_TYPE_BUY if sig == 1 else mt5.ORDER_TYPE_SELL
 
-            signals, conf = generate_signals(model, df_feat)
-            sig = signals[-1]
-            c = conf[-1]
+    if positions is not None:
+        limit = positions.limit_reason(SYMBOL, sig, POSITION_SIZE, price)
+        if limit is not None:
+            incr(f"live.skip_{limit}")
+            print(bar_time, f"Position limit ({limit}), skipping trade.")
+            return False
 
-            price = df["close"].iloc[-1]
-            atr_value = df_feat["atr"].iloc[-1]
-            atr_norm = atr_value / price
+    if not has_enough_margin(SYMBOL, POSITION_SIZE, direction, broker):
+        incr("live.skip_margin")
+        print(bar_time, "Not enough margin, skipping trade.")
+        return False
 
-            # filters (same as backtest)
-            if atr_norm < ATR_THRESHOLD:
-                print(bar_time, "ATR filter, no trade.")
-                time.sleep(poll_seconds)
-                continue
+    # execute
+    if place_order(SYMBOL, sig, price, atr_value, broker, executor):
+        incr("live.orders")
+        return True
+    incr("live.order_failures")
+    return False
+
+
+def _print_report(report):
+    r = report.as_dict()
+    print(f"Order {r['status']}: dir={r['direction']} filled={r['filled_volume']}/{r['volume']} "
+          f"price={r['avg_price']} slippage={r['slippage']} attempts={r['attempts']} "
+          f"latency={r['latency_ms']:.0f}ms retcode={r['retcode']} {r['comment']}")
+
+
+def live_trading_loop(poll_seconds=300, lookback_days=5):
+    global mt5
+    initialize_mt5()
+    if LIVE_STREAMS:
+        # several symbols/timeframes: one process, one connection, portfolio margin limit
+        from execution.live_loop import LiveEngine, build_streams
+        engine = LiveEngine(build_streams(LIVE_STREAMS), mt5, poll_seconds=poll_seconds,
+                            on_report=_print_report).start()
+        engine.run()
+        return
+
+    # the broker refresh thread, the executor worker and this loop share one terminal
+    # connection: serialize every MT5 call (module functions here use it too)
+    if not isinstance(mt5, SharedConnection):
+        mt5 = SharedConnection(mt5)
+
+    ensure_symbol(SYMBOL)
+    model = load_model()
+
+    best_params = load_best_params()
+    indicator_params = best_params["indicators"]
+    # only the features the model was trained on, from a raw tail of lookback() bars
+    stream = IncrementalFeatures(feature_names(model), indicator_params,
+                                 htf=HTF_TIMEFRAMES, timeframe=TIMEFRAME,
+                                 regime=RegimeDetector(online=True) if REGIME_FEATURE or REGIME_FILTER else None)
 
-            if c < CONF_THRESHOLD or sig == 0 or np.isnan(atr_value) or atr_value <= 0:
-                print(bar_time, "No valid signal.")
-                time.sleep(poll_seconds)
-                continue
+    # account / tick / margin kept warm in the background; the decision path reads memory
+    broker = BrokerStateCache(mt5, [SYMBOL]).refresh().start(BROKER_REFRESH_SECONDS)
+    positions = PositionManager(mt5, broker=broker).sync()
 
-            direction = mt5.ORDER_TYPE_BUY if sig == 1 else mt5.ORDER_TYPE_SELL
+    def on_report(report):
+        positions.on_report(report)
+        _print_report(report)
 
-            if not has_enough_margin(SYMBOL, POSITION_SIZE, direction):
-                print(bar_time, "Not enough margin, skipping trade.")
-                time.sleep(poll_seconds)
-                continue
+    executor = TradeExecutor(mt5, broker, latency_budget=EXEC_LATENCY_BUDGET, on_report=on_report).start()
 
-            # execute
-            place_order(SYMBOL, sig, price, atr_value)
+    last_bar_time = None
+    set_context(symbol=SYMBOL)
 
+    while True:
+        try:
+            with span("live_tick"):
+                last_bar_time = _live_tick(model, stream, last_bar_time, broker, executor, positions)
         except Exception as e:
+            incr("live.errors")
             print("Error in live loop:", e)
 
         time.sleep(poll_seconds)
@@ -1,11 +1,15 @@
-import matplotlib
+import json
+from datetime import datetime
+
 import numpy as np
 
 from models.lgbm_model import train_lgbm
 from models.rf_model import train_rf
 from models.xgb_model import train_xgb
 
-matplotlib.use("TkAgg")
+from utils.plotting import configure_backend
+
+configure_backend()
 
 from collections import Counter
 
@@ -23,7 +27,7 @@ from utils.params_io import load_best_params
 from models.model_registry import MODEL_REGISTRY
 from evaluation.backtest_plotter import ( plot_equity_curve, plot_rolling_f1, plot_confusion_matrix, plot_feature_importance )
 from utils.target_encoding import decode_target
-from utils.config import TIMEFRAME, DAYS, SYMBOL, START_DATE, END_DATE
+from utils.config import TIMEFRAME, DAYS, SYMBOL, START_DATE, END_DATE, COMPACT_FEATURES, HTF_TIMEFRAMES, REGIME_FEATURE
 from features.regime.regime_detector import RegimeDetector
 import pickle
 
@@ -35,6 +39,15 @@ SAVE_DIR.mkdir(parents=True, exist_ok=True)
 def save_active_model(model):
     save_path = SAVE_DIR / "active_model.pkl"
     joblib.dump(model, save_path)
+
+    # Sidecar metadata so the menu can show the active model without unpickling it
+    meta = {
+        "model_class": model.__class__.__name__,
+        "saved": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(save_path.with_suffix(".json"), "w") as f:
+        json.dump(meta, f, indent=4)
+
     print(f"Saved active model to {save_path}")
 
 
@@ -60,19 +73,26 @@ def train(symbol, timeframe, days, start_date, end_date):
     df_raw = load_data(symbol, timeframe, days, start_date, end_date)
 
     # Build features
+    future_n = 20  # label horizon, also the early-stopping gap
     df_feat = build_features(
         df_raw,
         params=indicator_params,
-        future_n=20
+        future_n=future_n,
+        compact=COMPACT_FEATURES,
+        htf=HTF_TIMEFRAMES,
+        regime=REGIME_FEATURE,
     )
 
     # Train the correct model
     if model_name == "xgb":
-        model = train_xgb(df_feat, model_params)
+        model = train_xgb(df_feat, model_params, horizon=future_n)
     elif model_name == "rf":
         model = train_rf(df_feat, model_params)
     else:
-        model = train_lgbm(df_feat, model_params)
+        model = train_lgbm(df_feat, model_params, horizon=future_n)
+
+    if getattr(model, "best_iteration_", None) is not None:
+        print(f"Early stopping: best iteration {model.best_iteration_}")
 
     # Save model
     save_active_model(model)
@@ -17,5 +17,44 @@ ATR_THRESHOLD = 0.0001
 MARGIN_LIMIT = 0.5
 LEVERAGE = 20
 CONTRACT_SIZE = 1
+COMPACT_FEATURES = False  # float32/int8 feature frames (see build_features)
+HTF_TIMEFRAMES = ()  # e.g. ("M15", "H1"): higher-timeframe context columns (see features/multi_timeframe.py)
+REGIME_FEATURE = False  # add the online RegimeDetector "regime" column to the features
+REGIME_FILTER = ()  # live: regimes with no new entries, e.g. (0,) = volatility crush
+BAR_STORE_DIR = 'data/bars'  # data_loader.bar_store.BarStore root
+PREDICTION_CACHE_DIR = 'data/predictions'  # backtest class probabilities (backtesting/prediction_cache.py), None = off
+BACKTEST_CHUNK_BARS = 200_000  # out-of-core backtest: bars per chunk (backtesting/chunked_backtest.py)
+INTRABAR_TIMEFRAME = None  # e.g. 'M1': bars hitting both SL and TP are resolved from stored M1 bars (backtesting/intrabar.py)
+INTRABAR_TIE = 'sl'  # both levels inside one M1 bar: 'sl' (pessimistic), 'tp' or 'open' (level nearer the open)
+BROKER_REFRESH_SECONDS = 1.0  # live: background refresh of account/tick/margin (execution/broker_cache.py)
+EXEC_LATENCY_BUDGET = 2.0  # live: seconds an order may spend on requote retries (execution/trade_executor.py)
+LIVE_STREAMS = ()  # multi-symbol live: ({"symbol": "[SP500]", "timeframe": "M5"}, ...) (execution/live_loop.py)
+PORTFOLIO_MARGIN_LIMIT = 0.5  # multi-symbol live: margin limit across all streams (share of equity)
+MAX_LONG_POSITIONS = None  # max concurrent long positions (live, walk-forward and backtests), None = no limit
+MAX_SHORT_POSITIONS = None  # max concurrent short positions
+MAX_EXPOSURE = None  # max gross notional of open positions as a multiple of equity (execution/position_manager.py)
+MULTI_FIDELITY = False  # screen trials on a cheap fidelity, prune low ranks (optimization/multi_fidelity.py)
+MF_PRUNER = 'sh'  # "sh" (successive halving) or "hyperband"
+MF_REDUCTION_FACTOR = 3  # keep the top 1/3 of the trials at each rung
+MF_SCREEN_HISTORY = 0.5  # screening rung: most recent share of the history
+MF_SCREEN_FOLDS = 5  # screening rung: walk-forward folds (evenly spaced)
+MF_SCREEN_ESTIMATORS = 0.25  # screening rung: share of n_estimators
+MF_AUDIT_EVERY = 10  # every n-th trial skips pruning (rank correlation sample), 0 = never
+EARLY_STOPPING_ROUNDS = None  # xgb/lgbm: stop after n rounds without validation log-loss gain, None = off
+EARLY_STOPPING_VALID = 0.15  # early stopping: most recent share of the training rows held out
+EVAL_CACHE = True  # memoize trial evaluations across sessions (optimization/eval_cache.py)
+EVAL_CACHE_PATH = 'eval_cache.db'
+OPTUNA_STORAGE = 'sqlite:///optuna.db'  # or 'journal:studies/optuna.journal' (optimization/study_storage.py)
+OPTUNA_WORKERS = 1  # optimization worker processes sharing the study (use the journal storage)
+STUDY_DIR = 'studies'  # per-fold side files and study exports
+FOLD_STATS_SIDE_FILES = False  # per-fold stats as columnar side files instead of a JSON trial attr
+WF_N_JOBS = 1  # walk-forward folds evaluated in parallel processes (evaluation/splitter.run_folds)
+FEATURE_CACHE_ITEMS = 64  # indicator series kept across Optuna trials (see feature_graph.FeatureCache)
 
+PLOT_MODE = 'auto'  # "interactive", "headless" (save to PLOT_DIR) or "auto"
+PLOT_DIR = 'reports'
 
+METRICS_ENABLED = False
+METRICS_PATH = 'logs/metrics.jsonl'
+PROFILE_ENGINE = None  # None, "cprofile" or "pyinstrument" (one capture per Optuna trial)
+PROFILE_DIR = 'logs/profiles'
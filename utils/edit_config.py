@@ -1,5 +1,76 @@
 from utils import config
+import ast
 import importlib
+import io
+import re
+import tokenize
+from datetime import datetime
+
+CONFIG_PATH = "utils/config.py"
+
+
+def parse_value(raw, old_value):
+    """
+    Python literal (ast.literal_eval: numbers, strings, None, True/False, tuples, dicts),
+    with shorthands: true/false for booleans, "M15, H1" for tuples, ISO dates for
+    datetimes, bare text for string (or None) settings.
+    """
+    if isinstance(old_value, datetime):
+        return datetime.fromisoformat(raw)
+    try:
+        value = ast.literal_eval(raw)
+    except (ValueError, SyntaxError):
+        if isinstance(old_value, bool) and raw.lower() in ("true", "false"):
+            return raw.lower() == "true"
+        if isinstance(old_value, tuple):
+            # comma-separated, e.g. "M15, H1" (empty input clears it)
+            return tuple(v.strip() for v in raw.split(",") if v.strip())
+        if old_value is None or isinstance(old_value, str):
+            return raw
+        raise
+    # 1 for a float setting stays a float
+    if isinstance(old_value, float) and type(value) is int:
+        return float(value)
+    return value
+
+
+def format_value(value):
+    """Source text for value (config.py imports datetime, so dates are written as datetime(...))."""
+    if isinstance(value, datetime):
+        parts = [value.year, value.month, value.day]
+        if (value.hour, value.minute, value.second) != (0, 0, 0):
+            parts += [value.hour, value.minute, value.second]
+        return f"datetime({', '.join(map(str, parts))})"
+    return repr(value)
+
+
+def _comment(line):
+    """Trailing '# ...' of a line ('#' inside strings is not a comment), or ''."""
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(line).readline):
+            if tok.type == tokenize.COMMENT:
+                return line[tok.start[1]:].rstrip("\n")
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return ""
+
+
+def rewrite_setting(lines, key, value):
+    """lines of config.py with `key = ...` replaced (trailing comment and spacing before it kept)."""
+    pattern = re.compile(rf"^{re.escape(key)}\s*=")
+    out = []
+    for line in lines:
+        if pattern.match(line):
+            comment = _comment(line)
+            new = f"{key} = {format_value(value)}"
+            if comment:
+                code = line[:line.index(comment)]
+                gap = code[len(code.rstrip()):] or "  "
+                new += gap + comment
+            line = new + "\n"
+        out.append(line)
+    return out
+
 
 def edit_config():
     print("\n=== Edit Config ===")
@@ -21,34 +92,22 @@ def edit_config():
     old_value = settings[key]
 
     # Ask for new value
-    new_value_raw = input(f"Enter new value for {key} (current: {old_value}): ").strip()
+    new_value_raw = input(f"Enter new value for {key} (current: {format_value(old_value)}): ").strip()
 
-    # Convert type automatically
     try:
-        if isinstance(old_value, int):
-            new_value = int(new_value_raw)
-        elif isinstance(old_value, float):
-            new_value = float(new_value_raw)
-        elif isinstance(old_value, bool):
-            new_value = new_value_raw.lower() == "true"
-        else:
-            new_value = new_value_raw
-    except:
-        print("Invalid type.")
+        new_value = parse_value(new_value_raw, old_value)
+    except (ValueError, SyntaxError):
+        print("Invalid value.")
         return
 
     # Rewrite config.py
-    with open("utils/config.py", "r") as f:
+    with open(CONFIG_PATH, "r") as f:
         lines = f.readlines()
 
-    with open("utils/config.py", "w") as f:
-        for line in lines:
-            if line.startswith(key):
-                f.write(f"{key} = {repr(new_value)}\n")
-            else:
-                f.write(line)
+    with open(CONFIG_PATH, "w") as f:
+        f.writelines(rewrite_setting(lines, key, new_value))
 
-    print(f"{key} updated to {new_value}")
+    print(f"{key} updated to {format_value(new_value)}")
 
     # Reload config so changes take effect immediately
     importlib.reload(config)
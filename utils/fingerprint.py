@@ -0,0 +1,51 @@
+# utils/fingerprint.py
+# Stable content hashes: of a price/feature frame (data_fingerprint) and of a nested
+# params structure (canonical_hash), e.g. for keys of persistent caches.
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+FLOAT_DIGITS = 12  # significant digits kept when hashing floats (float32/64 noise, numpy scalars)
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """Hash of the columns, dtypes, index and every value of df."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([list(map(str, df.columns)), list(map(str, df.dtypes))]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def canonical(obj, digits=FLOAT_DIGITS):
+    """
+    JSON-ready copy of obj: sorted dict keys as strings, tuples as lists, numpy scalars as
+    Python; floats rounded to `digits` significant digits (None = exact).
+    """
+    if isinstance(obj, dict):
+        return {str(k): canonical(v, digits) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(obj, (list, tuple)):
+        return [canonical(v, digits) for v in obj]
+    if isinstance(obj, (bool, np.bool_)):
+        return bool(obj)
+    if isinstance(obj, (int, np.integer)):
+        return int(obj)
+    if isinstance(obj, (float, np.floating)):
+        return float(obj) if digits is None else float(f"{float(obj):.{digits}g}")
+    return obj
+
+
+def canonical_hash(*parts) -> str:
+    """Hash of parts (dicts, lists, scalars), independent of dict order and numeric types."""
+    payload = json.dumps(canonical(list(parts)), sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def file_fingerprint(path, chunk_size=1 << 20) -> str:
+    """Hash of a file's bytes (e.g. a saved model artifact)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
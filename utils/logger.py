@@ -0,0 +1,295 @@
+# utils/logger.py
+# Lightweight instrumentation: span timers, counters and histograms written as JSON lines.
+# Disabled by default (METRICS_ENABLED in utils/config.py, read at call time so an edit through
+# edit_config applies to a running process; enable()/disable() override it). When disabled,
+# span() returns a shared no-op context and @timed calls straight through, so the hot paths
+# pay one flag check.
+import atexit
+import contextlib
+import functools
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from utils import config
+
+_override = None     # enable() / disable(); None = follow config.METRICS_ENABLED
+_path = None         # enable(path); None = config.METRICS_PATH
+_file = None
+_file_path = None
+_lock = threading.Lock()
+_context = threading.local()
+
+_counters = defaultdict(int)
+_histograms = {}
+
+
+_BUCKETS_PER_OCTAVE = 8
+
+
+class Histogram:
+    """Streaming histogram with log-scale buckets (~9% wide): constant memory, approximate percentiles."""
+
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets = defaultdict(int)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        key = math.floor(math.log2(value) * _BUCKETS_PER_OCTAVE) if value > 0 else None
+        self.buckets[key] += 1
+
+    def percentile(self, q):
+        if self.count == 0:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for key in sorted(self.buckets, key=lambda k: -math.inf if k is None else k):
+            seen += self.buckets[key]
+            if seen >= rank:
+                if key is None:
+                    return self.min
+                # upper edge of the bucket, clipped to the observed range
+                edge = 2.0 ** ((key + 1) / _BUCKETS_PER_OCTAVE)
+                return min(max(edge, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else float("nan"),
+            "min": self.min,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+        }
+
+
+# ---------------------------------------------------------
+# Switches
+# ---------------------------------------------------------
+def enable(path=None):
+    global _override, _path
+    if path is not None:
+        _close()
+        _path = Path(path)
+    _override = True
+
+
+def disable():
+    global _override
+    _override = False
+    _close()
+
+
+def follow_config():
+    """Drop the enable()/disable() override: METRICS_ENABLED / METRICS_PATH decide again."""
+    global _override, _path
+    _override = None
+    _path = None
+
+
+def is_enabled():
+    if _override is not None:
+        return _override
+    return bool(getattr(config, "METRICS_ENABLED", False))
+
+
+def set_context(**fields):
+    """Tag every following record of this thread (e.g. trial=12, symbol="[SP500]"), under its "ctx" key."""
+    current = dict(getattr(_context, "fields", {}))
+    current.update(fields)
+    _context.fields = {k: v for k, v in current.items() if v is not None}
+
+
+def clear_context():
+    _context.fields = {}
+
+
+# ---------------------------------------------------------
+# Output
+# ---------------------------------------------------------
+def _write(record):
+    global _file, _file_path
+    fields = getattr(_context, "fields", None)
+    if fields:
+        record["ctx"] = fields      # never overwrites name / value / ms
+    line = json.dumps(record, default=str)
+    path = _path if _path is not None else Path(getattr(config, "METRICS_PATH", "logs/metrics.jsonl"))
+    with _lock:
+        if _file is not None and _file_path != path:
+            _file.close()
+            _file = None
+        if _file is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _file = open(path, "a", encoding="utf-8")
+            _file_path = path
+        _file.write(line + "\n")
+
+
+def _close():
+    global _file
+    with _lock:
+        if _file is not None:
+            _file.close()
+            _file = None
+
+
+atexit.register(_close)
+
+
+# ---------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------
+def incr(name, n=1):
+    if not is_enabled():
+        return
+    with _lock:
+        _counters[name] += n
+
+
+def observe(name, value):
+    if not is_enabled():
+        return
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram()
+        hist.add(value)
+
+
+class _Span:
+    __slots__ = ("name", "fields", "start")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.start) * 1000.0
+        observe(self.name, ms)
+        record = {"ts": time.time(), "type": "span", "name": self.name, "ms": round(ms, 3)}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.fields)
+        _write(record)
+        return False
+
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def span(name, **fields):
+    """Time a block: `with span("build_features", rows=len(df)): ...`"""
+    if not is_enabled():
+        return _NULL_SPAN
+    return _Span(name, fields)
+
+
+def timed(name=None):
+    """Decorator version of span()."""
+
+    def decorator(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return fn(*args, **kwargs)
+            with _Span(label, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def summary():
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {k: h.summary() for k, h in _histograms.items()},
+        }
+
+
+def flush_summary(reset=False):
+    """Write counters and histogram summaries as one JSON line."""
+    if not is_enabled():
+        return None
+    data = summary()
+    _write({"ts": time.time(), "type": "summary", **data})
+    if reset:
+        with _lock:
+            _counters.clear()
+            _histograms.clear()
+    return data
+
+
+def print_summary():
+    data = summary()
+    if not data["histograms"] and not data["counters"]:
+        return
+    print("\n=== Timings (ms) ===")
+    for name, s in sorted(data["histograms"].items(), key=lambda kv: -kv[1]["sum"]):
+        print(f"{name:28} n={s['count']:<6} total={s['sum']:10.1f} mean={s['mean']:9.2f} "
+              f"p95={s['p95']:9.2f} max={s['max']:9.2f}")
+    for name, value in sorted(data["counters"].items()):
+        print(f"{name:28} {value}")
+
+
+# ---------------------------------------------------------
+# Profiling
+# ---------------------------------------------------------
+@contextlib.contextmanager
+def profile(name, engine=None, out_dir=None):
+    """
+    Capture a profile of the block to <out_dir>/<name>.prof (cProfile) or .html (pyinstrument).
+    engine: "cprofile", "pyinstrument" or None (= PROFILE_ENGINE from config; None disables).
+    """
+    engine = engine or getattr(config, "PROFILE_ENGINE", None)
+    if not engine:
+        yield None
+        return
+
+    out_dir = Path(out_dir or getattr(config, "PROFILE_DIR", "logs/profiles"))
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if engine == "pyinstrument":
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            path = out_dir / f"{name}.html"
+            path.write_text(profiler.output_html(), encoding="utf-8")
+    else:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            path = out_dir / f"{name}.prof"
+            profiler.dump_stats(path)
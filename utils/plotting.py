@@ -0,0 +1,106 @@
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+
+from utils import config
+
+_mode_override = None
+_dir_override = None
+
+
+def _has_display():
+    if sys.platform.startswith("win") or sys.platform == "darwin":
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def plot_mode():
+    """
+    "interactive" (plt.show) or "headless" (save to PLOT_DIR).
+    "auto" resolves to headless when there is no display.
+    """
+    mode = _mode_override or getattr(config, "PLOT_MODE", "auto")
+    if mode == "auto":
+        return "interactive" if _has_display() else "headless"
+    return mode
+
+
+def plot_dir() -> Path:
+    return Path(_dir_override or getattr(config, "PLOT_DIR", "reports"))
+
+
+def set_plot_mode(mode, out_dir=None):
+    """Override the configured mode for this process (e.g. from a CLI flag or a worker)."""
+    global _mode_override, _dir_override
+    _mode_override = mode
+    _dir_override = out_dir
+    configure_backend()
+
+
+def configure_backend():
+    # Replaces the hard-coded matplotlib.use("TkAgg")
+    if plot_mode() == "headless":
+        matplotlib.use("Agg", force=True)
+    else:
+        try:
+            matplotlib.use("TkAgg")
+        except ImportError:
+            matplotlib.use("Agg", force=True)
+
+
+def _slug(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "figure"
+
+
+def show_or_save(fig, name):
+    """
+    Interactive: plt.show(). Headless: write <PLOT_DIR>/<name>.png and close the figure.
+    Returns the saved path (None when shown interactively).
+    """
+    import matplotlib.pyplot as plt
+
+    if plot_mode() != "headless":
+        plt.show()
+        return None
+
+    out_dir = plot_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"{_slug(name)}.png"
+    fig.savefig(path, dpi=110)
+    plt.close(fig)
+    return path
+
+
+def _render_job(mode, out_dir, fn, args, kwargs):
+    set_plot_mode(mode, out_dir)
+    return fn(*args, **kwargs)
+
+
+def render_figures(jobs, out_dir=None, workers=None):
+    """
+    Render a report's figures.
+    jobs: list of (fn, args, kwargs); fn must be a module-level plotting function.
+    Headless mode renders in parallel worker processes and returns the file paths.
+    Interactive mode shows the figures one by one in this process.
+    """
+    if plot_mode() != "headless":
+        return [fn(*args, **kwargs) for fn, args, kwargs in jobs]
+
+    out_dir = str(out_dir or plot_dir())
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        paths = [_render_job("headless", out_dir, fn, args, kwargs) for fn, args, kwargs in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_render_job, "headless", out_dir, fn, args, kwargs)
+                for fn, args, kwargs in jobs
+            ]
+            paths = [f.result() for f in futures]
+
+    print(f"Saved {len(paths)} figures to {out_dir}")
+    return paths
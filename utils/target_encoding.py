@@ -15,6 +15,18 @@ def encode_target(y):
     return pd.Series(y).map(ENCODE_MAP).values
 
 
+def features_and_target(train):
+    """
+    (X, encoded y) from a frame with a "target" column, or from an (X, y) pair of
+    arrays/views (walk-forward folds), which are used as they are (no copy).
+    """
+    if isinstance(train, tuple):
+        X, y = train
+    else:
+        X, y = train.drop(columns=["target"]), train["target"]
+    return X, encode_target(y)
+
+
 def decode_target(y):
     """
     Convert model predictions (0,1,2) back to trading labels (-1,0,1).